@@ -0,0 +1,342 @@
+"""
+Benchmarks for the authentication hot path.
+
+Runs offline against a local stand-in identity provider, and prints the results as JSON,
+so they can be compared between releases:
+
+    python benchmarks/bench_auth.py --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from importlib.metadata import PackageNotFoundError, version
+from typing import Callable
+
+import httpx
+from fastapi import FastAPI
+
+from psp_auth import Auth, AuthConfig
+from psp_auth.errors import AuthException
+from psp_auth.fastapi import FastAPIAuth
+from psp_auth.revocation import Revocation, RevocationList
+from psp_auth.testing import MockAuth, MockToken, MockUser, signing_key
+from psp_auth.testing.keys import signing_algorithm
+from psp_auth.testing.server import IdentityProviderServer
+
+CLIENT_ID = "benchmark"
+
+KEY_TYPES = ("RSA", "EC", "Ed25519")
+
+
+def large_mock_token(count: int) -> MockToken:
+    return MockToken(
+        scopes=[f"scope-{i}" for i in range(count)],
+        user=MockUser(roles=[f"role-{i}" for i in range(count)]),
+    )
+
+
+def summarize(
+    name: str,
+    latencies: list[float],
+    peak_bytes: int | None,
+    allocations: tuple[float, float] | None,
+) -> dict:
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "name": name,
+        "iterations": len(latencies),
+        "ops_per_sec": len(latencies) / total if total > 0 else None,
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+        "peak_memory_bytes": peak_bytes,
+        "allocated_blocks_per_call": allocations[0] if allocations else None,
+        "allocated_bytes_per_call": allocations[1] if allocations else None,
+    }
+
+
+def measure(name: str, function: Callable[[], object], iterations: int) -> dict:
+    function()  # Warm up
+
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+
+    # The peak of the memory that one call holds at a time, not the total it allocates
+    tracemalloc.start()
+    function()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+
+    # The memory blocks that the calls allocate and keep, for example, in caches
+    before = tracemalloc.take_snapshot()
+    for _ in range(iterations):
+        function()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    ignore_tracemalloc = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    statistics_diff = after.filter_traces(ignore_tracemalloc).compare_to(
+        before.filter_traces(ignore_tracemalloc), "filename"
+    )
+    allocations = (
+        sum(stat.count_diff for stat in statistics_diff) / iterations,
+        sum(stat.size_diff for stat in statistics_diff) / iterations,
+    )
+
+    return summarize(name, latencies, peak_bytes, allocations)
+
+
+def _rejects(auth: Auth, token: str) -> None:
+    try:
+        auth.validate_token(token)
+    except AuthException:
+        return
+    raise AssertionError("The token should be rejected")
+
+
+def bench_validation(provider, issuers: dict, iterations: int) -> list[dict]:
+    results = []
+    config = AuthConfig(CLIENT_ID, well_known_endpoint=provider.well_known_endpoint)
+
+    for algorithm, issuer in issuers.items():
+        token = issuer.issue_token(MockToken())
+        auth = Auth(config)
+
+        def cold_validation():
+            cold_auth = Auth(config)
+            try:
+                cold_auth.validate_token(token)
+            finally:
+                cold_auth.close()
+
+        results.append(
+            measure(
+                f"validate_token[warm,{algorithm}]",
+                lambda: auth.validate_token(token),
+                iterations,
+            )
+        )
+        results.append(
+            measure(
+                f"validate_token[cold,{algorithm}]",
+                cold_validation,
+                max(1, iterations // 10),
+            )
+        )
+
+    token = issuers["RS256"].issue_token(MockToken())
+    cached_auth = Auth(
+        AuthConfig(
+            CLIENT_ID,
+            well_known_endpoint=provider.well_known_endpoint,
+            token_cache_size=100,
+        )
+    )
+    results.append(
+        measure(
+            "validate_token[token_cache,RS256]",
+            lambda: cached_auth.validate_token(token),
+            iterations,
+        )
+    )
+
+    auth = Auth(config)
+
+    # The hooks that run per validation when the instrumentation is disabled
+    instrumentation = auth._instrumentation
+    phase_timer = auth._phase_timer
+
+    def disabled_hooks():
+        instrumentation.cache("jwks", "hit")
+        phases = phase_timer()
+        for phase in ("parse", "key_lookup", "signature", "claims"):
+            phases.lap(phase)
+
+    results.append(measure("instrumentation[disabled]", disabled_hooks, iterations))
+
+    # The denylist lookup that every validation does when a revocation list is given
+    revocations = RevocationList(exact=False)
+    revocations.add(
+        Revocation("jti", f"revoked-{i}", time.time() + 3600 * (i % 12 + 1) / 12)
+        for i in range(100_000)
+    )
+    claims = {"jti": "valid", "sid": "valid"}
+    results.append(
+        measure(
+            "RevocationList.check[100000_revocations]",
+            lambda: revocations.check(claims),
+            iterations,
+        )
+    )
+
+    # Rejected by the prevalidation, before any key lookup or signature verification
+    header, claims, signature = token.split(".")
+    invalid_tokens = {
+        "malformed": "hellothere",
+        "algorithm": f"eyJhbGciOiJub25lIn0.{claims}.{signature}",
+        "expired": issuers["RS256"].issue_token(MockToken(expires_at=0)),
+    }
+    for reason, invalid_token in invalid_tokens.items():
+        results.append(
+            measure(
+                f"validate_token[reject_{reason}]",
+                lambda: _rejects(auth, invalid_token),
+                iterations,
+            )
+        )
+
+    auth = Auth(
+        AuthConfig(
+            CLIENT_ID,
+            well_known_endpoint=provider.well_known_endpoint,
+            token_max_length=1024 * 1024,
+        )
+    )
+    for count in (0, 100, 1000):
+        mock_token = large_mock_token(count)
+        token = issuers["RS256"].issue_token(mock_token)
+        validated_token = auth.validate_token(token)
+        required_scopes = mock_token.scopes[-10:]
+        required_roles = mock_token.user.roles[-10:]
+        results.append(
+            measure(
+                f"validate_token[{count}_scopes_and_roles,{len(token)}_bytes]",
+                lambda: auth.validate_token(token),
+                iterations,
+            )
+        )
+        results.append(
+            measure(
+                f"Token.has_scopes[{count}_scopes]",
+                lambda: validated_token.has_scopes(required_scopes),
+                iterations,
+            )
+        )
+        results.append(
+            measure(
+                f"User.has_all_roles[{count}_roles]",
+                lambda: validated_token.user.has_all_roles(required_roles),
+                iterations,
+            )
+        )
+
+    return results
+
+
+def bench_fastapi(
+    provider, issuers: dict, requests: int, concurrency: int
+) -> list[dict]:
+    results = []
+    token = issuers["RS256"].issue_token(MockToken(scopes=["read"]))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for use_async_validation, executor in (
+        (False, "inline"),
+        (True, "inline"),
+        (True, "thread"),
+        (True, "process"),
+    ):
+        auth = Auth(
+            AuthConfig(
+                CLIENT_ID,
+                well_known_endpoint=provider.well_known_endpoint,
+                verification_executor=executor,
+            )
+        )
+        fauth = FastAPIAuth(auth, use_async_validation=use_async_validation)
+        app = FastAPI()
+
+        @app.get("/", dependencies=[fauth.require_scopes(["read"])])
+        async def route():
+            return "ok"
+
+        async def run() -> tuple[list[float], float]:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench"
+            ) as client:
+                (await client.get("/", headers=headers)).raise_for_status()
+
+                latencies = []
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def request():
+                    async with semaphore:
+                        start = time.perf_counter()
+                        response = await client.get("/", headers=headers)
+                        latencies.append(time.perf_counter() - start)
+                        response.raise_for_status()
+
+                start = time.perf_counter()
+                await asyncio.gather(*(request() for _ in range(requests)))
+                elapsed = time.perf_counter() - start
+                await auth.aclose()
+                return latencies, elapsed
+
+        latencies, elapsed = asyncio.run(run())
+        result = summarize(
+            f"fastapi.require_scopes[concurrency={concurrency},async={use_async_validation},executor={executor}]",
+            latencies,
+            peak_bytes=None,
+            allocations=None,
+        )
+        result["ops_per_sec"] = requests / elapsed
+        results.append(result)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    issuers = {
+        signing_algorithm(key_type): MockAuth(CLIENT_ID, None, key_type=key_type)
+        for key_type in KEY_TYPES
+    }
+    with IdentityProviderServer(
+        [signing_key(key_type) for key_type in KEY_TYPES]
+    ) as provider:
+        results = bench_validation(provider, issuers, args.iterations)
+        results += bench_fastapi(provider, issuers, args.requests, args.concurrency)
+
+    try:
+        package_version = version("psp-auth")
+    except PackageNotFoundError:
+        package_version = None
+
+    report = {
+        "psp_auth_version": package_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    for result in results:
+        print(
+            f"{result['name']:<60} {result['ops_per_sec']:>12.0f} ops/s"
+            f" p50 {result['p50_us']:>10.1f}us p99 {result['p99_us']:>10.1f}us",
+            file=sys.stderr,
+        )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmarks for the import time and memory of the package.
+
+Each import runs in a fresh interpreter, and prints the results as JSON,
+so they can be compared between releases:
+
+    python benchmarks/bench_import.py --output results.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess  # nosec B404
+import sys
+from importlib.metadata import PackageNotFoundError, version
+
+IMPORTS = {
+    "psp_auth": "import psp_auth",
+    "AuthConfig": "from psp_auth import AuthConfig",
+    "Auth": "from psp_auth import Auth",
+    "FastAPIAuth": "from psp_auth import FastAPIAuth",
+}
+
+# The heavy dependencies that are only imported when they are needed
+HEAVY_MODULES = ("fastapi", "starlette", "pydantic", "requests", "httpx", "joserfc")
+
+_MEASURE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "heavy_modules": [name for name in {heavy_modules!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure_import(statement: str) -> dict:
+    code = _MEASURE.format(statement=statement, heavy_modules=HEAVY_MODULES)
+    output = subprocess.run(  # nosec B603
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def bench_import(name: str, statement: str, repeats: int) -> dict:
+    runs = [measure_import(statement) for _ in range(repeats)]
+    return {
+        "name": f"import[{name}]",
+        "repeats": repeats,
+        "p50_ms": statistics.median(run["seconds"] for run in runs) * 1e3,
+        "min_ms": min(run["seconds"] for run in runs) * 1e3,
+        "max_rss_kib": statistics.median(run["max_rss_kib"] for run in runs),
+        "heavy_modules": runs[0]["heavy_modules"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = [
+        bench_import(name, statement, args.repeats)
+        for name, statement in IMPORTS.items()
+    ]
+
+    try:
+        package_version = version("psp-auth")
+    except PackageNotFoundError:
+        package_version = None
+
+    report = {
+        "psp_auth_version": package_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    for result in results:
+        print(
+            f"{result['name']:<30} p50 {result['p50_ms']:>8.1f}ms"
+            f" rss {result['max_rss_kib']:>8.0f}KiB"
+            f" imports {', '.join(result['heavy_modules']) or '-'}",
+            file=sys.stderr,
+        )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
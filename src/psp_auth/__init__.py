@@ -1,11 +1,39 @@
-from .core import Auth
-from .config import AuthConfig
-from .token import Token
-from .user import User
-from .fastapi.auth import FastAPIAuth
+import importlib
 import logging
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .core import Auth
+    from .config import AuthConfig
+    from .token import Token
+    from .user import User
+    from .fastapi.auth import FastAPIAuth
+
+# The exports are imported on first access, so that, for example, `Auth` does not import FastAPI
+_EXPORTS = {
+    "Auth": ".core",
+    "AuthConfig": ".config",
+    "Token": ".token",
+    "User": ".user",
+    "FastAPIAuth": ".fastapi.auth",
+}
 
 __all__ = ["Auth", "FastAPIAuth", "AuthConfig", "Token", "User"]
 
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
 # Prevent "No handlers found" warnings
 logging.getLogger(__name__).addHandler(logging.NullHandler())
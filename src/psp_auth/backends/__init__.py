@@ -0,0 +1,16 @@
+"""
+Cache backends that `Auth` can share between processes, see `psp_auth.cache.CacheBackend`.
+"""
+
+from ..cache import CacheBackend
+from .memory import MemoryBackend
+from .redis import RedisBackend, RedisError
+from .shared_memory import SharedMemoryBackend
+
+__all__ = [
+    "CacheBackend",
+    "MemoryBackend",
+    "RedisBackend",
+    "RedisError",
+    "SharedMemoryBackend",
+]
@@ -0,0 +1,33 @@
+from ..cache import TTLCache
+
+
+class MemoryBackend:
+    """
+    An in-memory least-recently-used cache backend. It is not shared between processes.
+    :param max_entries: The maximum number of entries in the cache.
+    :param max_bytes: The maximum total size of the values in the cache. If None, the size is not bounded.
+    """
+
+    def __init__(self, max_entries: int = 10_000, max_bytes: int | None = None):
+        self._cache = TTLCache(max_entries, max_bytes=max_bytes)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key: bytes) -> bytes | None:
+        return self._cache.get(key)
+
+    def set(self, key: bytes, value: bytes, ttl: float) -> None:
+        self._cache.set(key, value, ttl, size=len(value))
+
+    def delete(self, key: bytes) -> None:
+        self._cache.delete(key)
+
+    async def get_async(self, key: bytes) -> bytes | None:
+        return self.get(key)
+
+    async def set_async(self, key: bytes, value: bytes, ttl: float) -> None:
+        self.set(key, value, ttl)
+
+    async def delete_async(self, key: bytes) -> None:
+        self.delete(key)
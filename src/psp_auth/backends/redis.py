@@ -0,0 +1,223 @@
+import asyncio
+import socket
+import threading
+from urllib.parse import unquote, urlparse
+
+
+class RedisError(Exception):
+    """
+    An error reply from the Redis server.
+    """
+
+
+def _command(*args: bytes) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def _bulk_length(line: bytes) -> int | None:
+    """
+    Returns the length of the bulk string that follows the line, or None if the line is not the start of a bulk string.
+    """
+    if line[:1] == b"$":
+        return int(line[1:])
+    return None
+
+
+def _simple_reply(line: bytes) -> bytes | int:
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("The connection to the Redis server was closed")
+
+    kind, value = line[:1], line[1:-2]
+    if kind == b"+":
+        return value
+    elif kind == b":":
+        return int(value)
+    elif kind == b"-":
+        raise RedisError(value.decode(errors="replace"))
+    raise RedisError(f"Unsupported reply: {line!r}")
+
+
+class _Connection:
+    def __init__(self, host: str, port: int, timeout: float):
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._socket.makefile("rb")
+
+    def execute(self, *args: bytes) -> bytes | int | None:
+        self._socket.sendall(_command(*args))
+        line = self._file.readline()
+        length = _bulk_length(line)
+        if length is None:
+            return _simple_reply(line)
+        if length < 0:
+            return None
+        return self._file.read(length + 2)[:-2]
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+
+class _AsyncConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+
+    async def execute(self, *args: bytes) -> bytes | int | None:
+        self._writer.write(_command(*args))
+        line = await self._reader.readline()
+        length = _bulk_length(line)
+        if length is None:
+            return _simple_reply(line)
+        if length < 0:
+            return None
+        return (await self._reader.readexactly(length + 2))[:-2]
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class RedisBackend:
+    """
+    A cache backend on a Redis server, or any server that speaks the Redis protocol (RESP), like Valkey or KeyDB.
+    It is shared by every process that connects to the same server.
+
+    The connections are pooled, separately for the sync and the async methods.
+
+    :param url: The URL of the server, in the form `redis://[[username]:password@]host[:port][/database]`.
+    :param timeout: The connection and read timeout in seconds.
+    :param max_idle_connections: The maximum number of idle connections that are kept open for reuse.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        timeout: float = 1.0,
+        max_idle_connections: int = 10,
+    ):
+        parsed_url = urlparse(url)
+        if parsed_url.scheme != "redis":
+            raise ValueError(f"Unsupported Redis URL scheme: {parsed_url.scheme}")
+
+        self._host = parsed_url.hostname or "localhost"
+        self._port = parsed_url.port or 6379
+        self._timeout = timeout
+        self._max_idle_connections = max_idle_connections
+        self._setup_commands = []
+        if parsed_url.password is not None:
+            credentials = [unquote(parsed_url.password).encode()]
+            if parsed_url.username:
+                credentials.insert(0, unquote(parsed_url.username).encode())
+            self._setup_commands.append((b"AUTH", *credentials))
+        database = parsed_url.path.lstrip("/")
+        if database and database != "0":
+            self._setup_commands.append((b"SELECT", database.encode()))
+
+        self._lock = threading.Lock()
+        self._idle: list[_Connection] = []
+        self._idle_async: list[_AsyncConnection] = []
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+
+    def _execute(self, *args: bytes) -> bytes | int | None:
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = _Connection(self._host, self._port, self._timeout)
+            try:
+                for command in self._setup_commands:
+                    connection.execute(*command)
+            except BaseException:
+                connection.close()
+                raise
+
+        try:
+            reply = connection.execute(*args)
+        except BaseException:
+            # The connection may have a partial reply left in it, so it cannot be reused
+            connection.close()
+            raise
+
+        with self._lock:
+            if len(self._idle) < self._max_idle_connections:
+                self._idle.append(connection)
+                connection = None
+        if connection is not None:
+            connection.close()
+        return reply
+
+    async def _execute_async(self, *args: bytes) -> bytes | int | None:
+        # The connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._idle_async = []
+            self._async_loop = loop
+
+        if self._idle_async:
+            connection = self._idle_async.pop()
+        else:
+            connection = await self._connect_async()
+
+        try:
+            reply = await asyncio.wait_for(connection.execute(*args), self._timeout)
+        except BaseException:
+            connection.close()
+            raise
+
+        if len(self._idle_async) < self._max_idle_connections:
+            self._idle_async.append(connection)
+        else:
+            connection.close()
+        return reply
+
+    async def _connect_async(self) -> _AsyncConnection:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port), self._timeout
+        )
+        connection = _AsyncConnection(reader, writer)
+        try:
+            for command in self._setup_commands:
+                await asyncio.wait_for(connection.execute(*command), self._timeout)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def close(self) -> None:
+        """
+        Closes the idle connections.
+        """
+        with self._lock:
+            connections, self._idle = self._idle, []
+        for connection in connections:
+            connection.close()
+
+        async_connections, self._idle_async = self._idle_async, []
+        # The connections of a closed event loop were already closed with it
+        if self._async_loop is not None and not self._async_loop.is_closed():
+            for connection in async_connections:
+                connection.close()
+
+    def get(self, key: bytes) -> bytes | None:
+        return self._execute(b"GET", key)
+
+    def set(self, key: bytes, value: bytes, ttl: float) -> None:
+        if ttl > 0:
+            self._execute(b"SET", key, value, b"PX", b"%d" % max(1, ttl * 1000))
+
+    def delete(self, key: bytes) -> None:
+        self._execute(b"DEL", key)
+
+    async def get_async(self, key: bytes) -> bytes | None:
+        return await self._execute_async(b"GET", key)
+
+    async def set_async(self, key: bytes, value: bytes, ttl: float) -> None:
+        if ttl > 0:
+            await self._execute_async(
+                b"SET", key, value, b"PX", b"%d" % max(1, ttl * 1000)
+            )
+
+    async def delete_async(self, key: bytes) -> None:
+        await self._execute_async(b"DEL", key)
@@ -0,0 +1,172 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+_MAGIC = b"PSPAUTH1"
+# The magic, the number of buckets and the size of each slot
+_HEADER = struct.Struct("<8sII")
+_HEADER_SIZE = 64
+# The expiry time, and the lengths of the key and the value
+_SLOT_HEADER = struct.Struct("<dHI")
+# The number of slots in each bucket
+_WAYS = 4
+
+
+class SharedMemoryBackend:
+    """
+    A cache backend in a memory-mapped file, which is shared by all the processes on a host that open the same file.
+    Put the file on a memory-backed file system, like `/dev/shm`, so it is never written to disk.
+
+    The file is a fixed-size hash table, so it never grows. Each key maps to a bucket of a few slots,
+    and when a bucket is full, the entry that expires first is replaced.
+    Values that do not fit in a slot are not cached.
+    The buckets are locked with `fcntl` record locks, so this backend requires a Unix-like system.
+
+    :param path: The path of the file. It is created if it does not exist.
+    :param slots: The number of entries in the cache.
+    :param slot_size: The size in bytes of each entry, including its key.
+    """
+
+    def __init__(self, path: str, slots: int = 4096, slot_size: int = 4096):
+        if slot_size <= _SLOT_HEADER.size:
+            raise ValueError(f"The slot size must be larger than {_SLOT_HEADER.size}")
+
+        self._buckets = max(1, slots // _WAYS)
+        self._slot_size = slot_size
+        self._bucket_size = _WAYS * slot_size
+        size = _HEADER_SIZE + self._buckets * self._bucket_size
+
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._initialize(size)
+            self._map = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _initialize(self, size: int) -> None:
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER_SIZE, 0)
+        try:
+            header = _HEADER.pack(_MAGIC, self._buckets, self._slot_size)
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, header, 0)
+            elif os.pread(self._fd, _HEADER.size, 0) != header:
+                raise ValueError(
+                    "The shared memory file was created with a different number of slots or slot size"
+                )
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER_SIZE, 0)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def _bucket(self, key: bytes) -> int:
+        digest = hashlib.blake2b(key, digest_size=8).digest()
+        index = int.from_bytes(digest, "little") % self._buckets
+        return _HEADER_SIZE + index * self._bucket_size
+
+    def _locked(self, bucket: int, lock_type: int) -> "_BucketLock":
+        return _BucketLock(self, bucket, lock_type)
+
+    def _find(self, bucket: int, key: bytes, now: float) -> int | None:
+        """
+        Returns the offset of the slot in the bucket that holds an unexpired entry for `key`.
+        """
+        for offset in range(bucket, bucket + self._bucket_size, self._slot_size):
+            expires_at, key_length, _ = _SLOT_HEADER.unpack_from(self._map, offset)
+            if expires_at <= now or key_length != len(key):
+                continue
+            start = offset + _SLOT_HEADER.size
+            if self._map[start : start + key_length] == key:
+                return offset
+        return None
+
+    def get(self, key: bytes) -> bytes | None:
+        bucket = self._bucket(key)
+        with self._locked(bucket, fcntl.LOCK_SH):
+            offset = self._find(bucket, key, time.time())
+            if offset is None:
+                return None
+            _, key_length, value_length = _SLOT_HEADER.unpack_from(self._map, offset)
+            start = offset + _SLOT_HEADER.size + key_length
+            return self._map[start : start + value_length]
+
+    def set(self, key: bytes, value: bytes, ttl: float) -> None:
+        if ttl <= 0 or _SLOT_HEADER.size + len(key) + len(value) > self._slot_size:
+            return
+
+        bucket = self._bucket(key)
+        with self._locked(bucket, fcntl.LOCK_EX):
+            now = time.time()
+            offset = self._find(bucket, key, now)
+            if offset is None:
+                # Replace the entry that expires first, which is an empty or expired slot if there is one
+                offset = min(
+                    range(bucket, bucket + self._bucket_size, self._slot_size),
+                    key=lambda slot: _SLOT_HEADER.unpack_from(self._map, slot)[0],
+                )
+
+            start = offset + _SLOT_HEADER.size
+            self._map[start : start + len(key) + len(value)] = key + value
+            _SLOT_HEADER.pack_into(self._map, offset, now + ttl, len(key), len(value))
+
+    def delete(self, key: bytes) -> None:
+        bucket = self._bucket(key)
+        with self._locked(bucket, fcntl.LOCK_EX):
+            offset = self._find(bucket, key, time.time())
+            if offset is not None:
+                _SLOT_HEADER.pack_into(self._map, offset, 0, 0, 0)
+
+    async def get_async(self, key: bytes) -> bytes | None:
+        return self.get(key)
+
+    async def set_async(self, key: bytes, value: bytes, ttl: float) -> None:
+        self.set(key, value, ttl)
+
+    async def delete_async(self, key: bytes) -> None:
+        self.delete(key)
+
+
+class _BucketLock:
+    """
+    Locks a bucket against other threads and other processes.
+    Record locks are held by processes rather than threads, so the threads of a process are serialized by a thread lock.
+    """
+
+    __slots__ = ("_backend", "_bucket", "_lock_type")
+
+    def __init__(self, backend: SharedMemoryBackend, bucket: int, lock_type: int):
+        self._backend = backend
+        self._bucket = bucket
+        self._lock_type = lock_type
+
+    def __enter__(self) -> None:
+        self._backend._lock.acquire()
+        try:
+            fcntl.lockf(
+                self._backend._fd,
+                self._lock_type,
+                self._backend._bucket_size,
+                self._bucket,
+            )
+        except BaseException:
+            self._backend._lock.release()
+            raise
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            fcntl.lockf(
+                self._backend._fd,
+                fcntl.LOCK_UN,
+                self._backend._bucket_size,
+                self._bucket,
+            )
+        finally:
+            self._backend._lock.release()
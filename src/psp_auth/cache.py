@@ -1,32 +1,354 @@
+import asyncio
+import logging
+import threading
 import time
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Protocol
+
+logger = logging.getLogger(__name__)
 
 
 class CachedGetter:
     """
     A class that caches the value of a getter for a certain amount of time.
+
+    Only one update runs at a time. Once a value is cached, it is returned immediately,
+    even after it has expired, while it is refreshed in the background (stale-while-revalidate).
+    If the getter fails, it is retried with exponential backoff and the stale value is kept in the meantime.
+
     :param getter: A function that returns the value to be cached. If the function raises a DontCacheException, the cache will not be updated.
+        If it returns a `CachedValue`, the value is treated as if it was updated at `CachedValue.updated_at`, and expires after `CachedValue.ttl` if it is given.
     :param time_until_cache: The time in seconds until the cache expires.
+    :param async_getter: An async function that returns the value to be cached, used by `get_async` and `update_async`.
+    :param refresh_ahead: The time in seconds before the cache expires where the value is refreshed in the background.
+        It is at most half of the time until the value expires.
+    :param min_retry_delay: The time in seconds until the getter is retried after a failure. It doubles with each consecutive failure.
+    :param max_retry_delay: The maximum time in seconds until the getter is retried after a failure.
     """
 
-    def __init__(self, getter, time_until_cache: int):
+    def __init__(
+        self,
+        getter,
+        time_until_cache: int,
+        async_getter=None,
+        refresh_ahead: float = 0,
+        min_retry_delay: float = 1,
+        max_retry_delay: float = 60,
+    ):
         self.getter = getter
+        self.async_getter = async_getter
         self.value = None
+        self.has_value = False
         self.time_until_cache = time_until_cache
+        self.refresh_ahead = refresh_ahead
+        self.min_retry_delay = min_retry_delay
+        self.max_retry_delay = max_retry_delay
         self.last_update = 0  # Last time the value was updated
+        self.ttl = time_until_cache  # Time until the current value expires
+        self.failures = 0  # Number of consecutive failures
+        self._retry_at = 0
+        self._last_error: Exception | None = None
+        self._lock = threading.Lock()
+        self._background_lock = threading.Lock()
+        self._async_update: asyncio.Future | None = None
+
+    def update(self, max_age: float | None = None):
+        """
+        Updates the value by calling the getter.
+        :param max_age: If given, the value is only updated if it is older than `max_age` seconds and the getter is not backing off after a failure.
+        """
+        with self._lock:
+            if max_age is None or self._may_update(max_age):
+                self._call_getter()
+
+    async def update_async(self, max_age: float | None = None):
+        """
+        The same as `update`, except that it uses the async getter.
+        Concurrent calls share the same update.
+        """
+        if max_age is None or self._may_update(max_age):
+            await asyncio.shield(self._start_async_update())
+
+    def is_expired(self) -> bool:
+        return time.time() - self.last_update > self.ttl
+
+    def get(self):
+        if not self.has_value:
+            with self._lock:
+                # Another thread may have gotten the value while we waited for the lock
+                if not self.has_value:
+                    self._raise_if_backing_off()
+                    self._call_getter()
+        elif self._is_refresh_due():
+            self._update_in_background()
+
+        return self.value
 
-    def update(self):
+    async def get_async(self):
+        if not self.has_value:
+            self._raise_if_backing_off()
+            await asyncio.shield(self._start_async_update())
+        elif self._is_refresh_due():
+            self._start_async_update()
+
+        return self.value
+
+    def _may_update(self, max_age: float) -> bool:
+        now = time.time()
+        return now - self.last_update >= max_age and now >= self._retry_at
+
+    def _is_refresh_due(self) -> bool:
+        refresh_at = self.last_update + self.ttl - min(self.refresh_ahead, self.ttl / 2)
+        return time.time() >= max(refresh_at, self._retry_at)
+
+    def _raise_if_backing_off(self):
+        if self._last_error is not None and time.time() < self._retry_at:
+            raise self._last_error.with_traceback(None)
+
+    def _set(self, value):
+        updated_at = time.time()
+        ttl = None
+        if isinstance(value, CachedValue):
+            value, updated_at, ttl = value
+
+        self.value = value
+        self.has_value = True
+        self.last_update = updated_at
+        self.ttl = self.time_until_cache if ttl is None else ttl
+        self.failures = 0
+        self._retry_at = 0
+        self._last_error = None
+
+    def _fail(self, error: Exception):
+        self.failures += 1
+        delay = min(
+            self.max_retry_delay, self.min_retry_delay * 2 ** (self.failures - 1)
+        )
+        self._retry_at = time.time() + delay
+        self._last_error = error
+
+    def _call_getter(self):
         try:
-            self.value = self.getter()
-            self.last_update = time.time()
+            self._set(self.getter())
         except DontCacheException:
             pass
+        except Exception as e:
+            self._fail(e)
+            raise
 
-    def get(self):
-        if time.time() - self.last_update > self.time_until_cache:
-            self.update()
+    async def _call_async_getter(self):
+        try:
+            self._set(await self.async_getter())
+        except DontCacheException:
+            pass
+        except Exception as e:
+            self._fail(e)
+            raise
 
-        return self.value
+    def _update_in_background(self):
+        # Never blocks, so it is also safe to call from the event loop
+        if not self._background_lock.acquire(blocking=False):
+            return
+
+        def update():
+            try:
+                with self._lock:
+                    if self._is_refresh_due():
+                        self._call_getter()
+            except Exception:
+                logger.exception("Failed to update the cached value")
+            finally:
+                self._background_lock.release()
+
+        threading.Thread(target=update, daemon=True).start()
+
+    def _start_async_update(self) -> asyncio.Future:
+        # An update of an event loop that is gone never finishes, so another event loop starts its own
+        update = self._async_update
+        if (
+            update is None
+            or update.done()
+            or update.get_loop() is not asyncio.get_running_loop()
+        ):
+            self._async_update = asyncio.ensure_future(self._call_async_getter())
+            self._async_update.add_done_callback(_log_failed_update)
+        return self._async_update
+
+
+def _log_failed_update(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Failed to update the cached value", exc_info=future.exception())
 
 
 class DontCacheException(Exception):
     pass
+
+
+class CachedValue(NamedTuple):
+    """
+    A value that a getter got from another cache, with the time it was originally fetched,
+    so that it does not live longer than if it had been fetched directly.
+    It may also carry its own time to live, for example, one that the server sent with it.
+    """
+
+    value: Any
+    updated_at: float
+    ttl: float | None = None
+
+
+class Cache(Protocol):
+    """
+    A cache where each entry has its own time to live.
+    Implement this to plug your own cache into `Auth`.
+    """
+
+    def get(self, key: bytes) -> Any | None:
+        """
+        Returns the value for `key`, or None if it is not cached or has expired.
+        """
+        ...
+
+    def set(self, key: bytes, value: Any, ttl: float) -> None:
+        """
+        Caches `value` under `key` for `ttl` seconds.
+        """
+        ...
+
+    def delete(self, key: bytes) -> None: ...
+
+
+class CacheBackend(Protocol):
+    """
+    A cache of bytes where each entry has its own time to live, with both sync and async access.
+    Unlike a `Cache`, it may be shared between processes, for example, by all the workers on a host or in a pod.
+
+    See `psp_auth.backends` for the implementations.
+    """
+
+    def get(self, key: bytes) -> bytes | None:
+        """
+        Returns the value for `key`, or None if it is not cached or has expired.
+        """
+        ...
+
+    def set(self, key: bytes, value: bytes, ttl: float) -> None:
+        """
+        Caches `value` under `key` for `ttl` seconds.
+        """
+        ...
+
+    def delete(self, key: bytes) -> None: ...
+
+    async def get_async(self, key: bytes) -> bytes | None: ...
+
+    async def set_async(self, key: bytes, value: bytes, ttl: float) -> None: ...
+
+    async def delete_async(self, key: bytes) -> None: ...
+
+
+class TTLCache:
+    """
+    A thread-safe least-recently-used cache where each entry has its own expiry time.
+    :param max_entries: The maximum number of entries in the cache.
+    :param max_bytes: The maximum total size of the entries in the cache, as given by the `size` of each entry. If None, the size is not bounded.
+    :param on_evict: Called whenever an entry is evicted to make room for another entry.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int | None = None,
+        on_evict: Callable[[], None] | None = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns the value for `key`, or None if it is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at, _ = entry
+            if time.time() >= expires_at:
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float, size: int = 0) -> None:
+        """
+        Caches `value` under `key` for `ttl` seconds.
+        """
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, time.time() + ttl, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                if self.on_evict is not None:
+                    self.on_evict()
+
+    def delete(self, key) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one call, whose result (or exception) is shared by all the callers.
+    """
+
+    def __init__(self):
+        self._calls: dict[Any, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key, function):
+        """
+        Returns the result of `await function()`, unless there is already a call in flight for `key` on the same event loop, in which case its result is returned.
+        """
+        future = self._calls.get(key)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = asyncio.ensure_future(function())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._forget(key, future))
+
+        # Shield the call so that a cancelled caller does not cancel it for the other callers
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
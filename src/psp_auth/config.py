@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
 @dataclass
@@ -15,8 +15,44 @@ class AuthConfig:
             This is used to authorize any calls to the user provider if needed, for example, when you validate a token remotely.
         well_known_endpoint: The URL endpoint for OpenID configuration discovery.
             Used to fetch authentication provider metadata.
+        trusted_issuers: The issuers whose tokens are accepted, each with the URL endpoint for its OpenID configuration discovery,
+            for example, several Keycloak realms: `{"https://auth.example.com/realms/a": "http://keycloak:8080/realms/a/.well-known/openid-configuration"}`.
+            Each token is routed to the signing keys of its issuer (`iss`), and a token of any other issuer is rejected without a request to an auth provider.
+            The discovery and the signing keys of each issuer are only fetched once a token of it is validated, and are cached separately.
+            If empty, only the tokens of the issuer of `well_known_endpoint` are accepted.
+            `well_known_endpoint` is still used for token introspection.
         request_timeout: Connection and read timeout in seconds as a tuple.
             First value is connection timeout, second is read timeout.
+        jwks_cache_ttl: The time in seconds that the token signing keys (JWKS) are cached.
+        jwks_refresh_ahead: The time in seconds before `jwks_cache_ttl` runs out where the signing keys are refreshed in the background.
+        jwks_min_refetch_interval: The minimum time in seconds between refetches of the signing keys caused by a token with an unknown key ID.
+            This prevents tokens with garbage key IDs from causing a flood of requests to the auth provider.
+        token_cache_size: The maximum number of validated tokens to cache, so repeated validations of the same token skip the signature check.
+            Set to 0 to disable the cache.
+        token_cache_max_bytes: The maximum total length of the raw tokens in the validated token cache.
+        token_cache_ttl: The maximum time in seconds that a validated token is cached. A token is never cached beyond its expiry time.
+        introspection_cache_active_ttl: The time in seconds that an active introspection result is cached.
+            This is how long a revoked token may still be accepted by remote validation. An active result is never cached beyond the token's expiry time.
+            Set both this and `introspection_cache_inactive_ttl` to 0 to disable the cache.
+        introspection_cache_inactive_ttl: The time in seconds that an inactive introspection result is cached.
+        introspection_cache_size: The maximum number of introspection results in the default cache.
+        batch_max_workers: The number of threads that verify token signatures in parallel in `Auth.validate_tokens`.
+            If None, it uses the default of `concurrent.futures.ThreadPoolExecutor`.
+        verification_executor: Where `Auth.validate_token` and `Auth.validate_token_async` verify token signatures.
+            "inline" verifies them on the calling thread.
+            "thread" verifies them in a thread pool in `Auth.validate_token_async`, so the event loop is not blocked.
+            "process" verifies them in a process pool, so a single process can verify signatures on all CPU cores.
+            The signing keys are then mirrored into the worker processes, so only the token and the result cross the process boundary,
+            and `Auth.validate_tokens` also uses the process pool by default.
+        verification_max_workers: The number of threads or processes that verify token signatures, if `verification_executor` is not "inline".
+            If None, it uses the default of the executor.
+        http_max_connections: The maximum number of concurrent connections to the auth provider.
+        http_max_keepalive_connections: The maximum number of idle connections to the auth provider that are kept alive for reuse.
+        http_keepalive_expiry: The time in seconds that an idle connection is kept alive.
+        http2: Whether to use HTTP/2 for requests to the auth provider. Requires the `http2` extra.
+        token_max_length: The maximum length of a token. Longer tokens are rejected before they are parsed.
+        allowed_algorithms: The token signing algorithms (`alg`) that are accepted.
+            Tokens signed with any other algorithm are rejected before their signing key is looked up.
     """
 
     client_id: str
@@ -24,4 +60,35 @@ class AuthConfig:
     well_known_endpoint: str = (
         "http://user.psp.svc.cluster.local:8080/v1/internal/.well-known/openid-configuration"
     )
+    trusted_issuers: dict[str, str] = field(default_factory=dict)
     request_timeout: tuple[int, int] = (1, 5)
+    jwks_cache_ttl: int = 60 * 60
+    jwks_refresh_ahead: int = 60
+    jwks_min_refetch_interval: int = 10
+    token_cache_size: int = 0
+    token_cache_max_bytes: int = 16 * 1024 * 1024
+    token_cache_ttl: int = 5 * 60
+    introspection_cache_active_ttl: float = 0
+    introspection_cache_inactive_ttl: float = 0
+    introspection_cache_size: int = 10_000
+    batch_max_workers: int | None = None
+    verification_executor: str = "inline"
+    verification_max_workers: int | None = None
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2: bool = False
+    token_max_length: int = 8 * 1024
+    allowed_algorithms: tuple[str, ...] = (
+        "RS256",
+        "RS384",
+        "RS512",
+        "PS256",
+        "PS384",
+        "PS512",
+        "ES256",
+        "ES384",
+        "ES512",
+        "EdDSA",
+        "Ed25519",
+    )
@@ -1,21 +1,222 @@
-from fastapi import HTTPException
 from joserfc import jwt
-from joserfc.jwk import KeySet
+from joserfc.jwk import Key, KeySet
 from joserfc.jwt import JWTClaimsRegistry
-from joserfc.errors import InvalidClaimError, ExpiredTokenError
+from joserfc.errors import InvalidClaimError, ExpiredTokenError, JoseError
 from urllib.parse import urlparse
-import requests
-import httpx
+import asyncio
+import hashlib
 import logging
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable
 
+from .cache import (
+    AsyncSingleFlight,
+    Cache,
+    CacheBackend,
+    CachedGetter,
+    CachedValue,
+    TTLCache,
+)
 from .config import AuthConfig
 from .endpoints import OidcEndpoints
+from .instrumentation import (
+    NO_INSTRUMENTATION,
+    Instrumentation,
+    phase_timer_factory,
+    timed_fetch,
+    timed_fetch_async,
+)
+from .prevalidation import TokenPrevalidator
+from .refresher import Refresher
+from .shared_cache import SharedCache
 from .token import Token
+from .verification import ProcessVerifier, create_verifier, decode_token, import_keys
 from .errors import AuthException, AuthExceptionType
 
+if TYPE_CHECKING:
+    import httpx
+
+    from .revocation import RevocationList
+
 logger = logging.getLogger(__name__)
 
 
+def _token_hash(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _expires_within(token: Token, seconds: float) -> bool:
+    return "exp" in token.claims and token.expires_at <= time.time() + seconds
+
+
+def _lookup_key(
+    keys: tuple[KeySet, dict[str, Key]] | None, kid: str | None
+) -> Key | KeySet | None:
+    if keys is None:
+        return None
+
+    key_set, keys_by_kid = keys
+    if kid is None:
+        return key_set
+    return keys_by_kid.get(kid)
+
+
+def _found_key(key: Key | KeySet | None) -> Key | KeySet:
+    if key is None:
+        raise AuthException(
+            AuthExceptionType.UNKNOWN_KEY,
+            "The token is signed with an unknown key",
+        )
+    return key
+
+
+def _portable_key(key: Key | KeySet, executor: Executor) -> Key | KeySet | dict:
+    if isinstance(executor, ProcessPoolExecutor):
+        return key.as_dict(private=False)
+    return key
+
+
+class _KeyCache:
+    """
+    Caches the imported token signing keys, indexed by their key ID (`kid`).
+
+    The keys are refreshed in the background when they are about to expire.
+    A token with an unknown key ID forces a refetch, but at most once every `min_refetch_interval` seconds.
+
+    With a shared cache, the keys are taken from it when another process fetched them more recently than this one,
+    and are only fetched from the auth provider otherwise.
+    The keys expire after the lifetime that the auth provider gave them (`max_age`), if any, and after `ttl` otherwise.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], dict],
+        fetch_async: Callable[[], Awaitable[dict]],
+        ttl: float,
+        refresh_ahead: float,
+        min_refetch_interval: float,
+        instrumentation: Instrumentation = NO_INSTRUMENTATION,
+        shared: SharedCache | None = None,
+        max_age: Callable[[], float | None] = lambda: None,
+    ):
+        self._fetch = fetch
+        self._fetch_async = fetch_async
+        self._max_age = max_age
+        self._certs: dict | None = None
+        self._version = 0
+        self._min_refetch_interval = min_refetch_interval
+        self._instrumentation = instrumentation
+        self._shared = shared
+        self._ttl = ttl
+        self._refresh_ahead = refresh_ahead
+        self._keys = CachedGetter(
+            self._fetch_keys,
+            ttl,
+            async_getter=self._fetch_keys_async,
+            refresh_ahead=refresh_ahead,
+        )
+
+    def _fetch_keys(self) -> tuple[KeySet, dict[str, Key]] | CachedValue:
+        if self._shared is not None:
+            shared = self._shared.get_certs()
+            if shared is not None and shared[1] > self._keys.last_update:
+                return CachedValue(self._import(shared[0]), shared[1], shared[2])
+
+        fetched_at = time.time()
+        certs = self._fetch()
+        lifetime = self._lifetime()
+        if self._shared is not None:
+            self._shared.set_certs(
+                certs, fetched_at, lifetime, self._shared_ttl(lifetime)
+            )
+        return CachedValue(self._import(certs), fetched_at, lifetime)
+
+    async def _fetch_keys_async(self) -> tuple[KeySet, dict[str, Key]] | CachedValue:
+        if self._shared is not None:
+            shared = await self._shared.get_certs_async()
+            if shared is not None and shared[1] > self._keys.last_update:
+                return CachedValue(self._import(shared[0]), shared[1], shared[2])
+
+        fetched_at = time.time()
+        certs = await self._fetch_async()
+        lifetime = self._lifetime()
+        if self._shared is not None:
+            await self._shared.set_certs_async(
+                certs, fetched_at, lifetime, self._shared_ttl(lifetime)
+            )
+        return CachedValue(self._import(certs), fetched_at, lifetime)
+
+    def _lifetime(self) -> float:
+        # The lifetime that the auth provider gave the keys, if any, which is shared with them so every process agrees on it
+        max_age = self._max_age()
+        return self._ttl if max_age is None else max_age
+
+    def _shared_ttl(self, lifetime: float) -> float:
+        # Shared keys are only taken while they are not yet due for a refresh
+        return max(1, lifetime - min(self._refresh_ahead, lifetime / 2))
+
+    def _import(self, certs: dict) -> tuple[KeySet, dict[str, Key]]:
+        # Unchanged keys (a 304 response) do not have to be imported again
+        if certs is self._certs and self._keys.has_value:
+            return self._keys.value
+
+        keys = import_keys(certs)
+        self._certs = certs
+        self._version += 1
+        return keys
+
+    def mirror(self) -> tuple[int, dict]:
+        """
+        Returns the version and the JWKS of the current keys, so they can be mirrored into other processes.
+        The version changes whenever the keys change.
+        """
+        return self._version, self._certs
+
+    def get(self, kid: str | None) -> Key | KeySet:
+        """
+        Returns the key with the given key ID.
+        If `kid` is None, the whole key set is returned.
+
+        Raises:
+        - AuthException if there is no key with the given key ID.
+        """
+        key = _lookup_key(self._keys.get(), kid)
+        if key is None:
+            self._instrumentation.cache("jwks", "miss")
+            self._keys.update(max_age=self._min_refetch_interval)
+            key = _lookup_key(self._keys.value, kid)
+        else:
+            self._instrumentation.cache("jwks", "hit")
+
+        return _found_key(key)
+
+    async def get_async(self, kid: str | None) -> Key | KeySet:
+        """
+        The same as `_KeyCache.get`, except that the keys are fetched without blocking the event loop.
+        """
+        key = _lookup_key(await self._keys.get_async(), kid)
+        if key is None:
+            self._instrumentation.cache("jwks", "miss")
+            await self._keys.update_async(max_age=self._min_refetch_interval)
+            key = _lookup_key(self._keys.value, kid)
+        else:
+            self._instrumentation.cache("jwks", "hit")
+
+        return _found_key(key)
+
+    @property
+    def has_keys(self) -> bool:
+        return self._keys.has_value
+
+    def update(self) -> None:
+        self._keys.update()
+
+    async def update_async(self) -> None:
+        await self._keys.update_async()
+
+
 class Auth:
     """
     Implements authentication and authorisation.
@@ -25,35 +226,699 @@ class Auth:
     logger: any
     _endpoints: OidcEndpoints
 
-    def __init__(self, config: AuthConfig):
+    def __init__(
+        self,
+        config: AuthConfig,
+        introspection_cache: Cache | None = None,
+        instrumentation: Instrumentation | None = None,
+        cache_backend: CacheBackend | None = None,
+        revocations: "RevocationList | None" = None,
+    ):
         """
         Args:
             config: The auth configuration.
+            introspection_cache: The cache for the results of `Auth.validate_token_remotely`.
+                By default, an in-memory cache is used if the introspection cache TTLs in `config` are set.
+            instrumentation: Receives the metrics, for example, a `PrometheusInstrumentation`.
+                By default, no metrics are recorded.
+            cache_backend: A cache that is shared with other processes, for example, the other workers of the service.
+                The validated tokens, the introspection results (if the introspection cache TTLs in `config` are set, and no `introspection_cache` is given)
+                and the token signing keys are stored in it. See `psp_auth.backends`.
+                Only use a backend that is trusted, since a validated token in it is accepted without checking its signature.
+            revocations: A local denylist of revoked tokens and sessions, which is checked on every validation, including of cached tokens.
+                Keep it in sync with a `psp_auth.revocation.RevocationFeed`.
         """
         self.config = config
+        self._instrumentation = instrumentation or NO_INSTRUMENTATION
+        self._revocations = revocations
+        self._shared = (
+            SharedCache(
+                cache_backend,
+                self.config.client_id,
+                self.config.well_known_endpoint,
+                self._instrumentation,
+            )
+            if cache_backend is not None
+            else None
+        )
+        self._phase_timer = phase_timer_factory(self._instrumentation)
+        self._client = None
+        self._async_client = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+        self._client_lock = threading.Lock()
         self._endpoints = OidcEndpoints(
-            self.config.well_known_endpoint, self.config.request_timeout
+            self.config.well_known_endpoint,
+            self._get_client,
+            self._get_async_client,
+            instrumentation=self._instrumentation,
+            min_certs_max_age=self.config.jwks_min_refetch_interval,
         )
+        self._keys = _KeyCache(
+            timed_fetch(self._instrumentation, "jwks", lambda: self.token_certs()),
+            timed_fetch_async(
+                self._instrumentation, "jwks", lambda: self.token_certs_async()
+            ),
+            ttl=self.config.jwks_cache_ttl,
+            refresh_ahead=self.config.jwks_refresh_ahead,
+            min_refetch_interval=self.config.jwks_min_refetch_interval,
+            instrumentation=self._instrumentation,
+            shared=self._shared,
+            max_age=lambda: self._endpoints.certs_max_age,
+        )
+        # The endpoints and the keys of each trusted issuer, so a token is routed by its issuer and then by its key ID to exactly one key
+        self._trusted_issuers = {
+            issuer: self._create_issuer_keys(well_known_endpoint, cache_backend)
+            for issuer, well_known_endpoint in self.config.trusted_issuers.items()
+        }
+        self._token_cache = (
+            TTLCache(
+                self.config.token_cache_size,
+                max_bytes=self.config.token_cache_max_bytes,
+                on_evict=lambda: self._instrumentation.cache("token", "eviction"),
+            )
+            if self.config.token_cache_size > 0
+            else None
+        )
+        if (
+            introspection_cache is None
+            and self._shared is None
+            and self._is_introspection_cached()
+        ):
+            introspection_cache = TTLCache(
+                self.config.introspection_cache_size,
+                on_evict=lambda: self._instrumentation.cache(
+                    "introspection", "eviction"
+                ),
+            )
+        self._introspection_cache = introspection_cache
+        self._prevalidator = TokenPrevalidator(
+            self.config.token_max_length, self.config.allowed_algorithms
+        )
+        self._introspections = AsyncSingleFlight()
+        self._batch_executor: Executor | None = None
+        self._verifier = create_verifier(
+            self.config.verification_executor,
+            self.config.allowed_algorithms,
+            self._mirror_keys,
+            max_workers=self.config.verification_max_workers,
+        )
+        self._refresher = Refresher(
+            self.prefetch,
+            interval=max(
+                1, self.config.jwks_cache_ttl - self.config.jwks_refresh_ahead
+            ),
+            retry_interval=self.config.jwks_min_refetch_interval,
+        )
+
+    def _create_issuer_keys(
+        self, well_known_endpoint: str, cache_backend: CacheBackend | None
+    ) -> tuple[OidcEndpoints, _KeyCache]:
+        """
+        Creates the endpoints and the key cache of a trusted issuer. Nothing is fetched until they are used.
+        """
+        endpoints = OidcEndpoints(
+            well_known_endpoint,
+            self._get_client,
+            self._get_async_client,
+            instrumentation=self._instrumentation,
+            min_certs_max_age=self.config.jwks_min_refetch_interval,
+        )
+        keys = _KeyCache(
+            timed_fetch(self._instrumentation, "jwks", endpoints.fetch_certs),
+            timed_fetch_async(
+                self._instrumentation, "jwks", endpoints.fetch_certs_async
+            ),
+            ttl=self.config.jwks_cache_ttl,
+            refresh_ahead=self.config.jwks_refresh_ahead,
+            min_refetch_interval=self.config.jwks_min_refetch_interval,
+            instrumentation=self._instrumentation,
+            shared=SharedCache(
+                cache_backend,
+                self.config.client_id,
+                well_known_endpoint,
+                self._instrumentation,
+            )
+            if cache_backend is not None
+            else None,
+            max_age=lambda: endpoints.certs_max_age,
+        )
+        return endpoints, keys
+
+    def _key_sources(self) -> list[tuple[OidcEndpoints, _KeyCache]]:
+        if self._trusted_issuers:
+            return list(self._trusted_issuers.values())
+        return [(self._endpoints, self._keys)]
+
+    def _mirror_keys(self, issuer: str | None) -> tuple[int, dict]:
+        if issuer is None:
+            return self._keys.mirror()
+        return self._trusted_issuers[issuer][1].mirror()
 
     def _resource(self) -> str:
         return self.config.client_id
 
+    def _http_client_options(self) -> dict:
+        # httpx is only imported once the auth provider is contacted
+        import httpx
+
+        connect_timeout, read_timeout = self.config.request_timeout
+        return {
+            "timeout": httpx.Timeout(read_timeout, connect=connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=self.config.http_max_connections,
+                max_keepalive_connections=self.config.http_max_keepalive_connections,
+                keepalive_expiry=self.config.http_keepalive_expiry,
+            ),
+            "http2": self.config.http2,
+        }
+
+    def _get_client(self) -> "httpx.Client":
+        """
+        Returns the pooled HTTP client that is used for all sync requests to the auth provider.
+        It is created on first use and lives until `Auth.close` or `Auth.aclose` is called.
+        """
+        if self._client is None:
+            import httpx
+
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._http_client_options())
+        return self._client
+
+    def _get_async_client(self) -> "httpx.AsyncClient":
+        """
+        Returns the pooled HTTP client that is used for all async requests to the auth provider.
+        It is created on first use and lives until `Auth.aclose` is called.
+        The client belongs to the event loop that created it, so another event loop gets a new client.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            import httpx
+
+            self._async_client = httpx.AsyncClient(**self._http_client_options())
+            self._async_loop = loop
+        return self._async_client
+
+    def close(self) -> None:
+        """
+        Closes the pooled sync HTTP client and the verification and batch executors. They are recreated if they are needed again.
+        Use `Auth.aclose` instead to also close the async HTTP client.
+        """
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False)
+            self._batch_executor = None
+        self._verifier.close()
+
+    async def aclose(self) -> None:
+        """
+        Closes the pooled HTTP clients and the verification and batch executors. They are recreated if they are needed again.
+        You should call this when your application shuts down, for example, in the FastAPI lifespan.
+        """
+        self.close()
+        if self._async_client is not None:
+            client, loop = self._async_client, self._async_loop
+            self._async_client = self._async_loop = None
+            # A client of another event loop can only be closed by that loop
+            if loop is asyncio.get_running_loop():
+                await client.aclose()
+
+    def _get_batch_executor(self) -> Executor:
+        # The process pool of the verifier is reused rather than starting another one
+        if isinstance(self._verifier, ProcessVerifier):
+            return self._verifier.executor()
+        if self._batch_executor is None:
+            self._batch_executor = ThreadPoolExecutor(
+                max_workers=self.config.batch_max_workers,
+                thread_name_prefix="psp-auth-batch",
+            )
+        return self._batch_executor
+
+    @property
+    def is_ready(self) -> bool:
+        """
+        Whether the auth provider metadata and the token signing keys have been fetched, so tokens can be validated without waiting for the auth provider.
+        With `AuthConfig.trusted_issuers`, this is the case once they have been fetched for every trusted issuer.
+        This can be used for readiness probes.
+        """
+        return all(
+            endpoints.has_metadata and keys.has_keys
+            for endpoints, keys in self._key_sources()
+        )
+
+    def prefetch(self) -> None:
+        """
+        Fetches the auth provider metadata and the token signing keys, so that the first requests do not have to wait for them.
+        With `AuthConfig.trusted_issuers`, they are fetched for every trusted issuer.
+        """
+        for endpoints, keys in self._key_sources():
+            endpoints.update()
+            keys.update()
+
+    async def prefetch_async(self) -> None:
+        """
+        The same as `Auth.prefetch`, except that it does not block the event loop.
+        """
+        for endpoints, keys in self._key_sources():
+            await endpoints.update_async()
+            await keys.update_async()
+
+    def start(self) -> None:
+        """
+        Prefetches the auth provider metadata and the token signing keys, and keeps refreshing them in a background thread ahead of their expiry.
+        If the prefetch fails, it is retried in the background, and `Auth.is_ready` stays False until it succeeds.
+        """
+        try:
+            self.prefetch()
+        except Exception:
+            logger.exception("Failed to prefetch the auth provider metadata and keys")
+            self._start_refresher(is_prefetched=False)
+        else:
+            self._start_refresher(is_prefetched=True)
+
+    async def start_async(self) -> None:
+        """
+        The same as `Auth.start`, except that the prefetch does not block the event loop.
+        This is intended for the FastAPI lifespan.
+        """
+        try:
+            await self.prefetch_async()
+        except Exception:
+            logger.exception("Failed to prefetch the auth provider metadata and keys")
+            self._start_refresher(is_prefetched=False)
+        else:
+            self._start_refresher(is_prefetched=True)
+
+    def _start_refresher(self, is_prefetched: bool) -> None:
+        self._refresher.start(
+            delay=self._refresher.interval
+            if is_prefetched
+            else self._refresher.retry_interval
+        )
+
+    def stop(self) -> None:
+        """
+        Stops the background refresh started by `Auth.start`.
+        """
+        self._refresher.stop()
+
+    async def __aenter__(self) -> "Auth":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.stop()
+        await self.aclose()
+
     def token_certs(self) -> dict:
-        return requests.get(
-            self._endpoints.certs(), timeout=self.config.request_timeout
-        ).json()
+        """
+        Fetches the token signing keys (JWKS) from the auth provider.
+        Use `Auth.token_key` to get a cached key instead.
+        """
+        return self._endpoints.fetch_certs()
+
+    async def token_certs_async(self) -> dict:
+        """
+        The same as `Auth.token_certs`, except that it does not block the event loop.
+        """
+        return await self._endpoints.fetch_certs_async()
+
+    def token_key(self, kid: str | None) -> Key | KeySet:
+        """
+        Returns the cached token signing key with the given key ID.
+        """
+        return self._keys.get(kid)
+
+    async def token_key_async(self, kid: str | None) -> Key | KeySet:
+        """
+        The same as `Auth.token_key`, except that it does not block the event loop.
+        """
+        return await self._keys.get_async(kid)
 
     def token_issuer(self) -> str:
         return self._endpoints.issuer()
 
+    async def token_issuer_async(self) -> str:
+        return await self._endpoints.issuer_async()
+
+    def _trusted_issuer(self, claims: dict) -> str | None:
+        """
+        Returns the trusted issuer of a token according to its unverified claims, or None if `AuthConfig.trusted_issuers` is not set.
+        The issuer is verified with the other claims once the signature is verified.
+
+        Raises:
+        - AuthException if the issuer is not trusted.
+        """
+        if not self._trusted_issuers:
+            return None
+
+        issuer = claims.get("iss")
+        if not isinstance(issuer, str) or issuer not in self._trusted_issuers:
+            raise AuthException(
+                AuthExceptionType.UNAUTHORIZED, "The issuer is not trusted"
+            )
+        return issuer
+
+    def _issuer_key(self, issuer: str | None, kid: str | None) -> Key | KeySet:
+        if issuer is None:
+            return self.token_key(kid)
+        return self._trusted_issuers[issuer][1].get(kid)
+
+    async def _issuer_key_async(
+        self, issuer: str | None, kid: str | None
+    ) -> Key | KeySet:
+        if issuer is None:
+            return await self.token_key_async(kid)
+        return await self._trusted_issuers[issuer][1].get_async(kid)
+
+    def _expected_issuer(self, issuer: str | None) -> str:
+        return self.token_issuer() if issuer is None else issuer
+
+    async def _expected_issuer_async(self, issuer: str | None) -> str:
+        return await self.token_issuer_async() if issuer is None else issuer
+
     def validate_token(self, token: str) -> Token:
         """
         Authorizes the token locally and returns it.
+        Malformed and obviously invalid tokens, and tokens of issuers that are not trusted, are rejected before the signing key is looked up.
+
+        Raises:
+        - AuthException if the token is invalid or revoked.
+        """
+        try:
+            validated_token = self._validate_token(token)
+            if self._revocations is not None:
+                self._revocations.check(validated_token.claims)
+            return validated_token
+        except AuthException as e:
+            self._instrumentation.rejection(e.type)
+            raise
+        except (JoseError, ValueError) as e:
+            self._instrumentation.rejection(AuthExceptionType.UNAUTHORIZED)
+            raise AuthException(
+                AuthExceptionType.UNAUTHORIZED, f"The token is invalid: {e}"
+            ) from e
+
+    def _validate_token(self, token: str) -> Token:
+        self._prevalidator.check_length(token)
+        cache_key = self._token_cache_key(token)
+        cached_token = self._cached_token(cache_key)
+        if cached_token is not None:
+            return cached_token
+        if self._shared is not None:
+            shared_token = self._shared_token(self._shared.get_token(cache_key))
+            if shared_token is not None:
+                self._cache_token(cache_key, shared_token, token)
+                return shared_token
+
+        phases = self._phase_timer()
+        header, claims = self._prevalidator.parse(token)
+        phases.lap("parse")
+        kid = header.get("kid")
+        trusted_issuer = self._trusted_issuer(claims)
+        key = self._issuer_key(trusted_issuer, kid)
+        issuer = self._expected_issuer(trusted_issuer)
+        phases.lap("key_lookup")
+        decoded_token = self._verifier.verify(token, kid, key, trusted_issuer)
+        phases.lap("signature")
+        validated_token = self._validate_claims(decoded_token, issuer)
+        phases.lap("claims")
+        self._cache_token(cache_key, validated_token, token)
+        if self._shared is not None:
+            self._shared.set_token(
+                cache_key,
+                decoded_token.header,
+                decoded_token.claims,
+                self._token_cache_ttl(validated_token),
+            )
+        return validated_token
+
+    async def validate_token_async(self, token: str) -> Token:
+        """
+        The same as `Auth.validate_token`, except that any requests to the auth provider do not block the event loop.
+        """
+        try:
+            validated_token = await self._validate_token_async(token)
+            if self._revocations is not None:
+                self._revocations.check(validated_token.claims)
+            return validated_token
+        except AuthException as e:
+            self._instrumentation.rejection(e.type)
+            raise
+        except (JoseError, ValueError) as e:
+            self._instrumentation.rejection(AuthExceptionType.UNAUTHORIZED)
+            raise AuthException(
+                AuthExceptionType.UNAUTHORIZED, f"The token is invalid: {e}"
+            ) from e
+
+    async def _validate_token_async(self, token: str) -> Token:
+        self._prevalidator.check_length(token)
+        cache_key = self._token_cache_key(token)
+        cached_token = self._cached_token(cache_key)
+        if cached_token is not None:
+            return cached_token
+        if self._shared is not None:
+            shared_token = self._shared_token(
+                await self._shared.get_token_async(cache_key)
+            )
+            if shared_token is not None:
+                self._cache_token(cache_key, shared_token, token)
+                return shared_token
+
+        phases = self._phase_timer()
+        header, claims = self._prevalidator.parse(token)
+        phases.lap("parse")
+        kid = header.get("kid")
+        trusted_issuer = self._trusted_issuer(claims)
+        key = await self._issuer_key_async(trusted_issuer, kid)
+        issuer = await self._expected_issuer_async(trusted_issuer)
+        phases.lap("key_lookup")
+        decoded_token = await self._verifier.verify_async(
+            token, kid, key, trusted_issuer
+        )
+        phases.lap("signature")
+        validated_token = self._validate_claims(decoded_token, issuer)
+        phases.lap("claims")
+        self._cache_token(cache_key, validated_token, token)
+        if self._shared is not None:
+            await self._shared.set_token_async(
+                cache_key,
+                decoded_token.header,
+                decoded_token.claims,
+                self._token_cache_ttl(validated_token),
+            )
+        return validated_token
+
+    def validate_tokens(
+        self, tokens: Iterable[str], executor: Executor | None = None
+    ) -> list[Token | AuthException]:
+        """
+        Authorizes a batch of tokens locally, for example, the tokens of a batch of messages.
+        Identical tokens are only validated once, the key for each issuer and key ID is only looked up once,
+        and the signatures are verified in parallel.
+
+        Args:
+            tokens: The tokens to validate.
+            executor: The executor that verifies the signatures. This can also be a `ProcessPoolExecutor`.
+                By default, a thread pool with `AuthConfig.batch_max_workers` workers is used.
+
+        Returns:
+            For each token in `tokens`, in the same order, either the validated token or the AuthException why it is invalid.
+        """
+        tokens = list(tokens)
+        results, routes = self._start_batch(tokens)
+        if routes:
+            keys = {}
+            for route in set(routes.values()):
+                try:
+                    keys[route] = self._issuer_key(*route)
+                except AuthException as e:
+                    keys[route] = e
+            issuers = {
+                trusted_issuer: self._expected_issuer(trusted_issuer)
+                for trusted_issuer in {trusted_issuer for trusted_issuer, _ in keys}
+            }
+
+            executor = executor or self._get_batch_executor()
+            decodings = self._submit_batch(
+                results, routes, keys, executor.submit, executor
+            )
+            for token, decoding in decodings.items():
+                results[token] = self._finish_batch_token(
+                    token, decoding.result, issuers[routes[token][0]]
+                )
+
+        return self._batch_results(tokens, results)
+
+    async def validate_tokens_async(
+        self, tokens: Iterable[str], executor: Executor | None = None
+    ) -> list[Token | AuthException]:
+        """
+        The same as `Auth.validate_tokens`, except that it does not block the event loop.
+        """
+        tokens = list(tokens)
+        results, routes = self._start_batch(tokens)
+        if routes:
+            keys = {}
+            for route in set(routes.values()):
+                try:
+                    keys[route] = await self._issuer_key_async(*route)
+                except AuthException as e:
+                    keys[route] = e
+            issuers = {
+                trusted_issuer: await self._expected_issuer_async(trusted_issuer)
+                for trusted_issuer in {trusted_issuer for trusted_issuer, _ in keys}
+            }
+
+            executor = executor or self._get_batch_executor()
+            loop = asyncio.get_running_loop()
+
+            def submit(function, *args) -> asyncio.Future:
+                return loop.run_in_executor(executor, function, *args)
+
+            decodings = self._submit_batch(results, routes, keys, submit, executor)
+            await asyncio.gather(*decodings.values(), return_exceptions=True)
+            for token, decoding in decodings.items():
+                results[token] = self._finish_batch_token(
+                    token, decoding.result, issuers[routes[token][0]]
+                )
+
+        return self._batch_results(tokens, results)
+
+    def _batch_results(
+        self, tokens: list[str], results: dict[str, Token | AuthException]
+    ) -> list[Token | AuthException]:
+        if self._revocations is not None:
+            for token, result in results.items():
+                if isinstance(result, Token):
+                    try:
+                        self._revocations.check(result.claims)
+                    except AuthException as e:
+                        results[token] = e
+
+        for result in results.values():
+            if isinstance(result, AuthException):
+                self._instrumentation.rejection(result.type)
+        return [results[token] for token in tokens]
+
+    def _start_batch(
+        self, tokens: list[str]
+    ) -> tuple[
+        dict[str, Token | AuthException], dict[str, tuple[str | None, str | None]]
+    ]:
+        """
+        Returns the results of the tokens that are cached or rejected by the prevalidation,
+        and the trusted issuer and the key ID of each remaining token.
+        """
+        results = {}
+        routes = {}
+        for token in dict.fromkeys(tokens):
+            try:
+                self._prevalidator.check_length(token)
+                cached_token = self._cached_token(self._token_cache_key(token))
+                if cached_token is not None:
+                    results[token] = cached_token
+                else:
+                    header, claims = self._prevalidator.parse(token)
+                    routes[token] = (self._trusted_issuer(claims), header.get("kid"))
+            except AuthException as e:
+                results[token] = e
+        return results, routes
+
+    def _submit_batch(
+        self,
+        results: dict[str, Token | AuthException],
+        routes: dict[str, tuple[str | None, str | None]],
+        keys: dict[tuple[str | None, str | None], Key | KeySet | AuthException],
+        submit: Callable[..., Future | asyncio.Future],
+        executor: Executor,
+    ) -> dict[str, Future | asyncio.Future]:
+        """
+        Submits the signature verification of each token to the executor.
+        The tokens signed with an unknown key are added to `results` instead.
+        """
+        decodings = {}
+        portable_keys = {}
+        for token, route in routes.items():
+            key = keys[route]
+            if isinstance(key, AuthException):
+                results[token] = key
+                continue
+
+            if route not in portable_keys:
+                portable_keys[route] = _portable_key(key, executor)
+            decodings[token] = submit(
+                decode_token,
+                token,
+                portable_keys[route],
+                self.config.allowed_algorithms,
+            )
+        return decodings
+
+    def _finish_batch_token(
+        self, token: str, decoding: Callable[[], tuple[dict, dict]], issuer: str
+    ) -> Token | AuthException:
+        try:
+            header, claims = decoding()
+            validated_token = self._validate_claims(jwt.Token(header, claims), issuer)
+        except AuthException as e:
+            return e
+        except (JoseError, ValueError) as e:
+            return AuthException(
+                AuthExceptionType.UNAUTHORIZED, f"The token is invalid: {e}"
+            )
+
+        self._cache_token(self._token_cache_key(token), validated_token, token)
+        return validated_token
+
+    def _token_cache_key(self, token: str) -> bytes | None:
+        if self._token_cache is None and self._shared is None:
+            return None
+        return _token_hash(token)
+
+    def _cached_token(self, cache_key: bytes | None) -> Token | None:
+        if cache_key is None or self._token_cache is None:
+            return None
+
+        cached_token = self._token_cache.get(cache_key)
+        self._instrumentation.cache("token", "miss" if cached_token is None else "hit")
+        # The cache entry never outlives the expiry, but check it anyway to be safe
+        if cached_token is not None and _expires_within(cached_token, 0):
+            raise AuthException(AuthExceptionType.TOKEN_EXPIRED, "The token is expired")
+        return cached_token
+
+    def _cache_token(self, cache_key: bytes | None, token: Token, raw: str) -> None:
+        if cache_key is None or self._token_cache is None:
+            return
+        self._token_cache.set(
+            cache_key, token, self._token_cache_ttl(token), size=len(raw)
+        )
+
+    def _token_cache_ttl(self, token: Token) -> float:
+        ttl = self.config.token_cache_ttl
+        if "exp" in token.claims:
+            ttl = min(ttl, token.expires_at - time.time())
+        return ttl
+
+    def _shared_token(self, entry: tuple[dict, dict] | None) -> Token | None:
         """
-        key_set = KeySet.import_key_set(self.token_certs())
-        token = jwt.decode(token, key_set)
+        Returns the token that another process validated and stored in the shared cache.
+        """
+        if entry is None:
+            return None
+
+        header, claims = entry
+        token = Token(jwt.Token(header, claims), self._resource())
+        # The cache entry never outlives the expiry, but check it anyway to be safe
+        if _expires_within(token, 0):
+            return None
+        return token
+
+    def _validate_claims(self, token: jwt.Token, issuer: str) -> Token:
         claims_requests = JWTClaimsRegistry(
-            iss={"essential": True, "value": self.token_issuer()},
+            iss={"essential": True, "value": issuer},
             aud={"essential": True, "value": self._resource()},
         )
 
@@ -63,7 +928,11 @@ class Auth:
             if e.claim == "aud":
                 detail = f"The audience does not contain {self._resource()}"
             elif e.claim == "iss":
-                detail = f"The issuer is not {self.token_issuer()}"
+                detail = f"The issuer is not {issuer}"
+            elif e.claim == "nbf":
+                raise AuthException(
+                    AuthExceptionType.TOKEN_NOT_YET_VALID, "The token is not yet valid"
+                )
             else:
                 raise e
             raise AuthException(AuthExceptionType.FORBIDDEN, detail)
@@ -74,39 +943,43 @@ class Auth:
 
     def get_token(self, auth_header: str) -> str:
         """
+        Returns the token in an Authorization header.
+
         Raises:
-        - If `auth_header` has incorrect format, it will raise an HTTPException.
+        - AuthException if `auth_header` is not in the "Bearer <token>" format.
         """
         # Extract token from "Bearer <token>"
         parts = auth_header.split()
 
         if len(parts) != 2 or parts[0].lower() != "bearer":
-            raise HTTPException(status_code=401, detail="Invalid Authorization header")
+            raise AuthException(
+                AuthExceptionType.UNAUTHORIZED, "Invalid Authorization header"
+            )
 
         return parts[1]
 
-    async def _make_introspection_request(self, token: str) -> httpx.Response:
-        url = self._endpoints.introspection()
+    async def _make_introspection_request(self, token: str) -> "httpx.Response":
+        url = await self._endpoints.introspection_async()
         data = {
             "token": token,
             "token_type_hint": "access_token",  # nosec B105
         }
-        timeout = httpx.Timeout(10.0, connect=5.0)
-        host = urlparse(self._endpoints.issuer()).netloc
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            return await client.post(
-                url,
-                data=data,
-                auth=(self.config.client_id, self.config.client_secret),
-                headers={
-                    "Host": host,
-                },
-            )
+        host = urlparse(await self._endpoints.issuer_async()).netloc
+        return await self._get_async_client().post(
+            url,
+            data=data,
+            auth=(self.config.client_id, self.config.client_secret),
+            headers={
+                "Host": host,
+            },
+        )
 
     async def validate_token_remotely(self, token: str) -> bool:
         """
         Authorizes the token remotely to verify that it has not been revoked.
         This is also called token introspection.
+        JWTs that are obviously invalid, for example, expired, are reported as inactive without a request to the auth provider.
+        Tokens that are not JWTs, like opaque tokens, are always introspected.
         """
         if self.config.client_secret is None:
             raise ValueError(
@@ -114,8 +987,84 @@ class Auth:
                 "Please provide client_secret in the configuration."
             )
 
-        response = await self._make_introspection_request(token)
+        try:
+            _, claims = self._prevalidator.parse(token)
+        except AuthException as e:
+            if e.type != AuthExceptionType.MALFORMED_TOKEN:
+                return False
+            # The auth provider may issue opaque tokens, which only it can check
+            claims = {}
+        # The unverified expiry, which caps the cached result if the response has none
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            expires_at = None
+
+        cache_key = _token_hash(token)
+        is_active = await self._cached_introspection(cache_key)
+        if is_active is not None:
+            return is_active
+
+        # Concurrent validations of the same token share one introspection request
+        return await self._introspections.run(
+            cache_key, lambda: self._introspect(token, cache_key, expires_at)
+        )
+
+    async def _introspect(
+        self, token: str, cache_key: bytes, token_expires_at: float | None
+    ) -> bool:
+        start = time.perf_counter()
+        try:
+            response = await self._make_introspection_request(token)
+        except Exception:
+            self._instrumentation.introspection(time.perf_counter() - start, None)
+            raise
+        self._instrumentation.introspection(
+            time.perf_counter() - start, response.status_code
+        )
+        is_active, expires_at = self._introspection_result(response)
+        if expires_at is None:
+            expires_at = token_expires_at
+        await self._cache_introspection(cache_key, is_active, expires_at)
+        return is_active
+
+    def _is_introspection_cached(self) -> bool:
+        return (
+            self.config.introspection_cache_active_ttl > 0
+            or self.config.introspection_cache_inactive_ttl > 0
+        )
+
+    async def _cached_introspection(self, cache_key: bytes) -> bool | None:
+        if self._introspection_cache is not None:
+            is_active = self._introspection_cache.get(cache_key)
+            self._instrumentation.cache(
+                "introspection", "miss" if is_active is None else "hit"
+            )
+            return is_active
+        if self._shared is not None and self._is_introspection_cached():
+            return await self._shared.get_introspection_async(cache_key)
+        return None
+
+    async def _cache_introspection(
+        self, cache_key: bytes, is_active: bool, expires_at: int | None
+    ) -> None:
+        if is_active:
+            ttl = self.config.introspection_cache_active_ttl
+            if expires_at is not None:
+                ttl = min(ttl, expires_at - time.time())
+        else:
+            ttl = self.config.introspection_cache_inactive_ttl
 
+        if self._introspection_cache is not None:
+            self._introspection_cache.set(cache_key, is_active, ttl)
+        elif self._shared is not None and self._is_introspection_cached():
+            await self._shared.set_introspection_async(cache_key, is_active, ttl)
+
+    def _introspection_result(
+        self, response: "httpx.Response"
+    ) -> tuple[bool, int | None]:
+        """
+        Returns whether the token is active and when it expires, according to the introspection response.
+        """
         if response.status_code == 401:
             logger.error("Invalid client credentials")
         elif response.status_code == 403:
@@ -126,6 +1075,6 @@ class Auth:
 
         if "active" not in json:
             logger.warning("'active' was not in the introspection response")
-            return False
+            return False, None
 
-        return json["active"] is True
+        return json["active"] is True, json.get("exp")
@@ -1,29 +1,204 @@
-from .cache import CachedGetter
-import requests
+import re
+import time
+from typing import TYPE_CHECKING, Callable, NamedTuple
 
+from .cache import CachedGetter, CachedValue
+from .instrumentation import (
+    NO_INSTRUMENTATION,
+    Instrumentation,
+    timed_fetch,
+    timed_fetch_async,
+)
 
-def _request_metadata(url: str, timeout: tuple[int, int]) -> dict:
-    response = requests.get(url, timeout=timeout)
-    return response.json()
+if TYPE_CHECKING:
+    import httpx
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)\"?\s*(?:,|$)", re.IGNORECASE)
+_NO_CACHE = re.compile(r"(?:^|,)\s*(?:no-cache|no-store)\s*(?:,|$)", re.IGNORECASE)
+
+
+class _Document(NamedTuple):
+    url: str
+    value: dict
+    etag: str | None
+    max_age: float | None
+
+
+class ConditionalDocument:
+    """
+    A JSON document on the auth provider, like the OpenID configuration or the token signing keys (JWKS),
+    which is fetched with conditional requests.
+
+    Once the document has been fetched, it is only downloaded again if it has changed (`ETag`/`If-None-Match`),
+    and a `304 Not Modified` response returns the previous document. The lifetime that the auth provider
+    gives the document with `Cache-Control: max-age` is available as `max_age`.
+    A response with any other status than 2xx or 304 raises an error, so the caller keeps the previous document.
+
+    :param url: The URL of the document, or a function that returns it.
+    :param min_max_age: The minimum lifetime in seconds, so a short `max-age` does not cause a request on every use.
+    """
+
+    def __init__(self, url: str | Callable[[], str], min_max_age: float = 0):
+        self._url = url
+        self._min_max_age = min_max_age
+        self._document: _Document | None = None
+
+    @property
+    def max_age(self) -> float | None:
+        """
+        The lifetime in seconds of the last fetched document, or None if the auth provider did not give one.
+        """
+        document = self._document
+        return document.max_age if document is not None else None
+
+    @staticmethod
+    def _request_headers(url: str, previous: _Document | None) -> dict[str, str]:
+        if previous is None or previous.etag is None or previous.url != url:
+            return {}
+        return {"If-None-Match": previous.etag}
+
+    def _handle_response(
+        self, url: str, response: "httpx.Response", previous: _Document | None
+    ) -> dict:
+        if response.status_code == 304 and self._request_headers(url, previous):
+            value, etag = previous.value, previous.etag
+        else:
+            response.raise_for_status()
+            value, etag = response.json(), response.headers.get("ETag")
+
+        self._document = _Document(url, value, etag, self._max_age(response))
+        return value
+
+    def _max_age(self, response: "httpx.Response") -> float | None:
+        cache_control = response.headers.get("Cache-Control", "")
+        match = _MAX_AGE.search(cache_control)
+        if match is None or _NO_CACHE.search(cache_control):
+            return None
+
+        # The response may have been in a shared cache for some of its lifetime already
+        try:
+            age = int(response.headers.get("Age", 0))
+        except ValueError:
+            age = 0
+        return max(self._min_max_age, int(match.group(1)) - age)
+
+    def _get_url(self) -> str:
+        return self._url if isinstance(self._url, str) else self._url()
+
+    def fetch(self, client: "httpx.Client") -> dict:
+        """
+        Returns the document, which is only downloaded if it has changed.
+
+        Raises:
+        - httpx.HTTPError if the request fails.
+        """
+        url, previous = self._get_url(), self._document
+        response = client.get(url, headers=self._request_headers(url, previous))
+        return self._handle_response(url, response, previous)
+
+    async def fetch_async(
+        self, client: "httpx.AsyncClient", url: str | None = None
+    ) -> dict:
+        """
+        The same as `ConditionalDocument.fetch`, except that it does not block the event loop.
+        The URL can be given if it must be looked up asynchronously.
+        """
+        url, previous = url or self._get_url(), self._document
+        response = await client.get(url, headers=self._request_headers(url, previous))
+        return self._handle_response(url, response, previous)
+
+
+def _cached(document: ConditionalDocument, value: dict) -> CachedValue:
+    return CachedValue(value, time.time(), document.max_age)
 
 
 class OidcEndpoints:
-    def __init__(self, well_known_url: str, request_timeout: tuple[int, int]):
+    """
+    The endpoints of the auth provider, from its OpenID configuration, and its token signing keys (JWKS).
+
+    The OpenID configuration is cached for an hour, or for as long as the auth provider allows it with `Cache-Control: max-age`.
+    Both documents are fetched with the pooled HTTP clients and conditional requests, see `ConditionalDocument`.
+    """
+
+    def __init__(
+        self,
+        well_known_url: str,
+        client: Callable[[], "httpx.Client"],
+        async_client: Callable[[], "httpx.AsyncClient"],
+        instrumentation: Instrumentation = NO_INSTRUMENTATION,
+        min_certs_max_age: float = 0,
+    ):
+        self._client = client
+        self._async_client = async_client
+        self._well_known_document = ConditionalDocument(well_known_url, 60)
+        self._certs_document = ConditionalDocument(self.certs, min_certs_max_age)
         self._well_known_response = CachedGetter(
-            lambda: _request_metadata(well_known_url, request_timeout), 60 * 60
+            timed_fetch(
+                instrumentation,
+                "discovery",
+                lambda: _cached(
+                    self._well_known_document,
+                    self._well_known_document.fetch(self._client()),
+                ),
+            ),
+            60 * 60,
+            async_getter=timed_fetch_async(
+                instrumentation, "discovery", self._fetch_well_known_async
+            ),
         )
 
+    async def _fetch_well_known_async(self) -> CachedValue:
+        value = await self._well_known_document.fetch_async(self._async_client())
+        return _cached(self._well_known_document, value)
+
     def _well_known(self) -> dict:
         return self._well_known_response.get()
 
+    async def _well_known_async(self) -> dict:
+        return await self._well_known_response.get_async()
+
+    @property
+    def has_metadata(self) -> bool:
+        return self._well_known_response.has_value
+
     def update(self):
         self._well_known_response.update()
 
-    def certs(self) -> dict:
+    async def update_async(self):
+        await self._well_known_response.update_async()
+
+    def certs(self) -> str:
         return self._well_known()["jwks_uri"]
 
+    async def certs_async(self) -> str:
+        return (await self._well_known_async())["jwks_uri"]
+
+    def fetch_certs(self) -> dict:
+        """
+        Fetches the token signing keys (JWKS), which are only downloaded if they have changed.
+        """
+        return self._certs_document.fetch(self._client())
+
+    async def fetch_certs_async(self) -> dict:
+        return await self._certs_document.fetch_async(
+            self._async_client(), await self.certs_async()
+        )
+
+    @property
+    def certs_max_age(self) -> float | None:
+        """
+        The lifetime in seconds that the auth provider gave the last fetched token signing keys, if any.
+        """
+        return self._certs_document.max_age
+
     def issuer(self) -> str:
         return self._well_known()["issuer"]
 
+    async def issuer_async(self) -> str:
+        return (await self._well_known_async())["issuer"]
+
     def introspection(self) -> str:
         return self._well_known()["introspection_endpoint"]
+
+    async def introspection_async(self) -> str:
+        return (await self._well_known_async())["introspection_endpoint"]
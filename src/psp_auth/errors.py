@@ -5,6 +5,12 @@ class AuthExceptionType(Enum):
     UNAUTHORIZED = "unauthorized"
     FORBIDDEN = "forbidden"
     TOKEN_EXPIRED = "token_expired"  # nosec B105 - error code, not a password
+    TOKEN_NOT_YET_VALID = "token_not_yet_valid"  # nosec B105
+    TOKEN_TOO_LARGE = "token_too_large"  # nosec B105
+    MALFORMED_TOKEN = "malformed_token"  # nosec B105
+    UNSUPPORTED_ALGORITHM = "unsupported_algorithm"
+    UNKNOWN_KEY = "unknown_key"
+    TOKEN_REVOKED = "token_revoked"  # nosec B105
 
 
 class AuthException(Exception):
@@ -1,3 +1,4 @@
 from .auth import FastAPIAuth
+from .middleware import AuthMiddleware
 
-__all__ = ["FastAPIAuth"]
+__all__ = ["AuthMiddleware", "FastAPIAuth"]
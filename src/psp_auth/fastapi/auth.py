@@ -1,10 +1,12 @@
-from typing import Annotated, Callable
+from typing import Annotated, Any, Callable, Iterable
 from fastapi import FastAPI, Request, Depends, HTTPException, Security, status
-from fastapi.security import SecurityScopes
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute
 from ..core import Auth
-from ..token import Token
-from ..user import User
-from ..errors import AuthException, AuthExceptionType
+from ..token import ScopeMatcher, Token
+from ..user import RoleMatcher
+from ..errors import AuthException
+from .middleware import STATE_TOKEN, AuthMiddleware, _auth_exception_status_code
 
 _SECURITY_SCHEME_NAME = "JWT"
 
@@ -20,62 +22,155 @@ def _security_scheme_docs(scheme_name: str) -> dict:
     }
 
 
+def _dependency_calls(dependant: Dependant) -> Iterable[Callable]:
+    for dependency in dependant.dependencies:
+        yield dependency.call
+        yield from _dependency_calls(dependency)
+
+
 def _auth_exception_to_http(e: AuthException) -> HTTPException:
-    if (
-        e.type == AuthExceptionType.UNAUTHORIZED
-        or e.type == AuthExceptionType.TOKEN_EXPIRED
-    ):
-        status_code = status.HTTP_401_UNAUTHORIZED
-    elif e.type == AuthExceptionType.FORBIDDEN:
-        status_code = status.HTTP_403_FORBIDDEN
-    else:
-        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    return HTTPException(
+        status_code=_auth_exception_status_code(e.type), detail=e.detail
+    )
+
+
+def _request_token(request: Request) -> Token | None:
+    return getattr(request.state, STATE_TOKEN, None)
+
 
-    return HTTPException(status_code=status_code, detail=e.detail)
+def _set_request_token(request: Request, token: Token) -> None:
+    setattr(request.state, STATE_TOKEN, token)
 
 
 class FastAPIAuth:
+    """
+    The dependencies returned by this class are the same function objects every time they are requested,
+    so FastAPI runs each of them at most once per request.
+    The validated token is also stored on `request.state`, so the token is validated at most once per request.
+    """
+
     _auth: Auth
+    _use_async_validation: bool
+    _dependencies: dict[str, Callable]
+    _required_scopes: dict[Callable, list[str]]
 
-    def __init__(self, auth: Auth):
+    def __init__(self, auth: Auth, use_async_validation: bool = False):
+        """
+        Args:
+            auth: The auth core.
+            use_async_validation: Whether the dependencies should be async and use `Auth.validate_token_async`.
+                Then, validating a token does not occupy a threadpool slot, and never leaves the event loop when the keys are cached.
+        """
         self._auth = auth
+        self._use_async_validation = use_async_validation
+        self._dependencies = {}
+        self._required_scopes = {}
+
+    def _dependency(self, name: str, create: Callable[[], Callable]) -> Callable:
+        """
+        Returns the dependency with the given name, and creates it on first use.
+        """
+        dependency = self._dependencies.get(name)
+        if dependency is None:
+            dependency = self._dependencies[name] = create()
+        return dependency
 
     def add_docs(self, app: FastAPI, is_globally_protected: bool = True) -> None:
         """
         Adds the authentication scheme to the `app` openapi documentation.
+        The scopes of each route's `FastAPIAuth.require_scopes` dependencies are documented as its security requirement,
+        unless the route sets its own, for example, with `FastAPIAuth.scope_docs`.
+
+        The documentation is generated on the first request for it, so the routes that are added after this are included,
+        and it is cached by the `app` like any openapi documentation.
         """
-        original_schema = app.openapi()
-        schema_set = False
+        generate_openapi = app.openapi
+        documented_schema = None
 
-        def custom_openapi():
-            nonlocal schema_set
-            if schema_set:
-                return app.openapi_schema
-            schema_set = True
+        def openapi() -> dict:
+            nonlocal documented_schema
+            schema = generate_openapi()
+            # The schema is changed in place, once each time the app generates it
+            if schema is not documented_schema:
+                self._add_security_docs(app, schema, is_globally_protected)
+                documented_schema = schema
+            return schema
 
-            nonlocal original_schema
-            schema = original_schema
-            schema["security"] = (
-                [{_SECURITY_SCHEME_NAME: []}] if is_globally_protected else []
-            )
-            if "components" not in schema:
-                schema["components"] = {}
-            schema["components"] |= {
-                "securitySchemes": _security_scheme_docs(_SECURITY_SCHEME_NAME)
-            }
+        app.openapi = openapi
 
-            app.openapi_schema = schema
-            return app.openapi_schema
+    def _add_security_docs(
+        self, app: FastAPI, schema: dict, is_globally_protected: bool
+    ) -> None:
+        schema["security"] = (
+            [{_SECURITY_SCHEME_NAME: []}] if is_globally_protected else []
+        )
+        schema.setdefault("components", {})["securitySchemes"] = _security_scheme_docs(
+            _SECURITY_SCHEME_NAME
+        )
 
-        app.openapi = custom_openapi
+        paths = schema.get("paths", {})
+        for route in app.routes:
+            if not isinstance(route, APIRoute) or route.path_format not in paths:
+                continue
+            scopes = [
+                scope
+                for call in _dependency_calls(route.dependant)
+                for scope in self._required_scopes.get(call, ())
+            ]
+            if not scopes:
+                continue
+            for method in route.methods:
+                operation = paths[route.path_format].get(method.lower())
+                if operation is not None and "security" not in operation:
+                    operation["security"] = [
+                        {_SECURITY_SCHEME_NAME: list(dict.fromkeys(scopes))}
+                    ]
+
+    def protect(self, app: FastAPI, allow_paths: Iterable[str] = ()) -> None:
+        """
+        Requires a valid token for every request to the `app`, except for the documentation and the `allow_paths`.
+        This adds the `AuthMiddleware` and documents the `app` as globally protected, so you do not need per-route dependencies for authentication.
+
+        Args:
+            app: The app.
+            allow_paths: The paths that do not require a token. A path that ends with "*" matches every path with that prefix.
+        """
+        docs_paths = [
+            app.openapi_url,
+            app.docs_url,
+            app.redoc_url,
+            app.swagger_ui_oauth2_redirect_url,
+        ]
+        app.add_middleware(
+            AuthMiddleware,
+            auth=self._auth,
+            allow_paths=[path for path in docs_paths if path] + list(allow_paths),
+        )
+        self.add_docs(app, is_globally_protected=True)
+
+    def _documented_scopes(
+        self, scopes: list[str], is_resource_namespaced: bool
+    ) -> list[str]:
+        if is_resource_namespaced:
+            return [f"{self._auth.config.client_id}:{scope}" for scope in scopes]
+        return list(scopes)
 
     def scope_docs(
         self, scopes: list[str], is_resource_namespaced: bool = True
     ) -> dict:
-        if is_resource_namespaced:
-            scopes = [f"{self._auth.config.client_id}:{scope}" for scope in scopes]
-
-        return {"security": [{_SECURITY_SCHEME_NAME: scopes}]}
+        """
+        Returns the `openapi_extra` of a route that documents the `scopes` as its security requirement.
+        This is not needed for the scopes of `FastAPIAuth.require_scopes`, which `FastAPIAuth.add_docs` documents automatically.
+        """
+        return {
+            "security": [
+                {
+                    _SECURITY_SCHEME_NAME: self._documented_scopes(
+                        scopes, is_resource_namespaced
+                    )
+                }
+            ]
+        }
 
     def unvalidated_token(self):
         """
@@ -85,52 +180,145 @@ class FastAPIAuth:
         # Note that it is named "unvalidated" instead of "invalidated" because
         # "invalid" means that it has been valid before, and became invalid.
         # "unvalid" instead means that it hasn't been checked whether it is valid.
+        return self._dependency("unvalidated_token", self._create_unvalidated_token)
+
+    def _create_unvalidated_token(self) -> Callable:
+        if self._use_async_validation:
+            # An async dependency runs on the event loop, where a sync one would take a threadpool slot
+            async def async_dependency(request: Request) -> str:
+                return self._header_token(request)
+
+            return async_dependency
 
         def dependency(request: Request) -> str:
-            auth_header = request.headers.get("Authorization")
-            if auth_header is None:
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-            return self._auth.get_token(auth_header)
+            return self._header_token(request)
 
         return dependency
 
+    def _header_token(self, request: Request) -> str:
+        auth_header = request.headers.get("Authorization")
+        if auth_header is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        try:
+            return self._auth.get_token(auth_header)
+        except AuthException as e:
+            raise _auth_exception_to_http(e)
+
     def token(self) -> Callable:
+        return self._dependency("token", self._create_token)
+
+    def _create_token(self) -> Callable:
+        if self._use_async_validation:
+            return self._create_token_async()
+
         def decorator(
+            request: Request,
             token: Annotated[str, Depends(self.unvalidated_token())],
         ) -> Token:
-            try:
-                return self._auth.validate_token(token)
-            except AuthException as e:
-                raise _auth_exception_to_http(e)
+            validated_token = _request_token(request)
+            if validated_token is None:
+                try:
+                    validated_token = self._auth.validate_token(token)
+                except AuthException as e:
+                    raise _auth_exception_to_http(e)
+                _set_request_token(request, validated_token)
+            return validated_token
 
         return decorator
 
-    def user(self) -> Callable:
-        def decorator(token: Annotated[Token, Depends(self.token())]) -> User:
-            return token.user
+    def _create_token_async(self) -> Callable:
+        async def decorator(
+            request: Request,
+            token: Annotated[str, Depends(self.unvalidated_token())],
+        ) -> Token:
+            validated_token = _request_token(request)
+            if validated_token is None:
+                try:
+                    validated_token = await self._auth.validate_token_async(token)
+                except AuthException as e:
+                    raise _auth_exception_to_http(e)
+                _set_request_token(request, validated_token)
+            return validated_token
 
         return decorator
 
-    def _scopes(self, is_resource_namespaced: bool = True) -> Callable:
-        def decorator(
-            security_scopes: SecurityScopes,
-            token: Annotated[Token, Depends(self.token())],
-        ):
-            if not token.has_scopes(
-                security_scopes.scopes, is_resource_namespaced=is_resource_namespaced
-            ):
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    def _from_token(self, function: Callable[[Token], Any]) -> Callable:
+        """
+        Returns a dependency that calls `function` with the validated token.
+        """
+        if self._use_async_validation:
+
+            async def async_decorator(token: Annotated[Token, Depends(self.token())]):
+                return function(token)
+
+            return async_decorator
+
+        def decorator(token: Annotated[Token, Depends(self.token())]):
+            return function(token)
 
         return decorator
 
+    def user(self) -> Callable:
+        return self._dependency(
+            "user", lambda: self._from_token(lambda token: token.user)
+        )
+
+    def _scopes(self, matcher: ScopeMatcher) -> Callable:
+        def check_scopes(token: Token):
+            if not matcher.matches(token):
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+        return self._from_token(check_scopes)
+
     def require_scopes(
         self, scopes: list[str], is_resource_namespaced: bool = True
     ) -> Security:
-        return Security(
-            self._scopes(is_resource_namespaced=is_resource_namespaced), scopes=scopes
+        """
+        Dependency that requires the token to have all the `scopes`.
+        The requirement is compiled once, when the route is declared, and is documented by `FastAPIAuth.add_docs`.
+        """
+        resource = self._auth.config.client_id if is_resource_namespaced else None
+        dependency = self._scopes(ScopeMatcher(scopes, resource))
+        self._required_scopes[dependency] = self._documented_scopes(
+            scopes, is_resource_namespaced
         )
+        return Security(dependency, scopes=scopes)
+
+    def _roles(self, matcher: RoleMatcher) -> Callable:
+        def check_roles(token: Token):
+            if not matcher.matches(token.user):
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+        return self._from_token(check_roles)
+
+    def require_roles(
+        self, roles: list[str], require_all: bool = True, resource: str | None = None
+    ) -> Depends:
+        """
+        Dependency that requires the user to have all (or any, if not `require_all`) of the `roles`.
+        The requirement is compiled once, when the route is declared.
+
+        Args:
+            roles: The roles.
+            require_all: Whether the user must have all the roles, instead of any of them.
+            resource: The resource of the roles. Defaults to the client ID. If `resource == "global"`, then it will check for global roles.
+        """
+        if resource is None:
+            resource = self._auth.config.client_id
+        return Depends(self._roles(RoleMatcher(resource, roles, require_all)))
 
     def require_remote_token_validation(self) -> Depends:
+        """
+        Dependency that requires the token to be active according to the auth provider (token introspection).
+        The dependency is the same function object every time, so the token is introspected at most once per request.
+        """
+        return Depends(
+            self._dependency(
+                "remote_token_validation", self._create_remote_token_validation
+            )
+        )
+
+    def _create_remote_token_validation(self) -> Callable:
         async def dependency(
             token: Annotated[str, Depends(self.unvalidated_token())],
         ):
@@ -140,4 +328,4 @@ class FastAPIAuth:
             except AuthException as e:
                 raise _auth_exception_to_http(e)
 
-        return Depends(dependency)
+        return dependency
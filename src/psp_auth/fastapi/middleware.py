@@ -0,0 +1,150 @@
+import json
+import re
+from typing import Iterable
+
+from joserfc.errors import JoseError
+from starlette import status
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..core import Auth
+from ..errors import AuthException, AuthExceptionType
+
+# The key of the ASGI scope state where the validated token of the request is stored.
+# Starlette exposes the scope state as `request.state`.
+STATE_TOKEN = "psp_auth_token"  # nosec B105
+
+
+_UNAUTHORIZED_TYPES = frozenset(
+    {
+        AuthExceptionType.UNAUTHORIZED,
+        AuthExceptionType.TOKEN_EXPIRED,
+        AuthExceptionType.TOKEN_NOT_YET_VALID,
+        AuthExceptionType.TOKEN_TOO_LARGE,
+        AuthExceptionType.MALFORMED_TOKEN,
+        AuthExceptionType.UNSUPPORTED_ALGORITHM,
+        AuthExceptionType.UNKNOWN_KEY,
+        AuthExceptionType.TOKEN_REVOKED,
+    }
+)
+
+
+def _auth_exception_status_code(type: AuthExceptionType) -> int:
+    if type in _UNAUTHORIZED_TYPES:
+        return status.HTTP_401_UNAUTHORIZED
+    elif type == AuthExceptionType.FORBIDDEN:
+        return status.HTTP_403_FORBIDDEN
+    else:
+        return status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+class _Response:
+    """
+    A plain JSON error response that is encoded once and sent directly on the ASGI interface.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if status_code == status.HTTP_401_UNAUTHORIZED:
+            headers.append((b"www-authenticate", b"Bearer"))
+
+        self._start = {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": headers,
+        }
+        self._body = {"type": "http.response.body", "body": body}
+
+    async def __call__(self, send: Send) -> None:
+        await send(self._start)
+        await send(self._body)
+
+
+_RESPONSES = {
+    status.HTTP_401_UNAUTHORIZED: _Response(
+        status.HTTP_401_UNAUTHORIZED, "Not authenticated"
+    ),
+    status.HTTP_403_FORBIDDEN: _Response(status.HTTP_403_FORBIDDEN, "Forbidden"),
+    status.HTTP_500_INTERNAL_SERVER_ERROR: _Response(
+        status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal Server Error"
+    ),
+}
+
+
+def _compile_paths(paths: Iterable[str]) -> re.Pattern | None:
+    """
+    Compiles the paths into one regular expression.
+    A path that ends with "*" matches every path with that prefix.
+    """
+    patterns = [
+        re.escape(path[:-1]) + ".*" if path.endswith("*") else re.escape(path)
+        for path in paths
+    ]
+    if not patterns:
+        return None
+    return re.compile("|".join(patterns))
+
+
+def _bearer_token(scope: Scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            parts = value.decode("latin-1").split()
+            if len(parts) != 2 or parts[0].lower() != "bearer":
+                return None
+            return parts[1]
+    return None
+
+
+class AuthMiddleware:
+    """
+    ASGI middleware that requires every HTTP and WebSocket request to have a valid token, except for the allowed paths.
+
+    The token is validated once with `Auth.validate_token_async` and stored in the scope state,
+    where it is reused by the `FastAPIAuth` dependencies.
+    Requests without a valid token are rejected before routing, with a precomputed 401 or 403 response.
+    It works with both FastAPI and plain Starlette applications.
+    """
+
+    def __init__(self, app: ASGIApp, auth: Auth, allow_paths: Iterable[str] = ()):
+        """
+        Args:
+            app: The ASGI application.
+            auth: The auth core.
+            allow_paths: The paths that do not require a token. A path that ends with "*" matches every path with that prefix.
+        """
+        self.app = app
+        self.auth = auth
+        self._allow_paths = _compile_paths(allow_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket") or self._is_allowed(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = status.HTTP_401_UNAUTHORIZED
+        token = _bearer_token(scope)
+        if token is not None:
+            try:
+                validated_token = await self.auth.validate_token_async(token)
+            except AuthException as e:
+                status_code = _auth_exception_status_code(e.type)
+            except (JoseError, ValueError):
+                pass
+            else:
+                scope.setdefault("state", {})[STATE_TOKEN] = validated_token
+                await self.app(scope, receive, send)
+                return
+
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1008})
+        else:
+            await _RESPONSES[status_code](send)
+
+    def _is_allowed(self, scope: Scope) -> bool:
+        return (
+            self._allow_paths is not None
+            and self._allow_paths.fullmatch(scope["path"]) is not None
+        )
@@ -0,0 +1,275 @@
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from .errors import AuthExceptionType
+
+T = TypeVar("T")
+
+
+class Instrumentation:
+    """
+    Receives the metrics of `Auth`. Subclass it and override the methods you need, or use one of the adapters:
+    `OpenTelemetryInstrumentation` or `PrometheusInstrumentation`.
+
+    The methods are called on the hot path, so they should be fast and must not raise.
+    All the methods do nothing by default.
+    """
+
+    def validation_phase(self, phase: str, seconds: float) -> None:
+        """
+        Called after each phase of a token validation that is not answered by the token cache.
+
+        Args:
+            phase: One of "parse", "key_lookup", "signature" and "claims".
+            seconds: The duration of the phase.
+        """
+
+    def rejection(self, reason: AuthExceptionType) -> None:
+        """
+        Called when a token is rejected.
+        """
+
+    def fetch(self, resource: str, seconds: float, error: Exception | None) -> None:
+        """
+        Called after each request for metadata to the auth provider.
+
+        Args:
+            resource: Either "discovery" or "jwks".
+            seconds: The duration of the request.
+            error: The error if the request failed, otherwise None.
+        """
+
+    def cache(self, cache: str, event: str) -> None:
+        """
+        Called on each cache lookup, and whenever a cache evicts an entry to make room.
+
+        Args:
+            cache: One of "token", "introspection", "jwks" and "shared". The shared cache is the `CacheBackend` given to `Auth`.
+            event: One of "hit", "miss" and "eviction".
+        """
+
+    def introspection(self, seconds: float, status_code: int | None) -> None:
+        """
+        Called after each introspection request to the auth provider.
+
+        Args:
+            seconds: The duration of the request.
+            status_code: The status code of the response, or None if the request failed.
+        """
+
+
+NO_INSTRUMENTATION = Instrumentation()
+
+
+class _PhaseTimer:
+    __slots__ = ("_instrumentation", "_last")
+
+    def __init__(self, instrumentation: Instrumentation):
+        self._instrumentation = instrumentation
+        self._last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        self._instrumentation.validation_phase(phase, now - self._last)
+        self._last = now
+
+
+class _NoPhaseTimer:
+    __slots__ = ()
+
+    def lap(self, phase: str) -> None:
+        pass
+
+
+_NO_PHASE_TIMER = _NoPhaseTimer()
+
+
+def phase_timer_factory(
+    instrumentation: Instrumentation,
+) -> Callable[[], _PhaseTimer | _NoPhaseTimer]:
+    """
+    Returns a function that starts timing the phases of a validation.
+    When the instrumentation is disabled, the timer is a shared no-op, so the phases are not even timed.
+    """
+    if instrumentation is NO_INSTRUMENTATION:
+        return lambda: _NO_PHASE_TIMER
+    return lambda: _PhaseTimer(instrumentation)
+
+
+def timed_fetch(
+    instrumentation: Instrumentation, resource: str, fetch: Callable[[], T]
+) -> Callable[[], T]:
+    """
+    Wraps `fetch`, so each call is reported to `Instrumentation.fetch`.
+    """
+    if instrumentation is NO_INSTRUMENTATION:
+        return fetch
+
+    def timed():
+        start = time.perf_counter()
+        try:
+            value = fetch()
+        except Exception as e:
+            instrumentation.fetch(resource, time.perf_counter() - start, e)
+            raise
+        instrumentation.fetch(resource, time.perf_counter() - start, None)
+        return value
+
+    return timed
+
+
+def timed_fetch_async(
+    instrumentation: Instrumentation,
+    resource: str,
+    fetch: Callable[[], Awaitable[T]],
+) -> Callable[[], Awaitable[T]]:
+    """
+    The same as `timed_fetch`, except for an async `fetch`.
+    """
+    if instrumentation is NO_INSTRUMENTATION:
+        return fetch
+
+    async def timed():
+        start = time.perf_counter()
+        try:
+            value = await fetch()
+        except Exception as e:
+            instrumentation.fetch(resource, time.perf_counter() - start, e)
+            raise
+        instrumentation.fetch(resource, time.perf_counter() - start, None)
+        return value
+
+    return timed
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Records the metrics with OpenTelemetry, and adds the rejections as events to the current span.
+    Requires the `opentelemetry` extra.
+    """
+
+    def __init__(self, meter_provider=None):
+        """
+        Args:
+            meter_provider: The OpenTelemetry meter provider. Defaults to the global meter provider.
+        """
+        from opentelemetry import metrics, trace
+
+        meter = metrics.get_meter("psp_auth", meter_provider=meter_provider)
+        self._trace = trace
+        self._validation_phases = meter.create_histogram(
+            "psp_auth.validation.phase.duration",
+            unit="s",
+            description="The duration of each phase of a token validation",
+        )
+        self._rejections = meter.create_counter(
+            "psp_auth.rejections", description="The rejected tokens by reason"
+        )
+        self._fetches = meter.create_histogram(
+            "psp_auth.fetch.duration",
+            unit="s",
+            description="The duration of the metadata requests to the auth provider",
+        )
+        self._cache_events = meter.create_counter(
+            "psp_auth.cache.events", description="The cache hits, misses and evictions"
+        )
+        self._introspections = meter.create_histogram(
+            "psp_auth.introspection.duration",
+            unit="s",
+            description="The duration of the introspection requests to the auth provider",
+        )
+
+    def validation_phase(self, phase: str, seconds: float) -> None:
+        self._validation_phases.record(seconds, {"phase": phase})
+
+    def rejection(self, reason: AuthExceptionType) -> None:
+        self._rejections.add(1, {"reason": reason.value})
+        self._trace.get_current_span().add_event(
+            "psp_auth.rejection", {"reason": reason.value}
+        )
+
+    def fetch(self, resource: str, seconds: float, error: Exception | None) -> None:
+        self._fetches.record(
+            seconds,
+            {
+                "resource": resource,
+                "outcome": "success" if error is None else "failure",
+            },
+        )
+
+    def cache(self, cache: str, event: str) -> None:
+        self._cache_events.add(1, {"cache": cache, "event": event})
+
+    def introspection(self, seconds: float, status_code: int | None) -> None:
+        self._introspections.record(seconds, {"status_code": str(status_code)})
+
+
+class PrometheusInstrumentation(Instrumentation):
+    """
+    Records the metrics with the Prometheus client.
+    Requires the `prometheus` extra.
+    """
+
+    def __init__(self, registry=None, namespace: str = "psp_auth"):
+        """
+        Args:
+            registry: The Prometheus registry. Defaults to the global registry.
+            namespace: The prefix of the metric names.
+        """
+        from prometheus_client import REGISTRY, Counter, Histogram
+
+        registry = REGISTRY if registry is None else registry
+        self._validation_phases = Histogram(
+            "validation_phase_seconds",
+            "The duration of each phase of a token validation",
+            ["phase"],
+            namespace=namespace,
+            registry=registry,
+            # The phases take from microseconds to a network round trip
+            buckets=(1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1),
+        )
+        self._rejections = Counter(
+            "rejections",
+            "The rejected tokens by reason",
+            ["reason"],
+            namespace=namespace,
+            registry=registry,
+        )
+        self._fetches = Histogram(
+            "fetch_seconds",
+            "The duration of the metadata requests to the auth provider",
+            ["resource", "outcome"],
+            namespace=namespace,
+            registry=registry,
+        )
+        self._cache_events = Counter(
+            "cache_events",
+            "The cache hits, misses and evictions",
+            ["cache", "event"],
+            namespace=namespace,
+            registry=registry,
+        )
+        self._introspections = Histogram(
+            "introspection_seconds",
+            "The duration of the introspection requests to the auth provider",
+            ["status_code"],
+            namespace=namespace,
+            registry=registry,
+        )
+
+    def validation_phase(self, phase: str, seconds: float) -> None:
+        self._validation_phases.labels(phase).observe(seconds)
+
+    def rejection(self, reason: AuthExceptionType) -> None:
+        self._rejections.labels(reason.value).inc()
+
+    def fetch(self, resource: str, seconds: float, error: Exception | None) -> None:
+        self._fetches.labels(
+            resource, "success" if error is None else "failure"
+        ).observe(seconds)
+
+    def cache(self, cache: str, event: str) -> None:
+        self._cache_events.labels(cache, event).inc()
+
+    def introspection(self, seconds: float, status_code: int | None) -> None:
+        self._introspections.labels(str(status_code)).observe(seconds)
@@ -0,0 +1,112 @@
+import base64
+import json
+import re
+import time
+from typing import Iterable
+
+from .errors import AuthException, AuthExceptionType
+
+# A compact JWS: three non-empty base64url segments
+_COMPACT_JWS = re.compile(r"[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+")
+
+_MAX_KID_LENGTH = 256
+
+
+def _decode_segment(segment: str) -> dict | None:
+    try:
+        value = json.loads(
+            base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+        )
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class TokenPrevalidator:
+    """
+    Cheap checks that reject malformed and obviously invalid tokens before any signature verification or request to the auth provider.
+    The checks are compiled once, from the configuration.
+
+    The claims are not verified here, so a token that passes still has to be validated.
+    """
+
+    __slots__ = ("max_length", "algorithms")
+
+    def __init__(self, max_length: int, algorithms: Iterable[str]):
+        """
+        Args:
+            max_length: The maximum length of a token.
+            algorithms: The signing algorithms (`alg`) that are accepted.
+        """
+        self.max_length = max_length
+        self.algorithms = frozenset(algorithms)
+
+    def check_length(self, token: str) -> None:
+        """
+        Raises:
+        - AuthException if the token is too long.
+        """
+        if len(token) > self.max_length:
+            raise AuthException(
+                AuthExceptionType.TOKEN_TOO_LARGE,
+                f"The token is longer than {self.max_length} characters",
+            )
+
+    def parse(self, token: str) -> tuple[dict, dict]:
+        """
+        Checks the token without verifying it, and returns its header and its unverified claims.
+
+        Raises:
+        - AuthException if the token is too long, malformed, uses an algorithm that is not allowed, has an invalid key ID,
+          or is expired or not yet valid according to its unverified claims.
+        """
+        self.check_length(token)
+        if _COMPACT_JWS.fullmatch(token) is None:
+            raise AuthException(
+                AuthExceptionType.MALFORMED_TOKEN, "The token is malformed"
+            )
+
+        header_segment, claims_segment, _ = token.split(".")
+        header = _decode_segment(header_segment)
+        if header is None:
+            raise AuthException(
+                AuthExceptionType.MALFORMED_TOKEN, "The token header is malformed"
+            )
+
+        algorithm = header.get("alg")
+        if algorithm not in self.algorithms:
+            raise AuthException(
+                AuthExceptionType.UNSUPPORTED_ALGORITHM,
+                "The token is signed with an algorithm that is not allowed",
+            )
+
+        kid = header.get("kid")
+        if kid is not None and (
+            not isinstance(kid, str) or not kid or len(kid) > _MAX_KID_LENGTH
+        ):
+            raise AuthException(
+                AuthExceptionType.UNKNOWN_KEY, "The token has an invalid key ID"
+            )
+
+        claims = _decode_segment(claims_segment)
+        if claims is None:
+            raise AuthException(
+                AuthExceptionType.MALFORMED_TOKEN, "The token claims are malformed"
+            )
+
+        # The same comparisons as the claims validation, which checks the verified claims again
+        now = int(time.time())
+        expires_at = claims.get("exp")
+        if _is_number(expires_at) and expires_at < now:
+            raise AuthException(AuthExceptionType.TOKEN_EXPIRED, "The token is expired")
+        not_before = claims.get("nbf")
+        if _is_number(not_before) and not_before > now:
+            raise AuthException(
+                AuthExceptionType.TOKEN_NOT_YET_VALID, "The token is not yet valid"
+            )
+
+        return header, claims
@@ -0,0 +1,54 @@
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Refresher:
+    """
+    Calls `refresh` in a background thread, first immediately and then every `interval` seconds.
+    :param refresh: The function that refreshes the cached values.
+    :param interval: The time in seconds between refreshes.
+    :param retry_interval: The time in seconds until a failed refresh is retried.
+    """
+
+    def __init__(
+        self, refresh: Callable[[], None], interval: float, retry_interval: float
+    ):
+        self.refresh = refresh
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, delay: float = 0) -> None:
+        """
+        Starts refreshing in the background after `delay` seconds. Does nothing if it is already running.
+        """
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(delay,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, delay: float) -> None:
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+                delay = self.interval
+            except Exception:
+                logger.exception(
+                    "Failed to refresh, retrying in %ss", self.retry_interval
+                )
+                delay = self.retry_interval
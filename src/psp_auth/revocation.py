@@ -0,0 +1,520 @@
+import hashlib
+import json
+from array import array
+import logging
+import math
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Protocol
+
+from .errors import AuthException, AuthExceptionType
+from .refresher import Refresher
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+_KINDS = ("jti", "sid")
+
+
+class Revocation(NamedTuple):
+    """
+    A revoked token (`kind == "jti"`) or session (`kind == "sid"`), which stays revoked until `expires_at`,
+    the time when every token that it applies to has expired.
+    """
+
+    kind: str
+    value: str
+    expires_at: float
+
+    @classmethod
+    def parse(cls, entry: dict) -> list["Revocation"]:
+        """
+        Parses a revocation in the form `{"jti": "...", "exp": 1700000000}` or `{"sid": "...", "exp": 1700000000}`.
+        An entry with both a `jti` and a `sid` revokes both.
+
+        Raises:
+        - ValueError if the entry is malformed.
+        """
+        if not isinstance(entry, dict):
+            raise ValueError(f"Malformed revocation: {entry}")
+        values = [
+            (kind, entry[kind]) for kind in _KINDS if isinstance(entry.get(kind), str)
+        ]
+        if not values:
+            raise ValueError(f"Malformed revocation: {entry}")
+        try:
+            expires_at = float(entry["exp"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Malformed revocation: {entry}") from e
+        return [cls(kind, value, expires_at) for kind, value in values]
+
+
+class RevocationUpdate(NamedTuple):
+    """
+    The revocations since the previous update of a `RevocationSource`.
+
+    Attributes:
+        revocations: The new revocations.
+        cursor: Where the next update continues, which is passed back to `RevocationSource.fetch`.
+        watermark: The time up to which every revocation is included, which tells how fresh the denylist is.
+    """
+
+    revocations: list[Revocation]
+    cursor: str | None
+    watermark: float
+
+
+class RevocationSource(Protocol):
+    """
+    Where the revocations come from. Implement this to sync the denylist with your own feed.
+    """
+
+    def fetch(self, cursor: str | None) -> RevocationUpdate:
+        """
+        Returns the revocations since `cursor`, or all of them if `cursor` is None.
+        """
+        ...
+
+
+def _fingerprint(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _probe_hashes(fingerprint: int) -> tuple[int, int]:
+    # The halves of the fingerprint, with an odd step, so the probes visit distinct bits
+    return fingerprint & 0xFFFFFFFF, (fingerprint >> 32) | 1
+
+
+def _hashes(key: bytes) -> tuple[int, int]:
+    return _probe_hashes(_fingerprint(key))
+
+
+class BloomFilter:
+    """
+    A fixed-size set that answers whether it may contain a value, with a false positive rate of about `false_positive_rate`
+    as long as it holds at most `capacity` values. It never has false negatives.
+
+    :param capacity: The number of values that it is sized for.
+    :param false_positive_rate: The probability that it claims to contain a value that was not added.
+    """
+
+    __slots__ = ("capacity", "count", "_bits", "_size", "_probes")
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.count = 0
+        self._size = max(
+            8,
+            math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2),
+        )
+        self._probes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def size_in_bytes(self) -> int:
+        return len(self._bits)
+
+    def add(self, hashes: tuple[int, int]) -> None:
+        first, step = hashes
+        for i in range(self._probes):
+            bit = (first + i * step) % self._size
+            self._bits[bit >> 3] |= 1 << (bit & 7)
+        self.count += 1
+
+    def __contains__(self, hashes: tuple[int, int]) -> bool:
+        first, step = hashes
+        for i in range(self._probes):
+            bit = (first + i * step) % self._size
+            if not self._bits[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+
+class _Bucket:
+    """
+    The revocations that expire in the same time slot, which are all dropped together once the slot has passed.
+    The 64-bit fingerprints are kept to rebuild the Bloom filter, and the exact values to rule out its false positives.
+    """
+
+    __slots__ = ("fingerprints", "exact")
+
+    def __init__(self, exact: bool):
+        self.fingerprints = array("Q")
+        self.exact: set[bytes] | None = set() if exact else None
+
+
+class RevocationList:
+    """
+    A local denylist of revoked token IDs (`jti`) and session IDs (`sid`). Each revocation is kept until the tokens it applies to have expired.
+
+    The revocations are grouped into buckets by when they expire, and a bucket is dropped as a whole once it has expired,
+    so the list only holds the revocations that still matter. A single Bloom filter of all the revocations answers most lookups of tokens
+    that are not revoked with a few bit tests, and only the other lookups check the exact values of the buckets.
+    The Bloom filter is rebuilt from the fingerprints of the revocations at twice their number whenever it fills up,
+    so it never holds more values than it is sized for.
+
+    With `exact=False`, only the Bloom filter and an 8-byte fingerprint per revocation are kept, which takes about 10 to 12 bytes per revocation,
+    so millions of revocations fit in a few tens of megabytes, in exchange for rejecting about `false_positive_rate` of the tokens that are not revoked.
+    The rate is split between the lookups of the token ID and the session ID, so it holds for a token that has both.
+
+    The watermark is the time up to which the list is known to be complete. With `max_staleness`, tokens are rejected
+    while the watermark is older than that, so a broken feed cannot silently accept revoked tokens forever.
+
+    Args:
+        exact: Whether to keep the exact values, so there are no false positives.
+        false_positive_rate: The rate of the tokens that are not revoked, but are rejected with `exact=False`.
+        bucket_seconds: The width in seconds of the expiry time slots.
+        filter_capacity: The initial number of revocations that the Bloom filter is sized for. It grows with the revocations.
+        max_staleness: The maximum age in seconds of the watermark before tokens are rejected. If None, stale lists are accepted.
+    """
+
+    def __init__(
+        self,
+        exact: bool = True,
+        false_positive_rate: float = 0.001,
+        bucket_seconds: float = 300,
+        filter_capacity: int = 100_000,
+        max_staleness: float | None = None,
+    ):
+        self.exact = exact
+        self.false_positive_rate = false_positive_rate
+        self.bucket_seconds = bucket_seconds
+        self.filter_capacity = filter_capacity
+        self.max_staleness = max_staleness
+        self.watermark: float | None = None
+        self._buckets: dict[int, _Bucket] = {}
+        self._oldest_bucket: int | None = None
+        self._count = 0
+        self._front = self._build_filter()
+        self._lock = threading.Lock()
+
+    def _build_filter(self) -> BloomFilter:
+        """
+        Builds the Bloom filter of the remaining revocations, with room for as many again.
+        """
+        # Each lookup probes the filter once per kind, so each probe gets a share of the false positive rate
+        bloom_filter = BloomFilter(
+            max(self.filter_capacity, 2 * self._count),
+            self.false_positive_rate / len(_KINDS),
+        )
+        for bucket in self._buckets.values():
+            for fingerprint in bucket.fingerprints:
+                bloom_filter.add(_probe_hashes(fingerprint))
+        return bloom_filter
+
+    def __len__(self) -> int:
+        """
+        The number of revocations that have not yet expired, give or take the width of a bucket.
+        """
+        self._drop_expired(time.time())
+        return self._count
+
+    @property
+    def size_in_bytes(self) -> int:
+        """
+        The size of the Bloom filter and the fingerprints, without the exact values.
+        """
+        return self._front.size_in_bytes + sum(
+            bucket.fingerprints.itemsize * len(bucket.fingerprints)
+            for bucket in list(self._buckets.values())
+        )
+
+    def revoke(
+        self, jti: str | None = None, sid: str | None = None, *, expires_at: float
+    ) -> None:
+        """
+        Revokes a token by its ID, or every token of a session by its ID, until `expires_at`.
+        """
+        revocations = []
+        if jti is not None:
+            revocations.append(Revocation("jti", jti, expires_at))
+        if sid is not None:
+            revocations.append(Revocation("sid", sid, expires_at))
+        self.add(revocations)
+
+    def add(self, revocations: Iterable[Revocation]) -> None:
+        now = time.time()
+        with self._lock:
+            for revocation in revocations:
+                if revocation.expires_at <= now:
+                    continue
+                index = math.ceil(revocation.expires_at / self.bucket_seconds)
+                bucket = self._buckets.get(index)
+                if bucket is None:
+                    bucket = self._buckets[index] = _Bucket(self.exact)
+                    if self._oldest_bucket is None or index < self._oldest_bucket:
+                        self._oldest_bucket = index
+
+                key = _key(revocation.kind, revocation.value)
+                if bucket.exact is not None:
+                    if key in bucket.exact:
+                        continue
+                    bucket.exact.add(key)
+                fingerprint = _fingerprint(key)
+                bucket.fingerprints.append(fingerprint)
+                self._count += 1
+                if self._front.is_full:
+                    # Lookups keep using the previous filter until the new one is complete
+                    self._front = self._build_filter()
+                else:
+                    self._front.add(_probe_hashes(fingerprint))
+
+    def advance(self, watermark: float) -> None:
+        """
+        Records that the list is complete up to `watermark`.
+        """
+        if self.watermark is None or watermark > self.watermark:
+            self.watermark = watermark
+
+    @property
+    def staleness(self) -> float | None:
+        """
+        The time in seconds since the watermark, or None if the list has never been synced.
+        """
+        return None if self.watermark is None else time.time() - self.watermark
+
+    def is_revoked(self, claims: dict) -> bool:
+        """
+        Returns whether the token with the given claims is revoked, by its `jti` or its `sid`.
+        """
+        buckets = self._buckets
+        if not buckets:
+            return False
+
+        front = self._front
+        for kind in _KINDS:
+            value = claims.get(kind)
+            if not isinstance(value, str):
+                continue
+            key = _key(kind, value)
+            if _hashes(key) not in front:
+                continue
+            if not self.exact:
+                return True
+            for bucket in list(buckets.values()):
+                if key in bucket.exact:
+                    return True
+        return False
+
+    def check(self, claims: dict) -> None:
+        """
+        Raises:
+        - AuthException if the token is revoked, or the list is staler than `max_staleness`.
+        """
+        if self.max_staleness is not None:
+            staleness = self.staleness
+            if staleness is None or staleness > self.max_staleness:
+                raise AuthException(
+                    AuthExceptionType.TOKEN_REVOKED,
+                    "The revocation list is stale, so the token cannot be checked",
+                )
+        self._drop_expired(time.time())
+        if self.is_revoked(claims):
+            raise AuthException(
+                AuthExceptionType.TOKEN_REVOKED, "The token has been revoked"
+            )
+
+    def _drop_expired(self, now: float) -> None:
+        # A bucket holds the revocations that expire before the end of its slot, so it is dropped once the slot has passed
+        oldest_bucket = self._oldest_bucket
+        if oldest_bucket is None or oldest_bucket * self.bucket_seconds > now:
+            return
+
+        # The expired buckets are dropped by a later lookup if the list is being updated, so lookups never wait for a rebuild of the filter
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            current = math.ceil(now / self.bucket_seconds)
+            for index in [index for index in self._buckets if index < current]:
+                self._count -= len(self._buckets.pop(index).fingerprints)
+            self._oldest_bucket = min(self._buckets, default=None)
+            # The Bloom filter keeps the bits of the dropped revocations until it is rebuilt,
+            # which only matters for tokens that have expired anyway
+        finally:
+            self._lock.release()
+
+
+def _key(kind: str, value: str) -> bytes:
+    return f"{kind}:{value}".encode()
+
+
+class RevocationFeed:
+    """
+    Keeps a `RevocationList` in sync with a `RevocationSource`, incrementally, by polling it in the background.
+    Messages from a push-based feed, like a message queue, can be passed to `push` instead.
+
+    :param revocations: The denylist to keep in sync.
+    :param source: Where the revocations come from. If None, the revocations are only pushed.
+    :param interval: The time in seconds between polls of the source.
+    :param retry_interval: The time in seconds until a failed poll is retried.
+    """
+
+    def __init__(
+        self,
+        revocations: RevocationList,
+        source: RevocationSource | None = None,
+        interval: float = 5,
+        retry_interval: float = 1,
+    ):
+        self.revocations = revocations
+        self.source = source
+        self.cursor: str | None = None
+        self._lock = threading.Lock()
+        self._refresher = Refresher(self.sync, interval, retry_interval)
+
+    def sync(self) -> int:
+        """
+        Fetches the revocations since the previous sync from the source and returns how many there were.
+
+        Raises:
+        - ValueError if the feed has no source.
+        """
+        self._require_source()
+        with self._lock:
+            update = self.source.fetch(self.cursor)
+            self.revocations.add(update.revocations)
+            self.revocations.advance(update.watermark)
+            self.cursor = update.cursor
+            return len(update.revocations)
+
+    def push(
+        self, revocations: Iterable[Revocation | dict], watermark: float | None = None
+    ) -> None:
+        """
+        Adds revocations that were pushed to this process, for example, from a message callback.
+
+        Args:
+            revocations: The revocations, as `Revocation`s or in the form that `Revocation.parse` parses.
+            watermark: The time up to which the feed is complete, if the feed tells it.
+        """
+        parsed = []
+        for revocation in revocations:
+            if isinstance(revocation, Revocation):
+                parsed.append(revocation)
+            else:
+                parsed.extend(Revocation.parse(revocation))
+        self.revocations.add(parsed)
+        if watermark is not None:
+            self.revocations.advance(watermark)
+
+    def start(self) -> None:
+        """
+        Starts polling the source in the background, first immediately.
+
+        Raises:
+        - ValueError if the feed has no source.
+        """
+        self._require_source()
+        self._refresher.start()
+
+    def stop(self) -> None:
+        self._refresher.stop()
+
+    def _require_source(self) -> None:
+        if self.source is None:
+            raise ValueError(
+                "The revocation feed has no source, so its revocations can only be pushed"
+            )
+
+
+def _parse_revocations(entries: Iterable[dict]) -> list[Revocation]:
+    revocations = []
+    for entry in entries:
+        try:
+            revocations.extend(Revocation.parse(entry))
+        except ValueError:
+            logger.warning("Ignoring a malformed revocation: %s", entry)
+    return revocations
+
+
+class PollingSource:
+    """
+    Polls an HTTP endpoint for the revocations.
+
+    The endpoint is called as `GET <url>?cursor=<cursor>`, without the cursor on the first poll, and responds with
+    `{"revocations": [{"jti": "...", "exp": 1700000000}, {"sid": "...", "exp": 1700000000}], "cursor": "...", "watermark": 1700000000}`.
+    The cursor and the watermark are optional. Without a watermark, the time of the request is used.
+
+    :param url: The URL of the endpoint.
+    :param client: The HTTP client. By default, a client is created on first use.
+    :param timeout: The timeout in seconds of a request, if the client is created here.
+    """
+
+    def __init__(
+        self, url: str, client: "httpx.Client | None" = None, timeout: float = 5
+    ):
+        self.url = url
+        self._client = client
+        self._timeout = timeout
+
+    def fetch(self, cursor: str | None) -> RevocationUpdate:
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.Client(timeout=self._timeout)
+
+        requested_at = time.time()
+        params = {"cursor": cursor} if cursor is not None else None
+        response = self._client.get(self.url, params=params)
+        response.raise_for_status()
+        body = response.json()
+        return RevocationUpdate(
+            _parse_revocations(body.get("revocations", [])),
+            body.get("cursor", cursor),
+            float(body.get("watermark", requested_at)),
+        )
+
+
+class FileSource:
+    """
+    Reads the revocations from a file with one JSON revocation per line, in the form that `Revocation.parse` parses,
+    which another process appends to. Only the lines that were appended since the previous read are parsed.
+    If the file is replaced or truncated, it is read again from the start.
+
+    :param path: The path of the file.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+
+    def fetch(self, cursor: str | None) -> RevocationUpdate:
+        read_at = time.time()
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return RevocationUpdate([], None, read_at)
+
+        with file:
+            stat = os.fstat(file.fileno())
+            inode, offset = _parse_file_cursor(cursor)
+            if inode != stat.st_ino or offset > stat.st_size:
+                offset = 0
+            file.seek(offset)
+            data = file.read()
+
+        # A partially written last line is read on the next fetch
+        end = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:end].splitlines():
+            if line.strip():
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Ignoring a malformed line in %s", self.path)
+        return RevocationUpdate(
+            _parse_revocations(entries), f"{stat.st_ino}:{offset + end}", read_at
+        )
+
+
+def _parse_file_cursor(cursor: str | None) -> tuple[int | None, int]:
+    if cursor is None:
+        return None, 0
+    inode, _, offset = cursor.partition(":")
+    return int(inode), int(offset)
@@ -0,0 +1,146 @@
+import json
+import logging
+
+from .cache import CacheBackend
+from .instrumentation import NO_INSTRUMENTATION, Instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCache:
+    """
+    Stores the validated tokens, the introspection results and the token signing keys of `Auth` in a `CacheBackend`,
+    so they are shared with the other processes that use the same backend.
+
+    The validated tokens and introspection results are namespaced by the client ID, so services that share a backend do not see each other's results.
+    An error of the backend is logged and treated as a cache miss, so an unavailable cache never fails a validation.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        client_id: str,
+        well_known_endpoint: str,
+        instrumentation: Instrumentation = NO_INSTRUMENTATION,
+    ):
+        self.backend = backend
+        self._prefix = f"psp_auth:{client_id}:".encode()
+        self._certs_key = f"psp_auth:jwks:{well_known_endpoint}".encode()
+        self._instrumentation = instrumentation
+
+    def _token_key(self, token_hash: bytes) -> bytes:
+        return self._prefix + b"token:" + token_hash.hex().encode()
+
+    def _introspection_key(self, token_hash: bytes) -> bytes:
+        return self._prefix + b"introspection:" + token_hash.hex().encode()
+
+    def _get(self, key: bytes) -> bytes | None:
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            logger.warning("Failed to get a value from the shared cache", exc_info=True)
+            value = None
+        self._instrumentation.cache("shared", "miss" if value is None else "hit")
+        return value
+
+    async def _get_async(self, key: bytes) -> bytes | None:
+        try:
+            value = await self.backend.get_async(key)
+        except Exception:
+            logger.warning("Failed to get a value from the shared cache", exc_info=True)
+            value = None
+        self._instrumentation.cache("shared", "miss" if value is None else "hit")
+        return value
+
+    def _set(self, key: bytes, value: bytes, ttl: float) -> None:
+        try:
+            self.backend.set(key, value, ttl)
+        except Exception:
+            logger.warning("Failed to set a value in the shared cache", exc_info=True)
+
+    async def _set_async(self, key: bytes, value: bytes, ttl: float) -> None:
+        try:
+            await self.backend.set_async(key, value, ttl)
+        except Exception:
+            logger.warning("Failed to set a value in the shared cache", exc_info=True)
+
+    def get_token(self, token_hash: bytes) -> tuple[dict, dict] | None:
+        """
+        Returns the header and the claims of the validated token, or None if it is not cached.
+        """
+        return _decode_json(self._get(self._token_key(token_hash)))
+
+    async def get_token_async(self, token_hash: bytes) -> tuple[dict, dict] | None:
+        return _decode_json(await self._get_async(self._token_key(token_hash)))
+
+    def set_token(
+        self, token_hash: bytes, header: dict, claims: dict, ttl: float
+    ) -> None:
+        self._set(self._token_key(token_hash), _encode_json((header, claims)), ttl)
+
+    async def set_token_async(
+        self, token_hash: bytes, header: dict, claims: dict, ttl: float
+    ) -> None:
+        await self._set_async(
+            self._token_key(token_hash), _encode_json((header, claims)), ttl
+        )
+
+    async def get_introspection_async(self, token_hash: bytes) -> bool | None:
+        """
+        Returns whether the token is active, or None if the introspection result is not cached.
+        """
+        value = await self._get_async(self._introspection_key(token_hash))
+        return None if value is None else value == b"1"
+
+    async def set_introspection_async(
+        self, token_hash: bytes, is_active: bool, ttl: float
+    ) -> None:
+        await self._set_async(
+            self._introspection_key(token_hash), b"1" if is_active else b"0", ttl
+        )
+
+    def get_certs(self) -> tuple[dict, float, float] | None:
+        """
+        Returns the token signing keys (JWKS), the time they were fetched from the auth provider and their lifetime in seconds,
+        or None if they are not cached.
+        """
+        return _decode_certs(self._get(self._certs_key))
+
+    async def get_certs_async(self) -> tuple[dict, float, float] | None:
+        return _decode_certs(await self._get_async(self._certs_key))
+
+    def set_certs(
+        self, certs: dict, fetched_at: float, lifetime: float, ttl: float
+    ) -> None:
+        """
+        :param lifetime: How long the keys are valid after `fetched_at`, which every process that gets them uses.
+        :param ttl: How long the keys are kept in the backend.
+        """
+        self._set(self._certs_key, _encode_json((certs, fetched_at, lifetime)), ttl)
+
+    async def set_certs_async(
+        self, certs: dict, fetched_at: float, lifetime: float, ttl: float
+    ) -> None:
+        await self._set_async(
+            self._certs_key, _encode_json((certs, fetched_at, lifetime)), ttl
+        )
+
+
+def _encode_json(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _decode_json(value: bytes | None):
+    if value is None:
+        return None
+    try:
+        return tuple(json.loads(value))
+    except ValueError:
+        logger.warning("Ignoring a malformed value in the shared cache")
+        return None
+
+
+def _decode_certs(value: bytes | None) -> tuple[dict, float, float] | None:
+    certs = _decode_json(value)
+    # Keys that were stored without their lifetime are fetched again
+    return certs if certs is not None and len(certs) == 3 else None
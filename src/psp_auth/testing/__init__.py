@@ -1,10 +1,23 @@
 from psp_auth.core import Auth
 from joserfc import jwt
-from joserfc.jwk import RSAKey
+from joserfc.jwk import Key
 import time
 from dataclasses import dataclass, field
+from typing import Callable, Iterator
 from unittest.mock import Mock
 from psp_auth.errors import AuthException
+from psp_auth.testing.keys import signing_algorithm, signing_key
+from psp_auth.testing.minting import TokenMinter, write_tokens
+
+__all__ = [
+    "DEFAULT_ISSUER",
+    "MockAuth",
+    "MockToken",
+    "MockUser",
+    "TokenMinter",
+    "signing_key",
+    "write_tokens",
+]
 
 DEFAULT_ISSUER = "https://auth.testing.psp.com/realms/psp"
 
@@ -126,22 +139,38 @@ class MockToken:
         return claims
 
 
-def _generate_private_key() -> RSAKey:
-    return RSAKey.generate_key(2048, auto_kid=True)
-
-
-def _public_certs_from_key(key: RSAKey) -> dict:
+def _public_certs_from_key(key: Key) -> dict:
     public_jwk = key.as_dict(private=False)
     return {"keys": [public_jwk]}
 
 
+def _unique_token_id(index: int) -> dict:
+    return {"jti": f"{index:08x}-0000-4000-8000-000000000000"}
+
+
 class MockAuth:
-    def __init__(self, client_id: str, monkeypatch, issuer: str = DEFAULT_ISSUER):
+    def __init__(
+        self,
+        client_id: str,
+        monkeypatch,
+        issuer: str = DEFAULT_ISSUER,
+        key_type: str = "RSA",
+    ):
+        """
+        Args:
+            client_id: The client ID of the service under test.
+            monkeypatch: The pytest monkeypatch fixture, which is used to make `Auth` accept the issued tokens without an auth provider.
+                If None, `Auth` is not patched, for example, when the tokens are minted for a load test against a real or stand-in auth provider.
+            issuer: The issuer of the tokens.
+            key_type: The type of the signing key: "RSA", "EC" or "Ed25519". The key is shared by the whole process, see `signing_key`.
+        """
         self._issuer = issuer
         self._client_id = client_id
-        self._private_key = _generate_private_key()
+        self._private_key = signing_key(key_type)
+        self._algorithm = signing_algorithm(key_type)
         self._public_certs = _public_certs_from_key(self._private_key)
-        self._mock_auth(monkeypatch)
+        if monkeypatch is not None:
+            self._mock_auth(monkeypatch)
 
     def _mock_auth(self, monkeypatch) -> None:
         public_certs = self._public_certs
@@ -151,10 +180,16 @@ class MockAuth:
             nonlocal public_certs
             return public_certs
 
+        async def mock_token_certs_async(self):
+            return mock_token_certs(self)
+
         def mock_token_issuer(self):
             nonlocal issuer
             return issuer
 
+        async def mock_token_issuer_async(self):
+            return mock_token_issuer(self)
+
         async def mock_remote_token_validation(self, token: str):
             try:
                 token = self.validate_token(token)
@@ -168,7 +203,9 @@ class MockAuth:
             return mock
 
         monkeypatch.setattr(Auth, "token_certs", mock_token_certs)
+        monkeypatch.setattr(Auth, "token_certs_async", mock_token_certs_async)
         monkeypatch.setattr(Auth, "token_issuer", mock_token_issuer)
+        monkeypatch.setattr(Auth, "token_issuer_async", mock_token_issuer_async)
         monkeypatch.setattr(
             Auth, "_make_introspection_request", mock_remote_token_validation
         )
@@ -186,16 +223,50 @@ class MockAuth:
         is_resource_namespaced: bool = True,
     ):
         token = jwt.encode(
-            header={"alg": "RS256", "kid": self._private_key.kid, "typ": "JWT"},
+            header={"alg": self._algorithm, "kid": self._private_key.kid, "typ": "JWT"},
             claims=token._claims(
                 self._client_id,
                 extra_audience=[self._client_id] if add_client_as_audience else [],
                 prepend_resource_to_scopes=is_resource_namespaced,
             ),
             key=self._private_key,
+            algorithms=[self._algorithm],
         )
 
         return token
 
+    def issue_tokens(
+        self,
+        count: int,
+        template: MockToken | None = None,
+        vary: Callable[[int], dict] | None = _unique_token_id,
+        add_client_as_audience: bool = True,
+        is_resource_namespaced: bool = True,
+        processes: int | None = None,
+    ) -> Iterator[str]:
+        """
+        Issues many tokens, which are yielded as they are signed, for example, for a load test.
+        The header and the claims of the template are only built once.
+
+        Args:
+            count: The number of tokens.
+            template: The claims of every token. By default, a `MockToken()`.
+            vary: Returns the claims that differ for the token with the given index.
+                By default, each token gets a unique token ID (`jti`), so all the tokens are distinct.
+            processes: The number of processes that sign the tokens in parallel.
+                If None, they are signed in this process. Otherwise, `vary` must be picklable, for example, a module-level function.
+
+        Example:
+            `write_tokens("tokens.txt", mauth.issue_tokens(1_000_000, processes=8))`
+        """
+        template = template if template is not None else MockToken()
+        claims = template._claims(
+            self._client_id,
+            extra_audience=[self._client_id] if add_client_as_audience else [],
+            prepend_resource_to_scopes=is_resource_namespaced,
+        )
+        minter = TokenMinter(self._private_key, self._algorithm, claims, vary)
+        return minter.mint_many(count, processes=processes)
+
     def resource_namespace_scope(self, scope: str) -> str:
         return f"{self._client_id}:{scope}"
@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from joserfc.jwk import ECKey, Key, OKPKey, RSAKey, import_key
+
+# The signing algorithm and the generator of each key type
+KEY_TYPES = {
+    "RSA": ("RS256", lambda: RSAKey.generate_key(2048, auto_kid=True)),
+    "EC": ("ES256", lambda: ECKey.generate_key("P-256", auto_kid=True)),
+    "Ed25519": ("Ed25519", lambda: OKPKey.generate_key("Ed25519", auto_kid=True)),
+}
+
+# The environment variable with the directory where the generated keys are cached on disk
+KEY_CACHE_DIR_ENV = "PSP_AUTH_TESTING_KEY_DIR"
+
+_keys: dict[tuple[str, int], Key] = {}
+_lock = threading.Lock()
+
+
+def signing_algorithm(key_type: str) -> str:
+    """
+    Returns the signing algorithm (`alg`) that is used with keys of the given type.
+    """
+    return KEY_TYPES[key_type][0]
+
+
+def signing_key(
+    key_type: str = "RSA", index: int = 0, cache_dir: str | os.PathLike | None = None
+) -> Key:
+    """
+    Returns a private key for signing test tokens, which is generated once per process and reused afterwards,
+    since generating an RSA key takes much longer than a test.
+
+    Args:
+        key_type: "RSA" (2048 bits), "EC" (P-256) or "Ed25519".
+        index: Which key of the type to return, for tests that need several distinct keys.
+        cache_dir: A directory where the key is also cached on disk, so it is only generated once across test runs.
+            By default, the directory in the `PSP_AUTH_TESTING_KEY_DIR` environment variable is used, if it is set.
+            Only use it for test keys, since the private keys are stored unencrypted.
+
+    Raises:
+    - KeyError if the key type is unknown.
+    """
+    _, generate = KEY_TYPES[key_type]
+    with _lock:
+        key = _keys.get((key_type, index))
+        if key is None:
+            if cache_dir is None:
+                cache_dir = os.environ.get(KEY_CACHE_DIR_ENV)
+            path = (
+                Path(cache_dir) / f"{key_type}-{index}.json"
+                if cache_dir is not None
+                else None
+            )
+            key = _load_key(path) if path is not None else None
+            if key is None:
+                key = generate()
+                if path is not None:
+                    _store_key(path, key)
+            _keys[(key_type, index)] = key
+        return key
+
+
+def _load_key(path: Path) -> Key | None:
+    try:
+        return import_key(json.loads(path.read_text()))
+    except (OSError, ValueError):
+        return None
+
+
+def _store_key(path: Path, key: Key) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first, so concurrent test processes never read a partial key
+    fd, temporary_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as file:
+        json.dump(key.as_dict(private=True), file)
+    os.replace(temporary_path, path)
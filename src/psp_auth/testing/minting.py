@@ -0,0 +1,137 @@
+import base64
+import collections
+import json
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, TextIO
+
+from joserfc.jwk import Key, import_key
+from joserfc.jws import JWSRegistry
+
+# The minter of a worker process of a `ProcessPoolExecutor`
+_worker_minter: "TokenMinter | None" = None
+
+
+def _b64(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _json(value: dict) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+class TokenMinter:
+    """
+    Signs tokens that share a header and a claims template.
+    The header is encoded once, and each token only encodes its claims and computes its signature.
+
+    :param key: The private signing key.
+    :param algorithm: The signing algorithm (`alg`).
+    :param claims: The claims of every token.
+    :param vary: Returns the claims that differ for the token with the given index, which override the claims of the template.
+    """
+
+    def __init__(
+        self,
+        key: Key,
+        algorithm: str,
+        claims: dict,
+        vary: Callable[[int], dict] | None = None,
+    ):
+        self.key = key
+        self.algorithm = algorithm
+        self.claims = claims
+        self.vary = vary
+        self._sign = JWSRegistry.algorithms[algorithm].sign
+        self._header = _b64(_json({"alg": algorithm, "kid": key.kid, "typ": "JWT"}))
+
+    def mint(self, index: int) -> str:
+        claims = self.claims if self.vary is None else self.claims | self.vary(index)
+        signing_input = self._header + b"." + _b64(_json(claims))
+        signature = self._sign(signing_input, self.key)
+        return (signing_input + b"." + _b64(signature)).decode()
+
+    def mint_range(self, start: int, stop: int) -> list[str]:
+        return [self.mint(index) for index in range(start, stop)]
+
+    def mint_many(
+        self, count: int, processes: int | None = None, chunk_size: int = 1000
+    ) -> Iterator[str]:
+        """
+        Yields `count` tokens, in the order of their indices, as they are signed.
+
+        Args:
+            count: The number of tokens.
+            processes: The number of processes that sign the tokens in parallel.
+                If None, the tokens are signed in this process. Otherwise, `vary` must be picklable, for example, a module-level function.
+            chunk_size: The number of tokens that a process signs at a time.
+        """
+        if processes is None:
+            for index in range(count):
+                yield self.mint(index)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                self.key.as_dict(private=True),
+                self.algorithm,
+                self.claims,
+                self.vary,
+            ),
+        ) as executor:
+            # Only a few chunks are in flight at a time, so the tokens are streamed rather than all kept in memory
+            chunks: collections.deque[Future] = collections.deque()
+            starts = iter(range(0, count, chunk_size))
+            for start in starts:
+                chunks.append(
+                    executor.submit(_mint_range, start, min(start + chunk_size, count))
+                )
+                if len(chunks) >= 2 * processes:
+                    break
+
+            while chunks:
+                tokens = chunks.popleft().result()
+                start = next(starts, None)
+                if start is not None:
+                    chunks.append(
+                        executor.submit(
+                            _mint_range, start, min(start + chunk_size, count)
+                        )
+                    )
+                yield from tokens
+
+
+def _init_worker(
+    key: dict, algorithm: str, claims: dict, vary: Callable[[int], dict] | None
+) -> None:
+    global _worker_minter
+    _worker_minter = TokenMinter(import_key(key), algorithm, claims, vary)
+
+
+def _mint_range(start: int, stop: int) -> list[str]:
+    return _worker_minter.mint_range(start, stop)
+
+
+def write_tokens(file: str | os.PathLike | TextIO, tokens: Iterable[str]) -> int:
+    """
+    Writes the tokens to a file, one per line, as they are produced, and returns how many were written.
+    Together with `MockAuth.issue_tokens`, this writes more tokens than fit in memory.
+
+    Args:
+        file: The path of the file, or a text file that is open for writing.
+        tokens: The tokens to write.
+    """
+    if not hasattr(file, "write"):
+        with open(file, "w") as opened_file:
+            return write_tokens(opened_file, tokens)
+
+    count = 0
+    for token in tokens:
+        file.write(token)
+        file.write("\n")
+        count += 1
+    return count
@@ -0,0 +1,304 @@
+import base64
+import collections
+import dataclasses
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable
+from urllib.parse import parse_qs
+
+from joserfc import jwt
+from joserfc.errors import JoseError
+from joserfc.jwk import Key, KeySet
+
+from psp_auth.config import AuthConfig
+from psp_auth.testing import DEFAULT_ISSUER
+from psp_auth.testing.keys import signing_key
+
+DISCOVERY = "discovery"
+JWKS = "jwks"
+INTROSPECTION = "introspection"
+
+_PATHS = {
+    "/.well-known/openid-configuration": DISCOVERY,
+    "/certs": JWKS,
+    "/introspect": INTROSPECTION,
+}
+
+
+@dataclasses.dataclass
+class Fault:
+    """
+    A fault that the `IdentityProviderServer` injects into the responses of an endpoint.
+
+    Attributes:
+        latency: The time in seconds before the response is sent.
+        status: If set, the endpoint responds with this status code and an empty body instead.
+        not_modified: Whether the endpoint responds with `304 Not Modified`, whatever the request.
+        body_delay: The time in seconds over which the response body is sent, in small pieces.
+        times: The number of requests that the fault applies to. If None, it applies until it is cleared.
+    """
+
+    latency: float = 0
+    status: int | None = None
+    not_modified: bool = False
+    body_delay: float = 0
+    times: int | None = None
+
+
+class IdentityProviderServer:
+    """
+    A stand-in identity provider on localhost, which serves the OpenID configuration, the token signing keys (JWKS) and token introspection over real HTTP,
+    so the HTTP clients, the conditional requests and the caches of `Auth` run as they do in production.
+
+    By default, it serves the same key as `MockAuth`, so the tokens that `MockAuth(client_id, monkeypatch=None)` issues are valid.
+    The documents are served with an `ETag`, so unchanged documents get `304 Not Modified` responses.
+    Faults can be injected into each endpoint with `inject`, and the requests and connections are counted.
+
+    Example:
+        ```
+        with IdentityProviderServer() as server:
+            auth = Auth(AuthConfig("my-service", well_known_endpoint=server.well_known_endpoint))
+            auth.validate_token(MockAuth("my-service", None).issue_token(MockToken()))
+            assert server.requests[JWKS] == 1
+        ```
+
+    :param keys: The token signing keys. By default, the key of `signing_key()`.
+    :param issuer: The issuer in the OpenID configuration.
+    :param max_age: If set, the documents are served with `Cache-Control: max-age`.
+    :param client_secret: If set, introspection requests must authenticate with it, or they get a 401 response.
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[Key] | None = None,
+        issuer: str | None = None,
+        max_age: int | None = None,
+        client_secret: str | None = None,
+    ):
+        self.issuer = issuer or DEFAULT_ISSUER
+        self.max_age = max_age
+        self.client_secret = client_secret
+        self.requests: collections.Counter[str] = collections.Counter()
+        self.connections = 0
+        self.revoked: set[str] = set()
+        self._faults: dict[str, Fault] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self.set_keys(keys if keys is not None else [signing_key()])
+
+    @property
+    def well_known_endpoint(self) -> str:
+        return f"{self.url}/.well-known/openid-configuration"
+
+    @property
+    def keys(self) -> list[Key]:
+        return list(self._keys)
+
+    def set_keys(self, keys: Iterable[Key]) -> None:
+        """
+        Replaces the token signing keys.
+        """
+        keys = list(keys)
+        with self._lock:
+            self._keys = keys
+            self._key_set = KeySet(keys)
+            self._certs = {"keys": [key.as_dict(private=False) for key in keys]}
+
+    def rotate(self, key: Key, keep_previous: bool = True) -> None:
+        """
+        Rotates the token signing keys to `key`.
+
+        Args:
+            key: The new key.
+            keep_previous: Whether the previous keys are still served, so the tokens signed with them stay valid, like during a real key rotation.
+        """
+        self.set_keys([key, *self._keys] if keep_previous else [key])
+
+    def revoke(self, token: str) -> None:
+        """
+        Makes introspection report the token as inactive.
+        """
+        self.revoked.add(token)
+
+    def inject(self, endpoint: str, fault: Fault) -> None:
+        """
+        Injects a fault into the responses of the endpoint: `DISCOVERY`, `JWKS` or `INTROSPECTION`.
+        It replaces any previous fault of the endpoint.
+        """
+        if endpoint not in _PATHS.values():
+            raise ValueError(f"Unknown endpoint: {endpoint}")
+        with self._lock:
+            # A copy, since the remaining `times` are counted down
+            self._faults[endpoint] = dataclasses.replace(fault)
+
+    def clear_faults(self) -> None:
+        with self._lock:
+            self._faults.clear()
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.connections = 0
+
+    def start(self) -> "IdentityProviderServer":
+        if self._thread is None:
+            # A short poll interval, so `stop` returns quickly
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, args=(0.05,), daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "IdentityProviderServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _take_fault(self, endpoint: str) -> Fault | None:
+        with self._lock:
+            self.requests[endpoint] += 1
+            fault = self._faults.get(endpoint)
+            if fault is not None and fault.times is not None:
+                fault.times -= 1
+                if fault.times <= 0:
+                    del self._faults[endpoint]
+            return fault
+
+    def _document(self, endpoint: str) -> dict:
+        if endpoint == DISCOVERY:
+            return {
+                "issuer": self.issuer,
+                "jwks_uri": f"{self.url}/certs",
+                "introspection_endpoint": f"{self.url}/introspect",
+            }
+        with self._lock:
+            return self._certs
+
+    def _introspect(self, form: dict[str, list[str]]) -> dict:
+        token = form.get("token", [""])[0]
+        if token in self.revoked:
+            return {"active": False}
+        try:
+            with self._lock:
+                key_set = self._key_set
+            claims = jwt.decode(
+                token, key_set, algorithms=AuthConfig.allowed_algorithms
+            ).claims
+        except (JoseError, ValueError):
+            return {"active": False}
+        if claims.get("exp", float("inf")) <= time.time():
+            return {"active": False}
+        return claims | {"active": True}
+
+    def _is_authorized(self, authorization: str | None) -> bool:
+        if self.client_secret is None:
+            return True
+        if authorization is None or not authorization.startswith("Basic "):
+            return False
+        try:
+            credentials = base64.b64decode(authorization[6:]).decode()
+        except ValueError:
+            return False
+        return credentials.partition(":")[2] == self.client_secret
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep the connections alive, so the connection reuse of the clients can be observed
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                endpoint = _PATHS.get(self.path)
+                if endpoint not in (DISCOVERY, JWKS):
+                    self._send_status(404)
+                    return
+
+                fault = self._start(endpoint)
+                if fault is not None and fault.status is not None:
+                    self._send_status(fault.status)
+                    return
+
+                body = json.dumps(server._document(endpoint)).encode()
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+                if (fault is not None and fault.not_modified) or self.headers.get(
+                    "If-None-Match"
+                ) == etag:
+                    self._send_status(304, {"ETag": etag})
+                    return
+                self._send(body, {"ETag": etag}, fault)
+
+            def do_POST(self):
+                form = parse_qs(
+                    self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                )
+                if _PATHS.get(self.path) != INTROSPECTION:
+                    self._send_status(404)
+                    return
+
+                fault = self._start(INTROSPECTION)
+                if fault is not None and fault.status is not None:
+                    self._send_status(fault.status)
+                    return
+                if not server._is_authorized(self.headers.get("Authorization")):
+                    self._send_status(401)
+                    return
+
+                body = json.dumps(server._introspect(form)).encode()
+                self._send(body, {}, fault)
+
+            def _start(self, endpoint: str) -> Fault | None:
+                fault = server._take_fault(endpoint)
+                if fault is not None and fault.latency > 0:
+                    time.sleep(fault.latency)
+                return fault
+
+            def _send_status(self, status: int, headers: dict | None = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _send(self, body: bytes, headers: dict, fault: Fault | None):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if server.max_age is not None:
+                    self.send_header("Cache-Control", f"max-age={server.max_age}")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+
+                if fault is None or fault.body_delay <= 0:
+                    self.wfile.write(body)
+                    return
+                pieces = 10
+                size = -(-len(body) // pieces)
+                for start in range(0, len(body), size):
+                    self.wfile.write(body[start : start + size])
+                    self.wfile.flush()
+                    time.sleep(fault.body_delay / pieces)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
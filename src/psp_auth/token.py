@@ -1,14 +1,108 @@
-from joserfc import jwt
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable
 from .user import User
 
+if TYPE_CHECKING:
+    from joserfc import jwt
+
+
+@dataclass(frozen=True, slots=True)
+class StandardClaims:
+    """
+    A typed, read-only view of the standard claims of a token.
+    A claim that is not in the token is None.
+    """
+
+    issuer: str | None
+    subject: str | None
+    audience: tuple[str, ...]
+    expires_at: int | None
+    not_before: int | None
+    issued_at: int | None
+    token_id: str | None
+    authorized_party: str | None
+    session_id: str | None
+    scopes: tuple[str, ...]
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> "StandardClaims":
+        scope = claims.get("scope")
+        return cls(
+            issuer=claims.get("iss"),
+            subject=claims.get("sub"),
+            audience=tuple(_audience_list(claims.get("aud"))),
+            expires_at=claims.get("exp"),
+            not_before=claims.get("nbf"),
+            issued_at=claims.get("iat"),
+            token_id=claims.get("jti"),
+            authorized_party=claims.get("azp"),
+            session_id=claims.get("sid"),
+            scopes=tuple(scope.split(" ")) if scope else (),
+        )
+
+
+def _audience_list(audience: str | list[str] | None) -> list[str]:
+    if audience is None:
+        return []
+    if isinstance(audience, str):
+        return [audience]
+    return audience
+
+
+class ScopeMatcher:
+    """
+    A scope requirement that is compiled once, for example, when a route is declared,
+    so that checking a token only does set lookups.
+    """
+
+    __slots__ = ("scopes",)
+
+    def __init__(self, scopes: Iterable[str], resource: str | None = None):
+        """
+        Args:
+            scopes: The required scopes.
+            resource: If given, the scopes are namespaced under this resource.
+        """
+        if resource is not None:
+            scopes = (f"{resource}:{scope}" for scope in scopes)
+        self.scopes = frozenset(scopes)
+
+    def matches(self, token: "Token") -> bool:
+        """
+        Returns:
+            Whether the token has all the required scopes.
+        """
+        return self.scopes <= token.scope_set
+
 
 class Token:
-    _token: jwt.Token
+    """
+    A validated token.
+
+    The derived values, like the scopes and the user, are computed lazily and at most once per token.
+    """
+
+    __slots__ = (
+        "_token",
+        "_resource",
+        "_scopes",
+        "_scope_set",
+        "_audience_set",
+        "_user",
+        "_standard_claims",
+    )
+
+    _token: "jwt.Token"
     _resource: str
 
-    def __init__(self, _token: jwt.Token, _resource: str):
+    def __init__(self, _token: "jwt.Token", _resource: str):
         self._token = _token
         self._resource = _resource
+        self._scopes = None
+        self._scope_set = None
+        self._audience_set = None
+        self._user = None
+        self._standard_claims = None
 
     @property
     def claims(self) -> dict:
@@ -20,7 +114,15 @@ class Token:
 
     @property
     def user(self) -> User:
-        return User(self.claims, self._resource)
+        if self._user is None:
+            self._user = User(self.claims, self._resource)
+        return self._user
+
+    @property
+    def standard_claims(self) -> StandardClaims:
+        if self._standard_claims is None:
+            self._standard_claims = StandardClaims.from_claims(self.claims)
+        return self._standard_claims
 
     @property
     def expires_at(self) -> int:
@@ -53,17 +155,37 @@ class Token:
         """
         return self.claims["aud"]
 
+    @property
+    def audience_set(self) -> frozenset[str]:
+        """
+        The audience as a set, which is built once per token.
+        """
+        if self._audience_set is None:
+            self._audience_set = frozenset(_audience_list(self.claims.get("aud")))
+        return self._audience_set
+
     @property
     def allowed_origins(self) -> list[str]:
         return self.claims["allowed_origins"]
 
     @property
     def scopes(self) -> list[str]:
-        scopes = self.claims["scope"]
-        if scopes == "":
-            return []
-        else:
-            return self.claims["scope"].split(" ")
+        """
+        The scopes, which are parsed once per token. You should not modify the returned list.
+        """
+        if self._scopes is None:
+            scopes = self.claims["scope"]
+            self._scopes = [] if scopes == "" else scopes.split(" ")
+        return self._scopes
+
+    @property
+    def scope_set(self) -> frozenset[str]:
+        """
+        The scopes as a set, which is parsed once per token.
+        """
+        if self._scope_set is None:
+            self._scope_set = frozenset(self.scopes)
+        return self._scope_set
 
     @property
     def session_id(self) -> str:
@@ -85,7 +207,5 @@ class Token:
     def has_scopes(
         self, scopes: list[str], is_resource_namespaced: bool = True
     ) -> bool:
-        token_scopes = self.scopes
-        if is_resource_namespaced:
-            scopes = map(lambda scope: f"{self._resource}:{scope}", scopes)
-        return all(scope in token_scopes for scope in scopes)
+        resource = self._resource if is_resource_namespaced else None
+        return ScopeMatcher(scopes, resource).matches(self)
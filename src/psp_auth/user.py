@@ -1,10 +1,50 @@
+from typing import Iterable
+
+
+class RoleMatcher:
+    """
+    A role requirement that is compiled once, for example, when a route is declared,
+    so that checking a user only does set lookups.
+    """
+
+    __slots__ = ("resource", "roles", "require_all")
+
+    def __init__(self, resource: str, roles: Iterable[str], require_all: bool = True):
+        """
+        Args:
+            resource: The resource. If `resource == "global"`, then it will check for global roles.
+            roles: The roles.
+            require_all: Whether the user must have all the roles, instead of any of them.
+        """
+        self.resource = resource
+        self.roles = frozenset(roles)
+        self.require_all = require_all
+
+    def matches(self, user: "User") -> bool:
+        """
+        Returns:
+            Whether the user has all (or any, if not `require_all`) of the roles on the resource.
+        """
+        resource_roles = user._get_resource_role_set(self.resource)
+        if resource_roles is None:
+            return False
+
+        if self.require_all:
+            return self.roles <= resource_roles
+        return not self.roles.isdisjoint(resource_roles)
+
+
 class User:
+    __slots__ = ("_claims", "_resource", "_role_sets")
+
     _claims: dict
     _resource: str
+    _role_sets: dict[str, frozenset[str] | None]
 
     def __init__(self, _claims: dict, _resource: str):
         self._claims = _claims
         self._resource = _resource
+        self._role_sets = {}
 
     @property
     def id(self) -> str:
@@ -61,12 +101,7 @@ class User:
         Returns:
             Whether the user has one of the `roles` on the `resource`.
         """
-
-        resource_roles = self._get_resource_roles(resource)
-        if resource_roles is None:
-            return False
-
-        return any(role in resource_roles for role in roles)
+        return RoleMatcher(resource, roles, require_all=False).matches(self)
 
     def has_all_resource_roles(self, resource: str, roles: list[str]) -> bool:
         """
@@ -77,12 +112,16 @@ class User:
         Returns:
             Whether the user has all the `roles` on the `resource`.
         """
+        return RoleMatcher(resource, roles, require_all=True).matches(self)
 
-        resource_roles = self._get_resource_roles(resource)
-        if resource_roles is None:
-            return False
-
-        return all(role in resource_roles for role in roles)
+    def _get_resource_role_set(self, resource: str) -> frozenset[str] | None:
+        """
+        The same as `_get_resource_roles`, except as a set, which is built once per resource.
+        """
+        if resource not in self._role_sets:
+            roles = self._get_resource_roles(resource)
+            self._role_sets[resource] = None if roles is None else frozenset(roles)
+        return self._role_sets[resource]
 
     def _get_resource_roles(self, resource: str) -> dict | None:
         if resource == "global":
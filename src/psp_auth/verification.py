@@ -0,0 +1,235 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from joserfc import jwt
+from joserfc.jwk import Key, KeySet, import_key
+
+# The token signing keys that were mirrored into this worker process, by issuer: their version, the key set and the keys by key ID
+_mirrored_keys: dict[str | None, tuple[int, KeySet, dict[str, Key]]] = {}
+
+
+def import_keys(certs: dict) -> tuple[KeySet, dict[str, Key]]:
+    key_set = KeySet.import_key_set(certs)
+    return key_set, {key.kid: key for key in key_set.keys if key.kid is not None}
+
+
+def decode_token(
+    token: str, key: Key | KeySet | dict, algorithms: Iterable[str]
+) -> tuple[dict, dict]:
+    """
+    Verifies the signature of the token and returns its header and claims.
+    This is a module-level function, so it can be run in a process pool, where the key is given in its dictionary form.
+    """
+    if isinstance(key, dict):
+        key = KeySet.import_key_set(key) if "keys" in key else import_key(key)
+    decoded_token = jwt.decode(token, key, algorithms=algorithms)
+    return decoded_token.header, decoded_token.claims
+
+
+def _decode_mirrored(
+    token: str,
+    kid: str | None,
+    version: int,
+    algorithms: Iterable[str],
+    certs: dict | None = None,
+    issuer: str | None = None,
+) -> tuple[dict, dict] | None:
+    """
+    Verifies the signature of the token in a worker process with the mirrored token signing keys of the issuer.
+    Returns None if the worker does not have the given version of the keys, so they must be sent along.
+    """
+    if certs is not None:
+        _mirrored_keys[issuer] = (version, *import_keys(certs))
+    elif issuer not in _mirrored_keys or _mirrored_keys[issuer][0] != version:
+        return None
+
+    _, key_set, keys_by_kid = _mirrored_keys[issuer]
+    key = key_set if kid is None else keys_by_kid.get(kid, key_set)
+    decoded_token = jwt.decode(token, key, algorithms=algorithms)
+    return decoded_token.header, decoded_token.claims
+
+
+class Verifier:
+    """
+    Verifies the signatures of tokens on the calling thread.
+    """
+
+    def __init__(self, algorithms: Iterable[str]):
+        self.algorithms = tuple(algorithms)
+
+    def verify(
+        self,
+        token: str,
+        kid: str | None,
+        key: Key | KeySet,
+        issuer: str | None = None,
+    ) -> jwt.Token:
+        """
+        Verifies the signature of the token with `key`, the key with the key ID `kid` of the trusted issuer `issuer`.
+        `issuer` is None for the auth provider of `AuthConfig.well_known_endpoint`.
+
+        Raises:
+        - JoseError or ValueError if the signature is invalid.
+        """
+        return jwt.decode(token, key, algorithms=self.algorithms)
+
+    async def verify_async(
+        self,
+        token: str,
+        kid: str | None,
+        key: Key | KeySet,
+        issuer: str | None = None,
+    ) -> jwt.Token:
+        return self.verify(token, kid, key, issuer)
+
+    def close(self) -> None:
+        pass
+
+
+class ThreadVerifier(Verifier):
+    """
+    Verifies the signatures of tokens in a thread pool when they are validated asynchronously, so the event loop is not blocked.
+    Synchronous validations already run on their own thread, so they verify the signature inline.
+    """
+
+    def __init__(self, algorithms: Iterable[str], max_workers: int | None = None):
+        super().__init__(algorithms)
+        self._max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="psp-auth-verify"
+            )
+        return self._executor
+
+    async def verify_async(
+        self,
+        token: str,
+        kid: str | None,
+        key: Key | KeySet,
+        issuer: str | None = None,
+    ) -> jwt.Token:
+        loop = asyncio.get_running_loop()
+        header, claims = await loop.run_in_executor(
+            self.executor(), decode_token, token, key, self.algorithms
+        )
+        return jwt.Token(header, claims)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class ProcessVerifier(Verifier):
+    """
+    Verifies the signatures of tokens in a process pool, so the verification of concurrent tokens is spread across the CPU cores.
+
+    The token signing keys are mirrored into each worker process once per version of the keys,
+    so for each token, only the token and its header and claims cross the process boundary.
+
+    :param algorithms: The signing algorithms that are accepted.
+    :param keys: Returns the version and the JWKS of the current token signing keys of the given trusted issuer, or of `AuthConfig.well_known_endpoint` for None.
+    :param max_workers: The number of worker processes. If None, it uses the default of `concurrent.futures.ProcessPoolExecutor`.
+    """
+
+    def __init__(
+        self,
+        algorithms: Iterable[str],
+        keys: Callable[[str | None], tuple[int, dict]],
+        max_workers: int | None = None,
+    ):
+        super().__init__(algorithms)
+        self._keys = keys
+        self._max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that runs threads (like the HTTP clients) may deadlock the child
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def verify(
+        self,
+        token: str,
+        kid: str | None,
+        key: Key | KeySet,
+        issuer: str | None = None,
+    ) -> jwt.Token:
+        version, certs = self._keys(issuer)
+        executor = self.executor()
+        decoded = executor.submit(
+            _decode_mirrored, token, kid, version, self.algorithms, None, issuer
+        ).result()
+        if decoded is None:
+            decoded = executor.submit(
+                _decode_mirrored, token, kid, version, self.algorithms, certs, issuer
+            ).result()
+        return jwt.Token(*decoded)
+
+    async def verify_async(
+        self,
+        token: str,
+        kid: str | None,
+        key: Key | KeySet,
+        issuer: str | None = None,
+    ) -> jwt.Token:
+        version, certs = self._keys(issuer)
+        executor = self.executor()
+        loop = asyncio.get_running_loop()
+        decoded = await loop.run_in_executor(
+            executor,
+            _decode_mirrored,
+            token,
+            kid,
+            version,
+            self.algorithms,
+            None,
+            issuer,
+        )
+        if decoded is None:
+            decoded = await loop.run_in_executor(
+                executor,
+                _decode_mirrored,
+                token,
+                kid,
+                version,
+                self.algorithms,
+                certs,
+                issuer,
+            )
+        return jwt.Token(*decoded)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def create_verifier(
+    executor: str,
+    algorithms: Iterable[str],
+    keys: Callable[[str | None], tuple[int, dict]],
+    max_workers: int | None = None,
+) -> Verifier:
+    """
+    Creates the verifier for the `AuthConfig.verification_executor` setting.
+
+    Raises:
+    - ValueError if the executor is not "inline", "thread" or "process".
+    """
+    if executor == "inline":
+        return Verifier(algorithms)
+    elif executor == "thread":
+        return ThreadVerifier(algorithms, max_workers)
+    elif executor == "process":
+        return ProcessVerifier(algorithms, keys, max_workers)
+    raise ValueError(f"Unknown verification executor: {executor}")
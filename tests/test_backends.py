@@ -0,0 +1,252 @@
+import multiprocessing
+import socketserver
+import threading
+import time
+import pytest
+from joserfc import jwt
+from psp_auth import Auth, AuthConfig
+from psp_auth.backends import (
+    MemoryBackend,
+    RedisBackend,
+    RedisError,
+    SharedMemoryBackend,
+)
+from psp_auth.errors import AuthException
+from psp_auth.testing import MockToken
+
+
+class FakeRedisServer:
+    """
+    A minimal stand-in for a Redis server, which supports the commands that `RedisBackend` uses.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.commands = []
+        self._server = socketserver.ThreadingTCPServer(
+            ("127.0.0.1", 0), self._handler()
+        )
+        self._server.daemon_threads = True
+        self.url = f"redis://127.0.0.1:{self._server.server_address[1]}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while line := self.rfile.readline():
+                    args = []
+                    for _ in range(int(line[1:])):
+                        length = int(self.rfile.readline()[1:])
+                        args.append(self.rfile.read(length + 2)[:-2])
+                    self.wfile.write(server.execute(*args))
+
+        return Handler
+
+    def execute(self, command: bytes, *args: bytes) -> bytes:
+        self.commands.append(command)
+        if command == b"GET":
+            value, expires_at = self.values.get(args[0], (None, 0))
+            if value is None or expires_at <= time.time():
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        elif command == b"SET":
+            self.values[args[0]] = (args[1], time.time() + int(args[3]) / 1000)
+            return b"+OK\r\n"
+        elif command == b"DEL":
+            return b":%d\r\n" % (self.values.pop(args[0], None) is not None)
+        elif command == b"AUTH":
+            if args[-1] != b"secret":
+                return b"-WRONGPASS invalid password\r\n"
+            return b"+OK\r\n"
+        elif command == b"SELECT":
+            return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def redis_server():
+    with FakeRedisServer() as server:
+        yield server
+
+
+@pytest.fixture(params=["memory", "shared_memory", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryBackend()
+    elif request.param == "shared_memory":
+        backend = SharedMemoryBackend(str(tmp_path / "cache"), slots=64, slot_size=512)
+        yield backend
+        backend.close()
+    else:
+        with FakeRedisServer() as server:
+            backend = RedisBackend(server.url)
+            yield backend
+            backend.close()
+
+
+def test_backend(backend):
+    assert backend.get(b"key") is None
+    backend.set(b"key", b"value", 60)
+    assert backend.get(b"key") == b"value"
+    backend.set(b"key", b"other value", 60)
+    assert backend.get(b"key") == b"other value"
+    backend.delete(b"key")
+    assert backend.get(b"key") is None
+
+
+async def test_backend_async(backend):
+    assert await backend.get_async(b"key") is None
+    await backend.set_async(b"key", b"value", 60)
+    assert await backend.get_async(b"key") == b"value"
+    assert backend.get(b"key") == b"value"
+    await backend.delete_async(b"key")
+    assert await backend.get_async(b"key") is None
+
+
+def test_backend_expiry(backend, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    backend.set(b"key", b"value", 10)
+    backend.set(b"expired", b"value", 0)
+    assert backend.get(b"key") == b"value"
+    assert backend.get(b"expired") is None
+
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert backend.get(b"key") is None
+
+
+def _write_shared_memory(path: str):
+    backend = SharedMemoryBackend(path, slots=64, slot_size=512)
+    backend.set(b"key", b"from another process", 60)
+    backend.close()
+
+
+def test_shared_memory_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache")
+    backend = SharedMemoryBackend(path, slots=64, slot_size=512)
+
+    process = multiprocessing.get_context("spawn").Process(
+        target=_write_shared_memory, args=(path,)
+    )
+    process.start()
+    process.join()
+
+    assert backend.get(b"key") == b"from another process"
+    backend.close()
+
+
+def test_shared_memory_bounds(tmp_path):
+    path = str(tmp_path / "cache")
+    backend = SharedMemoryBackend(path, slots=4, slot_size=64)
+    backend.set(b"large", b"x" * 64, 60)
+    assert backend.get(b"large") is None
+
+    for i in range(10):
+        backend.set(b"key%d" % i, b"value", 60 + i)
+    assert sum(backend.get(b"key%d" % i) is not None for i in range(10)) == 4
+    # The entries that expire last are kept
+    assert backend.get(b"key9") == b"value"
+    backend.close()
+
+    with pytest.raises(ValueError, match="different"):
+        SharedMemoryBackend(path, slots=8, slot_size=64)
+
+
+def test_redis_setup_commands(redis_server):
+    host = redis_server.url.removeprefix("redis://")
+    backend = RedisBackend(f"redis://:secret@{host}/2")
+    backend.set(b"key", b"value", 60)
+    backend.set(b"other key", b"value", 60)
+    assert redis_server.commands == [b"AUTH", b"SELECT", b"SET", b"SET"]
+    backend.close()
+
+    with pytest.raises(RedisError, match="WRONGPASS"):
+        RedisBackend(f"redis://:wrong@{host}").get(b"key")
+
+
+async def test_redis_connections_are_reused_async(redis_server):
+    backend = RedisBackend(redis_server.url)
+    for _ in range(3):
+        await backend.set_async(b"key", b"value", 60)
+    assert len(backend._idle_async) == 1
+    backend.close()
+
+
+def test_shared_token_validation(auth_config, mauth, monkeypatch):
+    backend = MemoryBackend()
+    token = mauth.issue_token(MockToken())
+    assert Auth(auth_config, cache_backend=backend).validate_token(token)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The token should not be decoded again")
+
+    monkeypatch.setattr(jwt, "decode", fail)
+    validated_token = Auth(auth_config, cache_backend=backend).validate_token(token)
+    assert validated_token.token_id == MockToken().token_id
+
+
+async def test_shared_token_validation_async(auth_config, mauth, redis_server):
+    backend = RedisBackend(redis_server.url)
+    token = mauth.issue_token(MockToken())
+    assert await Auth(auth_config, cache_backend=backend).validate_token_async(token)
+    assert [key for key in redis_server.values if b":token:" in key]
+
+    # The validated tokens are not shared with other clients
+    other_auth = Auth(AuthConfig(client_id="other_client"), cache_backend=backend)
+    with pytest.raises(AuthException, match="audience"):
+        await other_auth.validate_token_async(token)
+    backend.close()
+
+
+def test_shared_keys(auth_config, mauth, monkeypatch):
+    backend = MemoryBackend()
+    token = mauth.issue_token(MockToken())
+    assert Auth(auth_config, cache_backend=backend).validate_token(token)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The keys should be taken from the shared cache")
+
+    monkeypatch.setattr(Auth, "token_certs", fail)
+    assert Auth(auth_config, cache_backend=backend).validate_token(token)
+
+
+def test_shared_keys_keep_their_max_age(auth_config, mauth):
+    backend = MemoryBackend()
+    token = mauth.issue_token(MockToken())
+    auth = Auth(auth_config, cache_backend=backend)
+    # As if the auth provider sent the keys with Cache-Control: max-age=600
+    auth._keys._max_age = lambda: 600
+    assert auth.validate_token(token)
+
+    other_auth = Auth(auth_config, cache_backend=backend)
+    other_token = mauth.issue_token(MockToken(expires_at=int(time.time()) + 60))
+    assert other_auth.validate_token(other_token)
+    assert other_auth._keys._keys.ttl == 600
+
+
+async def test_shared_introspection(auth_config, mauth, monkeypatch):
+    auth_config.introspection_cache_active_ttl = 60
+    backend = MemoryBackend()
+    token = mauth.issue_token(MockToken())
+    assert await Auth(auth_config, cache_backend=backend).validate_token_remotely(token)
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("The introspection should be taken from the cache")
+
+    monkeypatch.setattr(Auth, "_make_introspection_request", fail)
+    assert await Auth(auth_config, cache_backend=backend).validate_token_remotely(token)
+
+
+def test_unavailable_backend_does_not_fail_validation(auth_config, mauth):
+    backend = RedisBackend("redis://127.0.0.1:1", timeout=0.1)
+    auth = Auth(auth_config, cache_backend=backend)
+    assert auth.validate_token(mauth.issue_token(MockToken()))
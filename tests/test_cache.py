@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+import pytest
+from psp_auth.cache import AsyncSingleFlight, CachedGetter, CachedValue, TTLCache
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(10)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=-1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    cache.get("a")
+    cache.set("c", 3, ttl=60)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_bounds_bytes():
+    cache = TTLCache(10, max_bytes=10)
+    cache.set("a", 1, ttl=60, size=6)
+    cache.set("b", 2, ttl=60, size=6)
+    cache.set("c", 3, ttl=60, size=11)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.get("c") is None
+
+
+async def test_single_flight_coalesces_concurrent_calls():
+    single_flight = AsyncSingleFlight()
+    calls = []
+
+    async def function():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(
+        *(single_flight.run("key", function) for _ in range(10))
+    )
+
+    assert results == ["result"] * 10
+    assert len(calls) == 1
+    assert len(single_flight) == 0
+
+
+async def test_single_flight_shares_errors():
+    single_flight = AsyncSingleFlight()
+
+    async def function():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(
+        *(single_flight.run("key", function) for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(single_flight) == 0
+
+
+async def test_single_flight_survives_cancelled_caller():
+    single_flight = AsyncSingleFlight()
+
+    async def function():
+        await asyncio.sleep(0.01)
+        return "result"
+
+    cancelled = asyncio.ensure_future(single_flight.run("key", function))
+    waiting = asyncio.ensure_future(single_flight.run("key", function))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await waiting == "result"
+    assert len(single_flight) == 0
+
+
+def test_single_flight_ignores_calls_of_closed_event_loops():
+    single_flight = AsyncSingleFlight()
+
+    async def function():
+        await asyncio.sleep(0.01)
+        return "result"
+
+    loop = asyncio.new_event_loop()
+    loop.create_task(single_flight.run("key", function))
+    loop.run_until_complete(asyncio.sleep(0))
+    loop.close()
+
+    assert asyncio.run(single_flight.run("key", function)) == "result"
+
+
+def test_cached_getter_runs_one_update_at_a_time():
+    calls = []
+
+    def getter():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    getter = CachedGetter(getter, 60)
+    threads = [threading.Thread(target=getter.get) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert getter.get() == "value"
+    assert len(calls) == 1
+
+
+def test_cached_getter_returns_stale_value_while_refreshing():
+    values = iter(["old", "new"])
+    release = threading.Event()
+
+    def getter():
+        value = next(values)
+        if value == "new":
+            release.wait(1)
+        return value
+
+    getter = CachedGetter(getter, 60)
+    assert getter.get() == "old"
+
+    getter.last_update -= 120
+    assert getter.get() == "old"
+
+    release.set()
+    with getter._background_lock:  # Wait for the background update to finish
+        assert getter.get() == "new"
+
+
+def test_cached_getter_uses_ttl_of_value():
+    getter = CachedGetter(lambda: CachedValue("value", time.time(), ttl=10), 60)
+    assert getter.get() == "value"
+    assert getter.ttl == 10
+
+    getter.last_update -= 20
+    assert getter.is_expired()
+
+
+def test_cached_getter_backs_off_after_failure():
+    calls = []
+
+    def getter():
+        calls.append(1)
+        raise ValueError("failed")
+
+    getter = CachedGetter(getter, 60, min_retry_delay=60)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            getter.get()
+
+    assert len(calls) == 1
+    assert getter.failures == 1
+
+
+async def test_cached_getter_async_shares_update():
+    calls = []
+
+    async def async_getter():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    getter = CachedGetter(None, 60, async_getter=async_getter)
+    results = await asyncio.gather(*(getter.get_async() for _ in range(10)))
+
+    assert results == ["value"] * 10
+    assert len(calls) == 1
@@ -1,5 +1,12 @@
+import asyncio
+import httpx
 import pytest
-from psp_auth.testing import MockToken
+import time
+from concurrent.futures import ProcessPoolExecutor
+from joserfc import jwt
+from psp_auth import Auth, AuthConfig, Token
+from psp_auth.cache import TTLCache
+from psp_auth.testing import DEFAULT_ISSUER, MockToken
 from psp_auth.errors import AuthException, AuthExceptionType
 
 
@@ -37,3 +44,325 @@ async def test_remote_token_validation_require_secret(client, app, auth, mauth):
 
     with pytest.raises(ValueError, match="Client secret is required"):
         await auth.validate_token_remotely(token)
+
+
+def _count_token_certs_calls(auth, monkeypatch) -> list:
+    calls = []
+    token_certs = type(auth).token_certs
+
+    def counting_token_certs(self):
+        calls.append(1)
+        return token_certs(self)
+
+    monkeypatch.setattr(type(auth), "token_certs", counting_token_certs)
+    return calls
+
+
+def test_token_certs_are_cached(client, app, auth, mauth, monkeypatch):
+    calls = _count_token_certs_calls(auth, monkeypatch)
+    token = mauth.issue_token(MockToken())
+
+    for _ in range(3):
+        assert auth.validate_token(token)
+
+    assert len(calls) == 1
+
+
+def test_unknown_key_refetch_is_rate_limited(client, app, auth, mauth, monkeypatch):
+    """
+    The keys were just fetched, so an unknown key ID should not cause a refetch.
+    """
+    calls = _count_token_certs_calls(auth, monkeypatch)
+    assert auth.validate_token(mauth.issue_token(MockToken()))
+
+    for _ in range(3):
+        with pytest.raises(
+            AuthException,
+            match="unknown key",
+            check=lambda e: e.type == AuthExceptionType.UNKNOWN_KEY,
+        ):
+            auth.token_key("unknown-kid")
+
+    assert len(calls) == 1
+
+
+def test_validated_tokens_are_cached(client, app, auth, mauth, monkeypatch):
+    auth = Auth(AuthConfig(client_id=auth.config.client_id, token_cache_size=10))
+    token = mauth.issue_token(MockToken())
+    assert auth.validate_token(token)
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("The token should not be decoded again")
+
+    monkeypatch.setattr(jwt, "decode", fail_decode)
+    assert auth.validate_token(token).token_id == MockToken().token_id
+
+
+def test_validated_token_is_not_cached_beyond_expiry(
+    client, app, auth, mauth, monkeypatch
+):
+    auth = Auth(AuthConfig(client_id=auth.config.client_id, token_cache_size=10))
+    now = time.time()
+    token = mauth.issue_token(MockToken(expires_at=int(now) + 60))
+    assert auth.validate_token(token)
+
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    with pytest.raises(
+        AuthException, check=lambda e: e.type == AuthExceptionType.TOKEN_EXPIRED
+    ):
+        auth.validate_token(token)
+
+
+async def test_validate_token_async(client, app, auth, mauth):
+    token = mauth.issue_token(MockToken())
+    assert (await auth.validate_token_async(token)).token_id == MockToken().token_id
+
+
+async def test_validate_token_async_wrong_audience(client, app, auth, mauth):
+    mock_token = MockToken(audience=["mytestaudience"])
+    token = mauth.issue_token(mock_token, add_client_as_audience=False)
+    with pytest.raises(
+        AuthException,
+        match="The audience",
+        check=lambda e: e.type == AuthExceptionType.FORBIDDEN,
+    ):
+        await auth.validate_token_async(token)
+
+
+async def test_validate_token_async_malformed(client, app, auth, mauth):
+    with pytest.raises(
+        AuthException,
+        match="malformed",
+        check=lambda e: e.type == AuthExceptionType.MALFORMED_TOKEN,
+    ):
+        await auth.validate_token_async("hellothere")
+
+
+@pytest.mark.parametrize("header", ["hellothere", "Basic abc", "Bearer a b"])
+def test_get_token_malformed_header(auth, header):
+    with pytest.raises(
+        AuthException, check=lambda e: e.type == AuthExceptionType.UNAUTHORIZED
+    ):
+        auth.get_token(header)
+
+
+def test_get_token(auth):
+    assert auth.get_token("bearer abc") == "abc"
+
+
+def test_client_is_pooled_until_closed(auth):
+    client = auth._get_client()
+    assert auth._get_client() is client
+
+    auth.close()
+    assert client.is_closed
+    assert auth._get_client() is not client
+    auth.close()
+
+
+async def test_async_client_is_pooled_until_closed(auth_config):
+    async with Auth(auth_config) as auth:
+        client = auth._get_async_client()
+        assert auth._get_async_client() is client
+
+    assert client.is_closed
+    assert auth._get_async_client() is not client
+    await auth.aclose()
+
+
+def _count_introspection_requests(auth, monkeypatch) -> list:
+    calls = []
+    make_introspection_request = type(auth)._make_introspection_request
+
+    async def counting_introspection_request(self, token: str):
+        calls.append(token)
+        return await make_introspection_request(self, token)
+
+    monkeypatch.setattr(
+        type(auth), "_make_introspection_request", counting_introspection_request
+    )
+    return calls
+
+
+async def test_introspection_results_are_cached(auth_config, mauth, monkeypatch):
+    auth_config.introspection_cache_active_ttl = 60
+    auth_config.introspection_cache_inactive_ttl = 60
+    auth = Auth(auth_config)
+    calls = _count_introspection_requests(auth, monkeypatch)
+    active_token = mauth.issue_token(MockToken())
+    inactive_token = mauth.issue_token(MockToken(), add_client_as_audience=False)
+
+    for _ in range(3):
+        assert await auth.validate_token_remotely(active_token)
+        assert not await auth.validate_token_remotely(inactive_token)
+
+    assert len(calls) == 2
+
+
+async def test_cached_introspection_result_does_not_outlive_the_token(
+    auth_config, mauth, monkeypatch
+):
+    auth_config.introspection_cache_active_ttl = 60
+    ttls = []
+
+    class RecordingCache(TTLCache):
+        def set(self, key, value, ttl: float, size: int = 0) -> None:
+            ttls.append(ttl)
+            super().set(key, value, ttl, size)
+
+    auth = Auth(auth_config, introspection_cache=RecordingCache(10))
+
+    async def introspection_without_expiry(self, token: str) -> httpx.Response:
+        return httpx.Response(
+            200,
+            json={"active": True},
+            request=httpx.Request("POST", "https://idp/introspect"),
+        )
+
+    monkeypatch.setattr(
+        Auth, "_make_introspection_request", introspection_without_expiry
+    )
+    token = mauth.issue_token(MockToken(expires_at=int(time.time()) + 5))
+
+    assert await auth.validate_token_remotely(token)
+    assert len(ttls) == 1 and ttls[0] <= 5
+
+
+async def test_obviously_invalid_tokens_are_not_introspected(auth, mauth, monkeypatch):
+    calls = _count_introspection_requests(auth, monkeypatch)
+    header, claims, signature = mauth.issue_token(MockToken()).split(".")
+
+    assert not await auth.validate_token_remotely(
+        mauth.issue_token(MockToken(expires_at=0))
+    )
+    assert not await auth.validate_token_remotely(
+        f"eyJhbGciOiJub25lIn0.{claims}.{signature}"
+    )
+
+    assert len(calls) == 0
+
+
+async def test_opaque_tokens_are_introspected(auth, monkeypatch):
+    tokens = []
+
+    async def introspection(self, token: str) -> httpx.Response:
+        tokens.append(token)
+        return httpx.Response(
+            200,
+            json={"active": True},
+            request=httpx.Request("POST", "https://idp/introspect"),
+        )
+
+    monkeypatch.setattr(Auth, "_make_introspection_request", introspection)
+
+    assert await auth.validate_token_remotely("opaque-token")
+    assert tokens == ["opaque-token"]
+
+
+async def test_introspection_results_are_not_cached_by_default(
+    auth, mauth, monkeypatch
+):
+    calls = _count_introspection_requests(auth, monkeypatch)
+    token = mauth.issue_token(MockToken())
+
+    for _ in range(2):
+        assert await auth.validate_token_remotely(token)
+
+    assert len(calls) == 2
+
+
+async def test_concurrent_introspections_are_coalesced(auth, mauth, monkeypatch):
+    calls = _count_introspection_requests(auth, monkeypatch)
+    token = mauth.issue_token(MockToken())
+
+    results = await asyncio.gather(
+        *(auth.validate_token_remotely(token) for _ in range(10))
+    )
+
+    assert all(results)
+    assert len(calls) == 1
+
+
+def _mock_metadata(auth, fail: bool = False) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if fail:
+            raise httpx.ConnectError("The auth provider is down", request=request)
+        return httpx.Response(200, json={"issuer": DEFAULT_ISSUER, "jwks_uri": "certs"})
+
+    transport = httpx.MockTransport(handler)
+    auth._http_client_options = lambda: {"transport": transport}
+
+
+def test_start_prefetches(auth, mauth, monkeypatch):
+    _mock_metadata(auth)
+    calls = _count_token_certs_calls(auth, monkeypatch)
+    assert not auth.is_ready
+
+    auth.start()
+    try:
+        assert auth.is_ready
+        assert auth.validate_token(mauth.issue_token(MockToken()))
+        assert len(calls) == 1
+    finally:
+        auth.stop()
+
+
+def test_start_is_not_ready_when_prefetch_fails(auth, mauth, monkeypatch):
+    _mock_metadata(auth, fail=True)
+
+    auth.start()
+    try:
+        assert not auth.is_ready
+    finally:
+        auth.stop()
+
+
+async def test_start_async_prefetches(auth, mauth, monkeypatch):
+    _mock_metadata(auth)
+
+    async with auth:
+        await auth.start_async()
+        assert auth.is_ready
+
+
+def _batch_tokens(mauth) -> list[str]:
+    valid_token = mauth.issue_token(MockToken())
+    header, claims, signature = mauth.issue_token(MockToken()).split(".")
+    return [
+        valid_token,
+        mauth.issue_token(MockToken(expires_at=0)),
+        valid_token,
+        mauth.issue_token(MockToken(), add_client_as_audience=False),
+        "hellothere",
+        f"{header}.{claims}.{signature[::-1]}",
+    ]
+
+
+def _assert_batch_results(results: list) -> None:
+    assert isinstance(results[0], Token)
+    assert results[2] is results[0]
+    assert [
+        result.type if isinstance(result, AuthException) else None for result in results
+    ] == [
+        None,
+        AuthExceptionType.TOKEN_EXPIRED,
+        None,
+        AuthExceptionType.FORBIDDEN,
+        AuthExceptionType.MALFORMED_TOKEN,
+        AuthExceptionType.UNAUTHORIZED,
+    ]
+
+
+def test_validate_tokens(auth, mauth):
+    _assert_batch_results(auth.validate_tokens(_batch_tokens(mauth)))
+
+
+def test_validate_tokens_in_process_pool(auth, mauth):
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        results = auth.validate_tokens(_batch_tokens(mauth), executor=executor)
+    _assert_batch_results(results)
+
+
+async def test_validate_tokens_async(auth, mauth):
+    _assert_batch_results(await auth.validate_tokens_async(_batch_tokens(mauth)))
+    await auth.aclose()
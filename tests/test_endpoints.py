@@ -0,0 +1,133 @@
+import httpx
+import pytest
+from joserfc.jwk import RSAKey
+from psp_auth import Auth, AuthConfig
+from psp_auth.endpoints import ConditionalDocument, OidcEndpoints
+
+WELL_KNOWN = {
+    "issuer": "https://issuer",
+    "jwks_uri": "https://issuer/certs",
+    "introspection_endpoint": "https://issuer/introspect",
+}
+
+
+class FakeProvider:
+    """
+    Serves the OpenID configuration and the token signing keys with an ETag.
+    """
+
+    def __init__(self, cache_control: str = "max-age=300"):
+        key = RSAKey.generate_key(2048, auto_kid=True)
+        self.documents = {
+            "/.well-known": WELL_KNOWN,
+            "/certs": {"keys": [key.as_dict(private=False)]},
+        }
+        self.cache_control = cache_control
+        self.status_code = 200
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.status_code != 200:
+            return httpx.Response(self.status_code)
+
+        etag = '"v1"'
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(
+            200, json=self.documents[request.url.path], headers=headers
+        )
+
+
+def _endpoints(provider: FakeProvider) -> OidcEndpoints:
+    client = httpx.Client(transport=httpx.MockTransport(provider))
+    async_client = httpx.AsyncClient(transport=httpx.MockTransport(provider))
+    return OidcEndpoints(
+        "https://issuer/.well-known", lambda: client, lambda: async_client
+    )
+
+
+def test_discovery_is_revalidated_with_etag():
+    provider = FakeProvider()
+    endpoints = _endpoints(provider)
+    assert endpoints.issuer() == "https://issuer"
+
+    endpoints.update()
+
+    assert [request.headers.get("If-None-Match") for request in provider.requests] == [
+        None,
+        '"v1"',
+    ]
+    assert endpoints.issuer() == "https://issuer"
+    assert endpoints._well_known_response.ttl == 300
+
+
+async def test_discovery_is_revalidated_with_etag_async():
+    provider = FakeProvider()
+    endpoints = _endpoints(provider)
+    assert await endpoints.issuer_async() == "https://issuer"
+
+    await endpoints.update_async()
+
+    assert provider.requests[-1].headers.get("If-None-Match") == '"v1"'
+    assert await endpoints.issuer_async() == "https://issuer"
+
+
+def test_discovery_keeps_previous_value_on_error():
+    provider = FakeProvider()
+    endpoints = _endpoints(provider)
+    assert endpoints.issuer() == "https://issuer"
+
+    provider.status_code = 503
+    with pytest.raises(httpx.HTTPStatusError):
+        endpoints.update()
+
+    assert endpoints.issuer() == "https://issuer"
+
+
+def test_discovery_error_without_previous_value():
+    provider = FakeProvider()
+    provider.status_code = 404
+    with pytest.raises(httpx.HTTPStatusError):
+        _endpoints(provider).issuer()
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, None),
+        ({"Cache-Control": "public, max-age=120"}, 120),
+        ({"Cache-Control": "max-age=120", "Age": "20"}, 100),
+        ({"Cache-Control": "max-age=1"}, 10),
+        ({"Cache-Control": "no-cache, max-age=120"}, None),
+        ({"Cache-Control": "s-maxage=120"}, None),
+    ],
+)
+def test_max_age(headers, expected):
+    document = ConditionalDocument("https://issuer/certs", min_max_age=10)
+    client = httpx.Client(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={}, headers=headers)
+        )
+    )
+
+    document.fetch(client)
+
+    assert document.max_age == expected
+
+
+def test_unchanged_keys_are_not_imported_again():
+    provider = FakeProvider(cache_control="max-age=600")
+    auth = Auth(
+        AuthConfig("test_client", well_known_endpoint="https://issuer/.well-known")
+    )
+    auth._client = httpx.Client(transport=httpx.MockTransport(provider))
+
+    key = auth.token_key(None)
+    auth._keys.update()
+
+    assert auth.token_key(None) is key
+    assert provider.requests[-1].headers.get("If-None-Match") == '"v1"'
+    assert auth._keys._keys.ttl == 600
+    auth.close()
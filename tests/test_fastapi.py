@@ -1,8 +1,10 @@
+import pytest
 from starlette.requests import Request
 from typing import Annotated
 from fastapi import Depends, status
 from psp_auth import Token, User
-from psp_auth.testing import MockToken
+from psp_auth.testing import MockToken, MockUser
+from psp_auth.fastapi import FastAPIAuth
 from psp_auth.fastapi.auth import _SECURITY_SCHEME_NAME as SECURITY_SCHEME_NAME
 
 
@@ -31,6 +33,21 @@ def test_token(client, app, fauth, mauth):
     assert response.status_code == status.HTTP_200_OK
 
 
+@pytest.mark.parametrize("use_async_validation", [False, True])
+def test_token_with_bad_signature(client, app, auth, mauth, use_async_validation):
+    fauth = FastAPIAuth(auth, use_async_validation=use_async_validation)
+    header, claims, signature = mauth.issue_token(MockToken()).split(".")
+
+    @app.get("/")
+    async def get_token(token: Annotated[Token, Depends(fauth.token())]):
+        return "ok"
+
+    response = client.get(
+        "/", headers=mauth.auth_header(f"{header}.{claims}.{signature[::-1]}")
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
 def test_user(client, app, fauth, mauth):
     token_value = mauth.issue_token(MockToken())
 
@@ -159,6 +176,47 @@ def test_scope_docs(client, app, fauth, mauth):
     ]
 
 
+def test_require_scopes_docs(client, app, fauth, mauth):
+    @app.get("/", dependencies=[fauth.require_scopes(["read"])])
+    async def route(
+        _: Annotated[None, fauth.require_scopes(["write", "read"])],
+    ):
+        return "ok"
+
+    @app.get("/public")
+    async def public_route():
+        return "ok"
+
+    fauth.add_docs(app)
+
+    paths = app.openapi()["paths"]
+    assert paths["/"]["get"]["security"] == [
+        {
+            SECURITY_SCHEME_NAME: [
+                mauth.resource_namespace_scope("read"),
+                mauth.resource_namespace_scope("write"),
+            ]
+        }
+    ]
+    assert "security" not in paths["/public"]["get"]
+
+
+def test_app_docs_are_generated_lazily(client, app, fauth, mauth):
+    fauth.add_docs(app)
+    assert app.openapi_schema is None
+
+    @app.get("/late", dependencies=[fauth.require_scopes(["read"])])
+    async def route():
+        return "ok"
+
+    schema = client.get("/openapi.json").json()
+    assert schema["paths"]["/late"]["get"]["security"] == [
+        {SECURITY_SCHEME_NAME: [mauth.resource_namespace_scope("read")]}
+    ]
+    assert schema["security"] == [{SECURITY_SCHEME_NAME: []}]
+    assert app.openapi() is app.openapi()
+
+
 def test_remote_token_validation(client, app, fauth, mauth):
     token = MockToken()
 
@@ -185,3 +243,165 @@ def test_remote_token_validation_invalid_token(client, app, fauth, mauth):
 
     response = client.get("/", headers=mauth.auth_header(mauth.issue_token(token)))
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_async_validation_dependencies(client, app, auth, mauth):
+    fauth = FastAPIAuth(auth, use_async_validation=True)
+    scopes = ["testscope1"]
+    token = mauth.issue_token(MockToken(scopes=scopes))
+
+    @app.get("/", dependencies=[fauth.require_scopes(scopes)])
+    async def route(
+        token: Annotated[Token, Depends(fauth.token())],
+        user: Annotated[User, Depends(fauth.user())],
+    ):
+        assert token.user.id == user.id
+        return "ok"
+
+    response = client.get("/", headers=mauth.auth_header(token))
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get(
+        "/", headers=mauth.auth_header(mauth.issue_token(MockToken()))
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_async_validation_does_not_use_the_threadpool(
+    client, app, auth, mauth, monkeypatch
+):
+    fauth = FastAPIAuth(auth, use_async_validation=True)
+    token = mauth.issue_token(MockToken(user=MockUser(roles=["admin"])))
+    threadpool_calls = []
+
+    async def run_in_threadpool(function, *args, **kwargs):
+        threadpool_calls.append(function)
+        return function(*args, **kwargs)
+
+    monkeypatch.setattr(
+        "fastapi.dependencies.utils.run_in_threadpool", run_in_threadpool
+    )
+
+    @app.get("/", dependencies=[fauth.require_roles(["admin"])])
+    async def route(user: Annotated[User, Depends(fauth.user())]):
+        return "ok"
+
+    response = client.get("/", headers=mauth.auth_header(token))
+    assert response.status_code == status.HTTP_200_OK
+    assert threadpool_calls == []
+
+
+def test_has_required_roles(client, app, fauth, mauth):
+    token = mauth.issue_token(MockToken(user=MockUser(roles=["admin", "reader"])))
+
+    @app.get("/all", dependencies=[fauth.require_roles(["admin", "reader"])])
+    async def all_route():
+        return "ok"
+
+    @app.get(
+        "/any",
+        dependencies=[fauth.require_roles(["admin", "writer"], require_all=False)],
+    )
+    async def any_route():
+        return "ok"
+
+    assert (
+        client.get("/all", headers=mauth.auth_header(token)).status_code
+        == status.HTTP_200_OK
+    )
+    assert (
+        client.get("/any", headers=mauth.auth_header(token)).status_code
+        == status.HTTP_200_OK
+    )
+
+
+def test_has_no_required_roles(client, app, fauth, mauth):
+    token = mauth.issue_token(MockToken(user=MockUser(roles=["reader"])))
+
+    @app.get("/", dependencies=[fauth.require_roles(["admin", "reader"])])
+    async def route():
+        return "ok"
+
+    response = client.get("/", headers=mauth.auth_header(token))
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_has_required_global_roles(client, app, fauth, mauth):
+    user = MockUser(resource_roles={"global": ["admin"]})
+    token = mauth.issue_token(MockToken(user=user))
+
+    @app.get("/", dependencies=[fauth.require_roles(["admin"], resource="global")])
+    async def route():
+        return "ok"
+
+    response = client.get("/", headers=mauth.auth_header(token))
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_dependencies_are_stable(fauth):
+    assert fauth.token() is fauth.token()
+    assert fauth.user() is fauth.user()
+    assert fauth.unvalidated_token() is fauth.unvalidated_token()
+    assert (
+        fauth.require_remote_token_validation().dependency
+        is fauth.require_remote_token_validation().dependency
+    )
+
+
+def test_token_is_introspected_once_per_request(
+    client, app, auth, fauth, mauth, monkeypatch
+):
+    calls = []
+    validate_token_remotely = type(auth).validate_token_remotely
+
+    async def counting_validate_token_remotely(self, token: str):
+        calls.append(token)
+        return await validate_token_remotely(self, token)
+
+    monkeypatch.setattr(
+        type(auth), "validate_token_remotely", counting_validate_token_remotely
+    )
+
+    @app.get("/", dependencies=[fauth.require_remote_token_validation()])
+    async def route(_: Annotated[None, fauth.require_remote_token_validation()]):
+        return "ok"
+
+    response = client.get(
+        "/", headers=mauth.auth_header(mauth.issue_token(MockToken()))
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert len(calls) == 1
+
+
+def test_token_is_validated_once_per_request(
+    client, app, auth, fauth, mauth, monkeypatch
+):
+    calls = []
+    validate_token = type(auth).validate_token
+
+    def counting_validate_token(self, token: str):
+        calls.append(token)
+        return validate_token(self, token)
+
+    monkeypatch.setattr(type(auth), "validate_token", counting_validate_token)
+    scopes = ["testscope1"]
+
+    @app.get(
+        "/",
+        dependencies=[
+            fauth.require_scopes(scopes),
+            fauth.require_roles(["reader"]),
+        ],
+    )
+    async def route(
+        request: Request,
+        token: Annotated[Token, Depends(fauth.token())],
+        user: Annotated[User, Depends(fauth.user())],
+    ):
+        assert request.state.psp_auth_token is token
+        return "ok"
+
+    token = mauth.issue_token(MockToken(scopes=scopes, user=MockUser(roles=["reader"])))
+    response = client.get("/", headers=mauth.auth_header(token))
+    assert response.status_code == status.HTTP_200_OK
+    assert len(calls) == 1
@@ -0,0 +1,54 @@
+import json
+import subprocess  # nosec B404
+import sys
+import pytest
+import psp_auth
+
+
+def _imported_modules(statement: str) -> list[str]:
+    code = f"import json, sys\n{statement}\nprint(json.dumps(sorted(sys.modules)))"
+    output = subprocess.run(  # nosec B603
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+        env={"PYTHONPATH": ":".join(sys.path)},
+    ).stdout
+    return json.loads(output)
+
+
+def _top_level(modules: list[str]) -> set[str]:
+    return {module.split(".")[0] for module in modules}
+
+
+@pytest.mark.parametrize(
+    "statement, allowed",
+    [
+        ("import psp_auth", set()),
+        ("from psp_auth import AuthConfig", set()),
+        ("from psp_auth import Auth", {"joserfc"}),
+    ],
+)
+def test_imports_are_lazy(statement, allowed):
+    heavy_modules = {"fastapi", "starlette", "pydantic", "requests", "httpx", "joserfc"}
+    assert _top_level(_imported_modules(statement)) & heavy_modules == allowed
+
+
+def test_requests_is_not_used():
+    modules = _top_level(
+        _imported_modules(
+            "from psp_auth import Auth, FastAPIAuth\nimport psp_auth.testing"
+        )
+    )
+    assert "requests" not in modules
+
+
+def test_lazy_exports():
+    from psp_auth.core import Auth
+    from psp_auth.fastapi.auth import FastAPIAuth
+
+    assert psp_auth.Auth is Auth
+    assert psp_auth.FastAPIAuth is FastAPIAuth
+    assert set(psp_auth.__all__) <= set(dir(psp_auth))
+    with pytest.raises(AttributeError):
+        psp_auth.DoesNotExist
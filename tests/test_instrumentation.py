@@ -0,0 +1,196 @@
+import pytest
+from psp_auth import Auth
+from psp_auth.errors import AuthException, AuthExceptionType
+from psp_auth.instrumentation import (
+    NO_INSTRUMENTATION,
+    Instrumentation,
+    phase_timer_factory,
+    timed_fetch,
+)
+from psp_auth.testing import MockToken
+
+
+class RecordingInstrumentation(Instrumentation):
+    def __init__(self):
+        self.events = []
+
+    def validation_phase(self, phase, seconds):
+        assert seconds >= 0
+        self.events.append(("phase", phase))
+
+    def rejection(self, reason):
+        self.events.append(("rejection", reason))
+
+    def fetch(self, resource, seconds, error):
+        self.events.append(("fetch", resource, error is None))
+
+    def cache(self, cache, event):
+        self.events.append(("cache", cache, event))
+
+    def introspection(self, seconds, status_code):
+        self.events.append(("introspection", status_code))
+
+
+@pytest.fixture
+def instrumentation():
+    return RecordingInstrumentation()
+
+
+def test_validation_phases(auth_config, mauth, instrumentation):
+    auth = Auth(auth_config, instrumentation=instrumentation)
+    auth.validate_token(mauth.issue_token(MockToken()))
+
+    assert [event for event in instrumentation.events if event[0] != "fetch"] == [
+        ("phase", "parse"),
+        ("cache", "jwks", "hit"),
+        ("phase", "key_lookup"),
+        ("phase", "signature"),
+        ("phase", "claims"),
+    ]
+    assert ("fetch", "jwks", True) in instrumentation.events
+
+
+async def test_validation_phases_async(auth_config, mauth, instrumentation):
+    auth = Auth(auth_config, instrumentation=instrumentation)
+    await auth.validate_token_async(mauth.issue_token(MockToken()))
+
+    phases = [event[1] for event in instrumentation.events if event[0] == "phase"]
+    assert phases == ["parse", "key_lookup", "signature", "claims"]
+
+
+def test_rejections(auth_config, mauth, instrumentation):
+    auth = Auth(auth_config, instrumentation=instrumentation)
+    for token in [
+        "hellothere",
+        mauth.issue_token(MockToken(expires_at=0)),
+        mauth.issue_token(MockToken(), add_client_as_audience=False),
+    ]:
+        with pytest.raises(AuthException):
+            auth.validate_token(token)
+
+    assert [event for event in instrumentation.events if event[0] == "rejection"] == [
+        ("rejection", AuthExceptionType.MALFORMED_TOKEN),
+        ("rejection", AuthExceptionType.TOKEN_EXPIRED),
+        ("rejection", AuthExceptionType.FORBIDDEN),
+    ]
+
+
+def test_batch_rejections(auth_config, mauth, instrumentation):
+    auth = Auth(auth_config, instrumentation=instrumentation)
+    auth.validate_tokens(["hellothere", mauth.issue_token(MockToken())])
+
+    assert [event for event in instrumentation.events if event[0] == "rejection"] == [
+        ("rejection", AuthExceptionType.MALFORMED_TOKEN),
+    ]
+
+
+def test_token_cache_events(auth_config, mauth, instrumentation):
+    auth_config.token_cache_size = 1
+    auth = Auth(auth_config, instrumentation=instrumentation)
+    first_token = mauth.issue_token(MockToken())
+    second_token = mauth.issue_token(MockToken(scopes=["other"]))
+
+    auth.validate_token(first_token)
+    auth.validate_token(first_token)
+    auth.validate_token(second_token)
+
+    assert [event for event in instrumentation.events if event[1] == "token"] == [
+        ("cache", "token", "miss"),
+        ("cache", "token", "hit"),
+        ("cache", "token", "miss"),
+        ("cache", "token", "eviction"),
+    ]
+
+
+async def test_introspection_events(auth_config, mauth, instrumentation):
+    auth_config.introspection_cache_active_ttl = 60
+    auth = Auth(auth_config, instrumentation=instrumentation)
+    token = mauth.issue_token(MockToken())
+
+    for _ in range(2):
+        assert await auth.validate_token_remotely(token)
+
+    assert [
+        event
+        for event in instrumentation.events
+        if event[0] == "introspection" or event[1] == "introspection"
+    ] == [
+        ("cache", "introspection", "miss"),
+        ("introspection", 200),
+        ("cache", "introspection", "hit"),
+    ]
+
+
+def test_failed_fetches(instrumentation):
+    def fail():
+        raise ConnectionError()
+
+    with pytest.raises(ConnectionError):
+        timed_fetch(instrumentation, "discovery", fail)()
+
+    assert instrumentation.events == [("fetch", "discovery", False)]
+
+
+def test_disabled_instrumentation_is_not_timed():
+    def fetch():
+        return {}
+
+    assert timed_fetch(NO_INSTRUMENTATION, "jwks", fetch) is fetch
+    assert (
+        phase_timer_factory(NO_INSTRUMENTATION)()
+        is phase_timer_factory(NO_INSTRUMENTATION)()
+    )
+
+
+def test_prometheus(auth_config, mauth):
+    prometheus_client = pytest.importorskip("prometheus_client")
+    from psp_auth.instrumentation import PrometheusInstrumentation
+
+    registry = prometheus_client.CollectorRegistry()
+    auth = Auth(auth_config, instrumentation=PrometheusInstrumentation(registry))
+    auth.validate_token(mauth.issue_token(MockToken()))
+    with pytest.raises(AuthException):
+        auth.validate_token("hellothere")
+
+    assert (
+        registry.get_sample_value(
+            "psp_auth_validation_phase_seconds_count", {"phase": "signature"}
+        )
+        == 1
+    )
+    assert (
+        registry.get_sample_value(
+            "psp_auth_rejections_total", {"reason": "malformed_token"}
+        )
+        == 1
+    )
+
+
+def test_opentelemetry(auth_config, mauth):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+    from psp_auth.instrumentation import OpenTelemetryInstrumentation
+
+    reader = InMemoryMetricReader()
+    instrumentation = OpenTelemetryInstrumentation(
+        MeterProvider(metric_readers=[reader])
+    )
+    auth = Auth(auth_config, instrumentation=instrumentation)
+    auth.validate_token(mauth.issue_token(MockToken()))
+    with pytest.raises(AuthException):
+        auth.validate_token("hellothere")
+
+    metrics = {
+        metric.name: metric
+        for resource_metrics in reader.get_metrics_data().resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+    phases = {
+        point.attributes["phase"]: point.count
+        for point in metrics["psp_auth.validation.phase.duration"].data.data_points
+    }
+    assert phases == {"parse": 1, "key_lookup": 1, "signature": 1, "claims": 1}
+    [rejection] = metrics["psp_auth.rejections"].data.data_points
+    assert rejection.attributes == {"reason": "malformed_token"}
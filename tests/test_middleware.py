@@ -0,0 +1,106 @@
+from typing import Annotated
+from fastapi import Depends, status
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from fastapi.testclient import TestClient
+from psp_auth import Token
+from psp_auth.fastapi import AuthMiddleware
+from psp_auth.fastapi.auth import _SECURITY_SCHEME_NAME as SECURITY_SCHEME_NAME
+from psp_auth.testing import MockToken
+
+
+def test_protect_requires_token(app, fauth, mauth):
+    @app.get("/")
+    async def route():
+        return "ok"
+
+    fauth.protect(app)
+    client = TestClient(app)
+
+    assert client.get("/").status_code == status.HTTP_401_UNAUTHORIZED
+    assert (
+        client.get("/", headers=mauth.auth_header("hellothere")).status_code
+        == status.HTTP_401_UNAUTHORIZED
+    )
+    token = mauth.issue_token(MockToken())
+    assert (
+        client.get("/", headers=mauth.auth_header(token)).status_code
+        == status.HTTP_200_OK
+    )
+
+
+def test_protect_rejects_wrong_audience(app, fauth, mauth):
+    @app.get("/")
+    async def route():
+        return "ok"
+
+    fauth.protect(app)
+    client = TestClient(app)
+
+    token = mauth.issue_token(MockToken(), add_client_as_audience=False)
+    response = client.get("/", headers=mauth.auth_header(token))
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_protect_allows_paths(app, fauth, mauth):
+    @app.get("/health")
+    async def health():
+        return "ok"
+
+    @app.get("/public/{name}")
+    async def public(name: str):
+        return "ok"
+
+    fauth.protect(app, allow_paths=["/health", "/public/*"])
+    client = TestClient(app)
+
+    assert client.get("/health").status_code == status.HTTP_200_OK
+    assert client.get("/public/page").status_code == status.HTTP_200_OK
+    assert client.get("/openapi.json").status_code == status.HTTP_200_OK
+    assert client.get("/health/other").status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_protect_documents_global_security(app, fauth, mauth):
+    fauth.protect(app)
+    assert app.openapi()["security"] == [{SECURITY_SCHEME_NAME: []}]
+
+
+def test_protect_shares_token_with_dependencies(app, auth, fauth, mauth, monkeypatch):
+    calls = []
+    validate_token_async = type(auth).validate_token_async
+
+    async def counting_validate_token_async(self, token: str):
+        calls.append(token)
+        return await validate_token_async(self, token)
+
+    monkeypatch.setattr(
+        type(auth), "validate_token_async", counting_validate_token_async
+    )
+
+    @app.get("/")
+    async def route(token: Annotated[Token, Depends(fauth.token())]):
+        return token.token_id
+
+    fauth.protect(app)
+    client = TestClient(app)
+
+    token = mauth.issue_token(MockToken())
+    response = client.get("/", headers=mauth.auth_header(token))
+    assert response.json() == MockToken().token_id
+    assert len(calls) == 1
+
+
+def test_middleware_with_starlette(auth, mauth):
+    async def route(request: Request):
+        return PlainTextResponse(request.state.psp_auth_token.token_id)
+
+    app = Starlette(routes=[Route("/", route)])
+    app.add_middleware(AuthMiddleware, auth=auth)
+
+    with TestClient(app) as client:
+        assert client.get("/").status_code == status.HTTP_401_UNAUTHORIZED
+        token = mauth.issue_token(MockToken())
+        response = client.get("/", headers=mauth.auth_header(token))
+        assert response.text == MockToken().token_id
@@ -0,0 +1,117 @@
+import base64
+import json
+import time
+import pytest
+from joserfc import jwt
+from joserfc.jwk import OKPKey
+from psp_auth import Auth, AuthConfig
+from psp_auth.errors import AuthException, AuthExceptionType
+from psp_auth.prevalidation import TokenPrevalidator
+from psp_auth.testing import DEFAULT_ISSUER, MockToken
+
+ALGORITHMS = AuthConfig(client_id="test_client").allowed_algorithms
+
+
+def _segment(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def _token(header: dict | None = None, claims: dict | None = None) -> str:
+    header = {"alg": "RS256", "kid": "key"} if header is None else header
+    return f"{_segment(header)}.{_segment(claims or {})}.c2lnbmF0dXJl"
+
+
+@pytest.mark.parametrize(
+    "token, type",
+    [
+        ("x" * 2000, AuthExceptionType.TOKEN_TOO_LARGE),
+        ("hellothere", AuthExceptionType.MALFORMED_TOKEN),
+        ("a.b", AuthExceptionType.MALFORMED_TOKEN),
+        ("a.b.c.d.e", AuthExceptionType.MALFORMED_TOKEN),
+        ("a+b.c.d", AuthExceptionType.MALFORMED_TOKEN),
+        ("a..c", AuthExceptionType.MALFORMED_TOKEN),
+        (f"bm90IGpzb24.{_segment({})}.c2ln", AuthExceptionType.MALFORMED_TOKEN),
+        (_token(header=[]), AuthExceptionType.MALFORMED_TOKEN),
+        (_token(header={"alg": "none"}), AuthExceptionType.UNSUPPORTED_ALGORITHM),
+        (_token(header={"alg": "HS256"}), AuthExceptionType.UNSUPPORTED_ALGORITHM),
+        (_token(header={"kid": "key"}), AuthExceptionType.UNSUPPORTED_ALGORITHM),
+        (_token(header={"alg": "RS256", "kid": 1}), AuthExceptionType.UNKNOWN_KEY),
+        (
+            _token(header={"alg": "RS256", "kid": "k" * 300}),
+            AuthExceptionType.UNKNOWN_KEY,
+        ),
+        (
+            f"{_segment({'alg': 'RS256'})}.bm90IGpzb24.c2ln",
+            AuthExceptionType.MALFORMED_TOKEN,
+        ),
+        (_token(claims={"exp": 0}), AuthExceptionType.TOKEN_EXPIRED),
+        (
+            _token(claims={"nbf": int(time.time()) + 60}),
+            AuthExceptionType.TOKEN_NOT_YET_VALID,
+        ),
+    ],
+)
+def test_rejects(token, type):
+    prevalidator = TokenPrevalidator(max_length=1024, algorithms=ALGORITHMS)
+    with pytest.raises(AuthException, check=lambda e: e.type == type):
+        prevalidator.parse(token)
+
+
+def test_returns_header_and_claims():
+    prevalidator = TokenPrevalidator(max_length=8192, algorithms=ALGORITHMS)
+    header = {"alg": "ES256", "kid": "key", "typ": "JWT"}
+    claims = {"exp": int(time.time()) + 60, "nbf": int(time.time())}
+    assert prevalidator.parse(_token(header, claims)) == (header, claims)
+
+
+def test_invalid_tokens_do_not_fetch_keys(auth_config, monkeypatch):
+    auth = Auth(auth_config)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The keys should not be fetched")
+
+    monkeypatch.setattr(Auth, "token_certs", fail)
+    for token in [
+        "hellothere",
+        _token(header={"alg": "none"}),
+        _token(claims={"exp": 0}),
+    ]:
+        with pytest.raises(AuthException):
+            auth.validate_token(token)
+
+
+async def test_invalid_tokens_do_not_fetch_keys_async(auth_config, monkeypatch):
+    auth = Auth(auth_config)
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("The keys should not be fetched")
+
+    monkeypatch.setattr(Auth, "token_certs_async", fail)
+    with pytest.raises(
+        AuthException, check=lambda e: e.type == AuthExceptionType.MALFORMED_TOKEN
+    ):
+        await auth.validate_token_async("hellothere")
+
+
+def test_validates_eddsa_tokens(auth, mauth, monkeypatch):
+    key = OKPKey.generate_key("Ed25519", parameters={"kid": "ed25519"})
+    monkeypatch.setattr(
+        Auth, "token_certs", lambda self: {"keys": [key.as_dict(private=False)]}
+    )
+    token = jwt.encode(
+        {"alg": "EdDSA", "kid": "ed25519"},
+        MockToken()._claims(auth.config.client_id, [auth.config.client_id]),
+        key,
+        algorithms=["EdDSA"],
+    )
+
+    assert auth.validate_token(token).issuer == DEFAULT_ISSUER
+
+
+def test_allowed_algorithms_are_configurable(mauth):
+    auth = Auth(AuthConfig(client_id="test_client", allowed_algorithms=("ES256",)))
+    with pytest.raises(
+        AuthException,
+        check=lambda e: e.type == AuthExceptionType.UNSUPPORTED_ALGORITHM,
+    ):
+        auth.validate_token(mauth.issue_token(MockToken()))
@@ -0,0 +1,209 @@
+import json
+import time
+import httpx
+import pytest
+from psp_auth import Auth, Token
+from psp_auth.errors import AuthException, AuthExceptionType
+from psp_auth.revocation import (
+    BloomFilter,
+    FileSource,
+    PollingSource,
+    Revocation,
+    RevocationFeed,
+    RevocationList,
+    _hashes,
+)
+from psp_auth.testing import MockToken
+
+
+def _in(seconds: float) -> float:
+    return time.time() + seconds
+
+
+def test_bloom_filter():
+    bloom_filter = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom_filter.add(_hashes(b"revoked-%d" % i))
+
+    assert all(_hashes(b"revoked-%d" % i) in bloom_filter for i in range(1000))
+    false_positives = sum(
+        _hashes(b"valid-%d" % i) in bloom_filter for i in range(10_000)
+    )
+    assert false_positives < 300
+
+
+@pytest.mark.parametrize("exact", [True, False])
+def test_revocation_list(exact):
+    revocations = RevocationList(exact=exact)
+    revocations.revoke(jti="token-1", expires_at=_in(60))
+    revocations.revoke(sid="session-1", expires_at=_in(3600))
+
+    assert revocations.is_revoked({"jti": "token-1", "sid": "session-2"})
+    assert revocations.is_revoked({"jti": "token-2", "sid": "session-1"})
+    assert not revocations.is_revoked({"jti": "token-2", "sid": "session-2"})
+    assert not revocations.is_revoked({"jti": "session-1"})
+    assert len(revocations) == 2
+
+
+def test_revocations_are_dropped_after_expiry():
+    revocations = RevocationList(bucket_seconds=60)
+    revocations.revoke(jti="expired", expires_at=_in(-1))
+    revocations.revoke(jti="token-1", expires_at=_in(60))
+    revocations.revoke(jti="token-2", expires_at=_in(3600))
+    assert len(revocations) == 2
+
+    revocations._drop_expired(_in(200))
+
+    assert len(revocations) == 1
+    assert not revocations.is_revoked({"jti": "token-1"})
+    assert revocations.is_revoked({"jti": "token-2"})
+
+
+def test_bloom_filter_grows_with_the_revocations():
+    revocations = RevocationList(exact=False, filter_capacity=100)
+    revocations.add(Revocation("jti", f"token-{i}", _in(60)) for i in range(1000))
+
+    assert all(revocations.is_revoked({"jti": f"token-{i}"}) for i in range(1000))
+    # An 8-byte fingerprint and at most about 4 bytes of Bloom filter per revocation
+    assert revocations.size_in_bytes < 12 * 1000
+
+
+def test_false_positive_rate_beyond_the_filter_capacity():
+    revocations = RevocationList(
+        exact=False, false_positive_rate=0.01, filter_capacity=1000
+    )
+    revocations.add(
+        Revocation(kind, f"revoked-{i}", _in(60 * (i % 12 + 1)))
+        for i in range(20_000)
+        for kind in ("jti", "sid")
+    )
+
+    assert all(revocations.is_revoked({"sid": f"revoked-{i}"}) for i in range(20_000))
+    false_positives = sum(
+        revocations.is_revoked({"jti": f"valid-{i}", "sid": f"valid-{i}"})
+        for i in range(20_000)
+    )
+    assert false_positives / 20_000 < 0.015
+
+
+def test_max_staleness():
+    revocations = RevocationList(max_staleness=10)
+    with pytest.raises(AuthException, match="stale"):
+        revocations.check({})
+
+    revocations.advance(time.time())
+    revocations.check({})
+
+    revocations.watermark -= 20
+    with pytest.raises(
+        AuthException, check=lambda e: e.type == AuthExceptionType.TOKEN_REVOKED
+    ):
+        revocations.check({})
+
+
+def test_file_source(tmp_path):
+    path = tmp_path / "revocations.jsonl"
+    revocations = RevocationList()
+    feed = RevocationFeed(revocations, FileSource(path))
+    assert feed.sync() == 0
+
+    path.write_text(
+        json.dumps({"jti": "token-1", "exp": _in(60)})
+        + "\nnot json\n"
+        + json.dumps({"sid": "session-1", "exp": _in(60)})
+        + '\n{"jti": "partial'
+    )
+    assert feed.sync() == 2
+    assert feed.sync() == 0
+
+    with path.open("a") as file:
+        file.write(f'", "exp": {_in(60)}}}\n')
+    assert feed.sync() == 1
+    assert revocations.is_revoked({"jti": "partial"})
+
+    # A replaced file is read from the start
+    path.write_text(json.dumps({"jti": "token-2", "exp": _in(60)}) + "\n")
+    assert feed.sync() == 1
+    assert revocations.watermark is not None
+
+
+def test_polling_source():
+    cursors = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        cursor = request.url.params.get("cursor")
+        cursors.append(cursor)
+        revocations = [] if cursor else [{"jti": "token-1", "exp": _in(60)}, {}]
+        return httpx.Response(
+            200, json={"revocations": revocations, "cursor": "1", "watermark": 100}
+        )
+
+    revocations = RevocationList()
+    feed = RevocationFeed(
+        revocations,
+        PollingSource(
+            "https://idp/revocations",
+            client=httpx.Client(transport=httpx.MockTransport(handler)),
+        ),
+    )
+
+    assert feed.sync() == 1
+    assert feed.sync() == 0
+    assert cursors == [None, "1"]
+    assert revocations.is_revoked({"jti": "token-1"})
+    assert revocations.watermark == 100
+
+
+def test_push():
+    revocations = RevocationList()
+    feed = RevocationFeed(revocations)
+
+    feed.push([{"sid": "session-1", "exp": _in(60)}], watermark=100)
+
+    assert revocations.is_revoked({"sid": "session-1"})
+    assert revocations.watermark == 100
+    with pytest.raises(ValueError):
+        feed.push([{"jti": "token-1"}])
+
+
+def test_revocation_of_token_and_session():
+    revocations = RevocationList()
+    feed = RevocationFeed(revocations)
+
+    feed.push([{"jti": "token-1", "sid": "session-1", "exp": _in(60)}])
+
+    assert revocations.is_revoked({"jti": "token-1"})
+    assert revocations.is_revoked({"sid": "session-1"})
+
+
+def test_feed_without_source_can_only_push():
+    feed = RevocationFeed(RevocationList())
+
+    with pytest.raises(ValueError, match="no source"):
+        feed.sync()
+    with pytest.raises(ValueError, match="no source"):
+        feed.start()
+
+
+def _assert_revoked(e: AuthException) -> bool:
+    return e.type == AuthExceptionType.TOKEN_REVOKED
+
+
+async def test_auth_rejects_revoked_tokens(auth_config, mauth):
+    auth_config.token_cache_size = 10
+    revocations = RevocationList()
+    auth = Auth(auth_config, revocations=revocations)
+    token = mauth.issue_token(MockToken(token_id="token-1"))
+    assert auth.validate_token(token)
+
+    revocations.revoke(jti="token-1", expires_at=_in(60))
+
+    # The validated token is cached, but it is still rejected
+    with pytest.raises(AuthException, check=_assert_revoked):
+        auth.validate_token(token)
+    with pytest.raises(AuthException, check=_assert_revoked):
+        await auth.validate_token_async(token)
+    valid_token = mauth.issue_token(MockToken(token_id="token-2"))
+    results = auth.validate_tokens([token, valid_token])
+    assert _assert_revoked(results[0])
+    assert isinstance(results[1], Token)
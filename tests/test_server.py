@@ -0,0 +1,213 @@
+import asyncio
+import time
+import httpx
+import pytest
+from psp_auth import Auth, AuthConfig, Token
+from psp_auth.errors import AuthException, AuthExceptionType
+from psp_auth.testing import MockAuth, MockToken, signing_key
+from psp_auth.testing.server import (
+    DISCOVERY,
+    INTROSPECTION,
+    JWKS,
+    Fault,
+    IdentityProviderServer,
+)
+
+CLIENT_ID = "test_client"
+CLIENT_SECRET = "some_secret"
+
+
+@pytest.fixture
+def server():
+    with IdentityProviderServer(client_secret=CLIENT_SECRET) as server:
+        yield server
+
+
+@pytest.fixture
+def server_auth(server):
+    auth = Auth(
+        AuthConfig(
+            CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+            well_known_endpoint=server.well_known_endpoint,
+            jwks_min_refetch_interval=0,
+            request_timeout=(1, 0.5),
+        )
+    )
+    yield auth
+    auth.close()
+
+
+@pytest.fixture
+def issuer():
+    return MockAuth(CLIENT_ID, None)
+
+
+def test_fetches_once_over_one_connection(server, server_auth, issuer):
+    for _ in range(3):
+        assert server_auth.validate_token(issuer.issue_token(MockToken()))
+
+    assert server.requests == {DISCOVERY: 1, JWKS: 1}
+    assert server.connections == 1
+
+
+def test_key_rotation(server, server_auth, issuer):
+    assert server_auth.validate_token(issuer.issue_token(MockToken()))
+
+    server.rotate(signing_key("EC"))
+    rotated_issuer = MockAuth(CLIENT_ID, None, key_type="EC")
+
+    assert server_auth.validate_token(rotated_issuer.issue_token(MockToken()))
+    assert server_auth.validate_token(issuer.issue_token(MockToken()))
+    assert server.requests[JWKS] == 2
+
+
+def test_unchanged_keys_are_not_modified(server, server_auth):
+    server_auth.prefetch()
+    server_auth.prefetch()
+
+    assert server.requests[JWKS] == 2
+    assert server_auth._endpoints._certs_document._document.etag is not None
+
+
+def test_error_keeps_previous_keys(server, server_auth, issuer):
+    token = issuer.issue_token(MockToken())
+    assert server_auth.validate_token(token)
+
+    server.inject(JWKS, Fault(status=503, times=1))
+    with pytest.raises(httpx.HTTPStatusError):
+        server_auth._keys.update()
+
+    assert server_auth.validate_token(token)
+    server_auth._keys.update()
+    assert server.requests[JWKS] == 3
+
+
+def test_not_modified_without_previous_document(server, server_auth):
+    server.inject(DISCOVERY, Fault(not_modified=True))
+    with pytest.raises(httpx.HTTPStatusError):
+        server_auth.prefetch()
+
+
+def test_latency(server, server_auth):
+    server.inject(DISCOVERY, Fault(latency=1))
+    with pytest.raises(httpx.ReadTimeout):
+        server_auth.prefetch()
+
+
+def test_slow_body(server, server_auth):
+    server.inject(JWKS, Fault(body_delay=0.2))
+
+    start = time.perf_counter()
+    server_auth.prefetch()
+
+    assert time.perf_counter() - start >= 0.2
+
+
+async def test_introspection(server, server_auth, issuer):
+    token = issuer.issue_token(MockToken())
+    assert await server_auth.validate_token_remotely(token)
+
+    server.revoke(token)
+    assert not await server_auth.validate_token_remotely(token)
+    assert not await server_auth.validate_token_remotely(
+        issuer.issue_token(MockToken(expires_at=int(time.time()) - 1))
+    )
+    assert server.requests[INTROSPECTION] == 2
+    await server_auth.aclose()
+
+
+async def test_introspection_requires_client_secret(server, server_auth, issuer):
+    server_auth.config.client_secret = "wrong_secret"
+    with pytest.raises(httpx.HTTPStatusError):
+        await server_auth.validate_token_remotely(issuer.issue_token(MockToken()))
+    await server_auth.aclose()
+
+
+def test_several_event_loops(server, server_auth, issuer):
+    async def validate():
+        token = issuer.issue_token(MockToken())
+        await server_auth.prefetch_async()
+        assert await server_auth.validate_token_async(token)
+        assert await server_auth.validate_token_remotely(token)
+
+    asyncio.run(validate())
+    asyncio.run(validate())
+    assert server.requests[INTROSPECTION] == 2
+
+
+def test_unknown_endpoint(server):
+    with pytest.raises(ValueError):
+        server.inject("token", Fault())
+
+
+@pytest.fixture
+def realms():
+    with (
+        IdentityProviderServer(issuer="https://auth.psp.com/realms/a") as realm_a,
+        IdentityProviderServer(
+            keys=[signing_key("EC")], issuer="https://auth.psp.com/realms/b"
+        ) as realm_b,
+    ):
+        yield realm_a, realm_b
+
+
+@pytest.fixture
+def realms_auth(realms):
+    auth = Auth(
+        AuthConfig(
+            CLIENT_ID,
+            trusted_issuers={
+                realm.issuer: realm.well_known_endpoint for realm in realms
+            },
+        )
+    )
+    yield auth
+    auth.close()
+
+
+async def test_trusted_issuers(realms, realms_auth):
+    realm_a, realm_b = realms
+    token_a = MockAuth(CLIENT_ID, None, issuer=realm_a.issuer).issue_token(
+        MockToken(issuer=realm_a.issuer)
+    )
+    token_b = MockAuth(
+        CLIENT_ID, None, issuer=realm_b.issuer, key_type="EC"
+    ).issue_token(MockToken(issuer=realm_b.issuer))
+
+    assert realms_auth.validate_token(token_a).claims["iss"] == realm_a.issuer
+    assert realm_b.requests == {}
+    assert (await realms_auth.validate_token_async(token_b)).claims[
+        "iss"
+    ] == realm_b.issuer
+    assert all(
+        isinstance(r, Token) for r in realms_auth.validate_tokens([token_a, token_b])
+    )
+    assert realm_a.requests == {DISCOVERY: 1, JWKS: 1}
+    assert realm_b.requests == {DISCOVERY: 1, JWKS: 1}
+    assert realms_auth.is_ready
+    await realms_auth.aclose()
+
+
+def test_untrusted_issuer_is_rejected_without_requests(realms, realms_auth):
+    untrusted = MockAuth(CLIENT_ID, None).issue_token(MockToken())
+
+    with pytest.raises(
+        AuthException,
+        match="not trusted",
+        check=lambda e: e.type == AuthExceptionType.UNAUTHORIZED,
+    ):
+        realms_auth.validate_token(untrusted)
+    assert isinstance(realms_auth.validate_tokens([untrusted])[0], AuthException)
+    assert all(realm.requests == {} for realm in realms)
+
+
+def test_key_of_another_issuer_is_unknown(realms, realms_auth):
+    realm_a, realm_b = realms
+    # Signed with the key of realm b, but claims to be issued by realm a
+    token = MockAuth(CLIENT_ID, None, key_type="EC").issue_token(
+        MockToken(issuer=realm_a.issuer)
+    )
+
+    with pytest.raises(AuthException, match="unknown key"):
+        realms_auth.validate_token(token)
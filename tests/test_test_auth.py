@@ -1,7 +1,9 @@
+import pytest
 from typing import Annotated
 from fastapi import Depends
-from psp_auth import Token
-from psp_auth.testing import MockToken
+from psp_auth import Auth, Token
+from psp_auth.testing import MockAuth, MockToken, signing_key, write_tokens
+from psp_auth.testing import keys
 
 
 def test_token_info(client, app, fauth, mauth):
@@ -35,3 +37,59 @@ def test_token_info(client, app, fauth, mauth):
 
     response = client.get("/", headers=mauth.auth_header(mauth.issue_token(mock_token)))
     assert response.status_code == 200
+
+
+def test_signing_key_is_reused():
+    assert signing_key() is signing_key()
+    assert signing_key(index=1).kid != signing_key().kid
+
+
+def test_signing_key_is_cached_on_disk(tmp_path):
+    key = signing_key("EC", index=99, cache_dir=tmp_path)
+    del keys._keys[("EC", 99)]
+
+    assert signing_key("EC", index=99, cache_dir=tmp_path).kid == key.kid
+    assert (tmp_path / "EC-99.json").exists()
+
+
+@pytest.mark.parametrize("key_type", ["RSA", "EC", "Ed25519"])
+def test_key_types(auth_config, monkeypatch, key_type):
+    mauth = MockAuth(auth_config.client_id, monkeypatch, key_type=key_type)
+    auth = Auth(auth_config)
+
+    assert auth.validate_token(mauth.issue_token(MockToken()))
+    assert all(auth.validate_token(token) for token in mauth.issue_tokens(2))
+
+
+def test_issue_tokens(auth, mauth):
+    template = MockToken(scopes=["read"])
+    tokens = list(
+        mauth.issue_tokens(3, template, vary=lambda index: {"sub": f"user-{index}"})
+    )
+
+    validated_tokens = [auth.validate_token(token) for token in tokens]
+    assert [token.user.id for token in validated_tokens] == [
+        "user-0",
+        "user-1",
+        "user-2",
+    ]
+    scopes = [mauth.resource_namespace_scope("read")]
+    assert all(token.scopes == scopes for token in validated_tokens)
+
+
+def test_issue_tokens_are_distinct(mauth):
+    tokens = list(mauth.issue_tokens(100))
+    assert len(set(tokens)) == 100
+
+
+def test_issue_tokens_in_processes(mauth):
+    tokens = list(mauth.issue_tokens(10))
+    # RSA PKCS #1 v1.5 signatures are deterministic, so the tokens are the same wherever they are signed
+    assert list(mauth.issue_tokens(10, processes=2)) == tokens
+
+
+def test_write_tokens(tmp_path, mauth):
+    path = tmp_path / "tokens.txt"
+
+    assert write_tokens(path, mauth.issue_tokens(5)) == 5
+    assert path.read_text().splitlines() == list(mauth.issue_tokens(5))
@@ -0,0 +1,30 @@
+import dataclasses
+import pytest
+from psp_auth.testing import MockToken
+
+
+def test_token_derived_values_are_memoized(auth, mauth):
+    token = auth.validate_token(mauth.issue_token(MockToken(scopes=["a", "b"])))
+
+    assert token.user is token.user
+    assert token.scopes is token.scopes
+    assert token.scope_set == frozenset(["test_client:a", "test_client:b"])
+    assert token.audience_set == frozenset(["test_client"])
+    assert not hasattr(token, "__dict__")
+    assert not hasattr(token.user, "__dict__")
+
+
+def test_standard_claims(auth, mauth):
+    mock_token = MockToken(scopes=["a"])
+    token = auth.validate_token(mauth.issue_token(mock_token))
+    claims = token.standard_claims
+
+    assert claims.issuer == mock_token.issuer
+    assert claims.subject == mock_token.user.id
+    assert claims.audience == ("test_client",)
+    assert claims.expires_at == mock_token.expires_at
+    assert claims.not_before is None
+    assert claims.token_id == mock_token.token_id
+    assert claims.scopes == ("test_client:a",)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        claims.issuer = "someone else"
@@ -0,0 +1,47 @@
+import pytest
+from psp_auth import Auth
+from psp_auth.errors import AuthException, AuthExceptionType
+from psp_auth.testing import MockToken
+from psp_auth.verification import _decode_mirrored, create_verifier
+
+
+def _tampered(token: str) -> str:
+    header, claims, signature = token.split(".")
+    return f"{header}.{claims}.{signature[::-1]}"
+
+
+@pytest.mark.parametrize("executor", ["inline", "thread", "process"])
+async def test_verification_executor(auth_config, mauth, executor):
+    auth_config.verification_executor = executor
+    auth_config.verification_max_workers = 1
+    auth = Auth(auth_config)
+    token = mauth.issue_token(MockToken())
+
+    try:
+        assert auth.validate_token(token).claims["sub"]
+        assert (await auth.validate_token_async(token)).claims["sub"]
+        unauthorized = lambda e: e.type == AuthExceptionType.UNAUTHORIZED  # noqa: E731
+        with pytest.raises(AuthException, check=unauthorized):
+            auth.validate_token(_tampered(token))
+        with pytest.raises(AuthException, check=unauthorized):
+            await auth.validate_token_async(_tampered(token))
+    finally:
+        await auth.aclose()
+
+
+def test_mirrored_keys_are_sent_once_per_version(auth, mauth):
+    token = mauth.issue_token(MockToken())
+    version, certs = 1, mauth._public_certs
+    algorithms = auth.config.allowed_algorithms
+
+    assert _decode_mirrored(token, None, version, algorithms) is None
+    assert _decode_mirrored(token, None, version, algorithms, certs) is not None
+    assert _decode_mirrored(token, None, version, algorithms) is not None
+    assert _decode_mirrored(token, None, version + 1, algorithms) is None
+    # The keys of each issuer are mirrored separately
+    assert _decode_mirrored(token, None, version, algorithms, None, "other") is None
+
+
+def test_unknown_verification_executor():
+    with pytest.raises(ValueError):
+        create_verifier("gpu", ["RS256"], lambda: (0, {}))